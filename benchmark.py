@@ -0,0 +1,340 @@
+# Benchmarks del generador de vistas contra un SQL Server simulado con SQLite.
+#
+#   python benchmark.py                      # almacén sintético completo
+#   python benchmark.py --scale 0.1          # versión reducida para ir rápido
+#   python benchmark.py --save               # guardar los resultados como línea base
+#   python benchmark.py --threshold 0.25     # falla si algo empeora más de un 25 %
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import types
+
+import generador_vistas_general as app
+
+
+# ========== BACKEND SIMULADO (pyodbc sobre SQLite) ==========
+# Emula las vistas de sistema que lee la herramienta: INFORMATION_SCHEMA.TABLES
+# y COLUMNS, sys.objects, sys.views y sys.sql_modules. CREATE OR ALTER VIEW se
+# interpreta con el propio parser de la herramienta para registrar las columnas.
+class FakeError(Exception):
+    pass
+
+class FakeServer:
+    # Servidor activo: el que usan las conexiones de fake_pyodbc.connect
+    current = None
+
+    def __init__(self):
+        self.db = sqlite3.connect(":memory:", check_same_thread=False)
+        self.lock = threading.Lock()
+        # Todo vive en dbo; los nombres con esquema se buscan por su última parte
+        self.db.create_function("OBJECT_SCHEMA_NAME", 1, lambda oid: "dbo", deterministic=True)
+        self.db.create_function("CONCAT", -1, lambda *parts: "".join("" if p is None else str(p) for p in parts),
+                                deterministic=True)
+        self.db.create_function("SHORT_NAME", 1, app.short_table_name, deterministic=True)
+        self.db.execute("ATTACH ':memory:' AS INFORMATION_SCHEMA")
+        self.db.execute("ATTACH ':memory:' AS sys")
+        self.db.executescript("""
+            CREATE TABLE INFORMATION_SCHEMA.TABLES(TABLE_SCHEMA TEXT, TABLE_NAME TEXT COLLATE NOCASE, TABLE_TYPE TEXT);
+            CREATE TABLE INFORMATION_SCHEMA.COLUMNS(TABLE_SCHEMA TEXT, TABLE_NAME TEXT COLLATE NOCASE,
+                COLUMN_NAME TEXT, DATA_TYPE TEXT, ORDINAL_POSITION INTEGER);
+            CREATE INDEX INFORMATION_SCHEMA.ix_columns ON COLUMNS(TABLE_SCHEMA, TABLE_NAME);
+            CREATE TABLE sys.objects(object_id INTEGER PRIMARY KEY, name TEXT COLLATE NOCASE, type TEXT,
+                modify_date TEXT, is_ms_shipped INTEGER DEFAULT 0);
+            CREATE INDEX sys.ix_objects ON objects(name);
+            CREATE TABLE sys.views(object_id INTEGER PRIMARY KEY, name TEXT COLLATE NOCASE, modify_date TEXT);
+            CREATE TABLE sys.sql_modules(object_id INTEGER PRIMARY KEY, definition TEXT);
+        """)
+        self.next_id = 1
+        self.clock = 0
+
+    def now(self):
+        self.clock += 1
+        return f"2024-01-01 00:00:{self.clock:09d}"
+
+    def add_table(self, name, columns, kind="BASE TABLE", definition=None):
+        oid = self.next_id
+        self.next_id += 1
+        date = self.now()
+        self.db.execute("INSERT INTO INFORMATION_SCHEMA.TABLES VALUES ('dbo', ?, ?)", (name, kind))
+        self.db.executemany("INSERT INTO INFORMATION_SCHEMA.COLUMNS VALUES ('dbo', ?, ?, ?, ?)",
+                            [(name, col, data_type, i) for i, (col, data_type) in enumerate(columns, 1)])
+        self.db.execute("INSERT INTO sys.objects VALUES (?, ?, ?, ?, 0)", (oid, name, "U" if definition is None else "V", date))
+        if definition is not None:
+            self.db.execute("INSERT INTO sys.views VALUES (?, ?, ?)", (oid, name, date))
+            self.db.execute("INSERT INTO sys.sql_modules VALUES (?, ?)", (oid, definition))
+        return oid
+
+    def create_or_alter_view(self, name, body):
+        spec = app.parse_view_definition(body)
+        name = app.short_table_name(name)
+        columns = [(c, "int") for c in spec.fact_columns]
+        columns += [(alias or col, "nvarchar") for j in spec.joins for col, alias in j.columns]
+        columns += [(alias or expr, "nvarchar") for expr, alias in spec.expressions]
+        definition = f"CREATE VIEW {name} AS\n{body}"
+        row = self.db.execute("SELECT object_id FROM sys.objects WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            self.add_table(name, columns, "VIEW", definition)
+            return
+        date = self.now()
+        self.db.execute("UPDATE sys.objects SET modify_date = ? WHERE object_id = ?", (date, row[0]))
+        self.db.execute("UPDATE sys.views SET modify_date = ? WHERE object_id = ?", (date, row[0]))
+        self.db.execute("UPDATE sys.sql_modules SET definition = ? WHERE object_id = ?", (definition, row[0]))
+        self.db.execute("DELETE FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_NAME = ?", (name,))
+        self.db.executemany("INSERT INTO INFORMATION_SCHEMA.COLUMNS VALUES ('dbo', ?, ?, ?, ?)",
+                            [(name, col, data_type, i) for i, (col, data_type) in enumerate(columns, 1)])
+
+class FakeConnection:
+    def __init__(self, server):
+        self.server = server
+        self.timeout = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+class FakeCursor:
+    CREATE_VIEW = re.compile(r"^\s*CREATE\s+OR\s+ALTER\s+VIEW\s+(\S+)\s+AS\s+(.*)$", re.IGNORECASE | re.DOTALL)
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+        self._rows = []
+
+    def execute(self, sql, *params):
+        if len(params) == 1 and isinstance(params[0], (list, tuple)):
+            params = params[0]
+        server = self.connection.server
+        with server.lock:
+            match = self.CREATE_VIEW.match(sql)
+            if match:
+                server.create_or_alter_view(match.group(1), match.group(2))
+                self.description, self._rows = None, []
+                return self
+            sql = sql.replace("OBJECT_ID(?)", "(SELECT object_id FROM sys.objects WHERE name = SHORT_NAME(?))")
+            try:
+                cursor = server.db.execute(sql, params)
+            except sqlite3.Error as e:
+                raise FakeError("42000", str(e))
+            self.description = cursor.description
+            self._rows = cursor.fetchall()
+        return self
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchmany(self, size=1):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def nextset(self):
+        return False
+
+    def cancel(self):
+        pass
+
+    def close(self):
+        pass
+
+# Módulo con la parte de la interfaz de pyodbc que usa la herramienta
+fake_pyodbc = types.ModuleType("pyodbc")
+fake_pyodbc.Error = FakeError
+fake_pyodbc.connect = lambda conn_str, timeout=0: FakeConnection(FakeServer.current)
+
+
+# ========== ALMACÉN SINTÉTICO ==========
+def build_warehouse(scale=1.0, seed=42):
+    # 10k tablas (dimensiones de ~12 columnas), hechos de 2.000 columnas y 5k vistas
+    rng = random.Random(seed)
+    server = FakeServer()
+    facts = max(2, int(10 * scale))
+    # Cada hecho referencia 20 dimensiones distintas
+    tables = max(facts + 20, int(10000 * scale))
+    fact_columns = 2000
+    views = max(20, int(5000 * scale))
+
+    dims = []
+    for i in range(tables - facts):
+        name = f"Dim{rng.choice(['Cliente', 'Producto', 'Fecha', 'Tienda', 'Canal', 'Zona'])}{i:05d}"
+        server.add_table(name, [(f"{name}Id", "int")] + [(f"Atributo{k:02d}", "nvarchar") for k in range(11)])
+        dims.append(name)
+    fact_names = []
+    for i in range(facts):
+        name = f"FactVentas{i:03d}"
+        keys = rng.sample(dims, 20)
+        columns = [(f"{d}Id", "int") for d in keys]
+        columns += [(f"Medida{k:04d}", "decimal") for k in range(fact_columns - len(columns))]
+        server.add_table(name, columns)
+        fact_names.append((name, keys, [c for c, _ in columns]))
+
+    for i in range(views):
+        fact, keys, columns = rng.choice(fact_names)
+        spec = app.ViewSpec(fact, rng.sample(columns, 15), [
+            app.JoinSpec(d, f"{d}Id", f"{d}Id", f"d{k}", [(f"Atributo{k:02d}", f"{d}_Atributo{k:02d}")])
+            for k, d in enumerate(rng.sample(keys, 4))
+        ])
+        name = f"vw_Ventas_{i:05d}"
+        body = app.compile_view_sql(spec)
+        server.add_table(name, [(c, "int") for c in spec.fact_columns], "VIEW", f"CREATE VIEW {name} AS\n{body}")
+    server.db.commit()
+    FakeServer.current = server
+    return server, fact_names, dims
+
+
+# ========== BENCHMARKS ==========
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return min(samples), statistics.median(samples)
+
+def run_benchmarks(scale, repeat):
+    start = time.perf_counter()
+    server, facts, dims = build_warehouse(scale)
+    setup = time.perf_counter() - start
+    app.pyodbc = fake_pyodbc
+    connection = FakeConnection(server)
+    results = {}
+
+    def catalog_load():
+        catalog = app.SchemaCatalog()
+        catalog.apply_changes(catalog.fetch_changes(connection.cursor(), {}))
+        return catalog
+    results['catalog_load'] = timed(catalog_load, repeat)
+    catalog = catalog_load()
+
+    fact, keys, columns = facts[0]
+    joins = [app.JoinSpec(d, f"{d}Id", f"{d}Id", f"d{k}", [(f"Atributo{a:02d}", f"{d}_{a}") for a in range(11)])
+             for k, d in enumerate(keys)]
+    spec = app.ViewSpec(fact, columns, joins)
+    results['generate_sql'] = timed(lambda: app.compile_view_sql(spec, catalog.get_columns), repeat)
+    sql = app.compile_view_sql(spec, catalog.get_columns)
+    results['parse_view_sql'] = timed(lambda: app.parse_view_definition(sql), repeat)
+
+    cursor = connection.cursor()
+    cursor.execute(app.LineageIndex.DEFINITIONS_QUERY)
+    definitions = [(r[0], r[1], str(r[2]), r[3]) for r in cursor.fetchall()]
+    results['lineage_parse'] = timed(lambda: app.parse_lineage(definitions), repeat)
+
+    names = catalog.tables + catalog.views
+    queries = [app.short_table_name(name)[3:3 + n] for name, n in zip(names[::max(1, len(names) // 500)], itertools.cycle([3, 5, 8]))]
+
+    def autocomplete():
+        index = app.SearchIndex(names)
+        for q in queries:
+            index.search(q)
+    results['autocomplete'] = timed(autocomplete, repeat)
+
+    # Despliegue de extremo a extremo por el modo CLI: catálogo, compilación, comparación con lo
+    # desplegado y CREATE OR ALTER VIEW. Cada ronda cambia todas las vistas; deploy_unchanged
+    # repite la última, en la que no hay nada que desplegar.
+    count = max(20, int(500 * scale))
+    rounds = itertools.count()
+    with tempfile.TemporaryDirectory() as folder:
+        args = argparse.Namespace(specs=[folder], out=None, deploy=True, dry_run=False, server="bench",
+                                  database="bench", user="", password="", workers=1, connections=4)
+
+        def write_specs(shift):
+            specs = []
+            for i in range(count):
+                f, k, c = facts[i % len(facts)]
+                specs.append({'name': f"vw_Deploy_{i:04d}", 'fact_table': f, 'fact_columns': c[shift:shift + 30],
+                              'joins': [{'table': d, 'main_fk': f"{d}Id", 'related_pk': f"{d}Id",
+                                         'columns': ["Atributo01", "Atributo02"]} for d in k[:5]]})
+            with open(os.path.join(folder, "views.json"), "w", encoding="utf-8") as out:
+                json.dump({'views': specs}, out)
+
+        def run_deploy():
+            with contextlib.redirect_stdout(io.StringIO()):
+                if app.run_batch(args) != 0:
+                    raise RuntimeError("el despliegue simulado falló")
+
+        def deploy():
+            write_specs(next(rounds))
+            run_deploy()
+        results['deploy'] = timed(deploy, repeat)
+        results['deploy_unchanged'] = timed(run_deploy, repeat)
+    throughput = count / results['deploy'][1]
+
+    return {
+        'meta': {'scale': scale, 'repeat': repeat, 'python': platform.python_version(),
+                 'machine': platform.machine(), 'tables': len(catalog.tables), 'views': len(catalog.views),
+                 'fact_columns': len(columns), 'setup_s': round(setup, 2), 'deploy_views_per_s': round(throughput, 1)},
+        'results': {name: {'min_s': round(best, 6), 'median_s': round(median, 6)} for name, (best, median) in results.items()},
+    }
+
+def compare(current, baseline, threshold):
+    # Regresiones: mediana actual por encima de la de la línea base más el umbral
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            continue
+        ratio = result['median_s'] / base['median_s'] if base['median_s'] else 1.0
+        if ratio > 1 + threshold:
+            regressions.append((name, base['median_s'], result['median_s'], ratio))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks del generador de vistas con un backend SQLite simulado")
+    parser.add_argument("--scale", type=float, default=1.0, help="tamaño del almacén sintético (1 = 10k tablas)")
+    parser.add_argument("--repeat", type=int, default=3, help="repeticiones por benchmark")
+    parser.add_argument("--baseline", default="benchmark_baseline.json", help="archivo JSON con la línea base")
+    parser.add_argument("--save", action="store_true", help="guardar los resultados como nueva línea base")
+    parser.add_argument("--threshold", type=float, default=0.25, help="empeoramiento tolerado (0.25 = 25 %%)")
+    args = parser.parse_args(argv)
+
+    current = run_benchmarks(args.scale, args.repeat)
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        workload = ('scale', 'tables', 'views', 'fact_columns')
+        if any(baseline.get('meta', {}).get(k) != current['meta'][k] for k in workload):
+            print("La línea base es de otro almacén sintético (--scale); no se compara", file=sys.stderr)
+            baseline = None
+
+    print(f"{'benchmark':<16}{'mínimo':>12}{'mediana':>12}{'base':>12}")
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name, {}).get('median_s') if baseline else None
+        base_text = f"{base * 1000:10.1f}ms" if base is not None else f"{'-':>12}"
+        print(f"{name:<16}{result['min_s'] * 1000:10.1f}ms{result['median_s'] * 1000:10.1f}ms{base_text}")
+    print(f"despliegue: {current['meta']['deploy_views_per_s']} vistas/s")
+
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"Línea base guardada en {args.baseline}")
+        return 0
+    regressions = compare(current, baseline, args.threshold) if baseline else []
+    for name, base, now, ratio in regressions:
+        print(f"✗ {name}: {base * 1000:.1f} ms → {now * 1000:.1f} ms (×{ratio:.2f})", file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,44 +1,3210 @@
+import time
+STARTUP_STARTED = time.perf_counter()  # para el informe de arranque (--startup-report)
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import pyodbc
 import os
 import re
-from ttkthemes import ThemedTk
+import sys
+import json
+import argparse
+import sqlite3
+import hashlib
+import difflib
+import queue
+import itertools
+import bisect
+import heapq
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# Importaciones pesadas diferidas: pyodbc al abrir la primera conexión,
+# ttkthemes al crear la ventana, PyYAML (opcional) al leer una especificación .yaml
+pyodbc = None
+yaml = None
+
+def require_pyodbc():
+    global pyodbc
+    if pyodbc is None:
+        import pyodbc as module
+        pyodbc = module
+    return pyodbc
+
+def require_yaml():
+    global yaml
+    if yaml is None:
+        try:
+            import yaml as module
+        except ImportError:
+            raise RuntimeError("Instala PyYAML para leer especificaciones YAML (pip install pyyaml)")
+        yaml = module
+    return yaml
+
+class SearchIndex:
+    # Índice para buscar entre decenas de miles de nombres: prefijos con bisect
+    # sobre la lista ordenada en minúsculas y trigramas para subcadenas y
+    # coincidencias aproximadas. Los resultados salen ordenados por relevancia.
+    # Los trigramas apuntan al nombre en minúsculas (no a su posición), así que
+    # add y discard actualizan el índice sin reconstruirlo.
+    NGRAM = 3
+
+    def __init__(self, items=()):
+        self._items = {}
+        for item in items:
+            self._items.setdefault(item.lower(), item)
+        self._lower = sorted(self._items)
+        self.items = [self._items[name] for name in self._lower]
+        self._grams = {}
+        for name in self._lower:
+            for gram in self._ngrams(name):
+                self._grams.setdefault(gram, set()).add(name)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        return item.lower() in self._items
+
+    def add(self, item):
+        name = item.lower()
+        if name in self._items:
+            return
+        self._items[name] = item
+        i = bisect.bisect_left(self._lower, name)
+        self._lower.insert(i, name)
+        self.items.insert(i, item)
+        for gram in self._ngrams(name):
+            self._grams.setdefault(gram, set()).add(name)
+
+    def discard(self, item):
+        name = item.lower()
+        if self._items.pop(name, None) is None:
+            return
+        i = bisect.bisect_left(self._lower, name)
+        del self._lower[i]
+        del self.items[i]
+        for gram in self._ngrams(name):
+            postings = self._grams[gram]
+            postings.discard(name)
+            if not postings:
+                del self._grams[gram]
+
+    @classmethod
+    def _ngrams(cls, text):
+        return {text[i:i + cls.NGRAM] for i in range(len(text) - cls.NGRAM + 1)}
+
+    def _prefix_range(self, query):
+        lo = bisect.bisect_left(self._lower, query)
+        hi = bisect.bisect_left(self._lower, query + "\uffff", lo)
+        return self._lower[lo:hi]
+
+    def _is_boundary(self, name, pos):
+        # Inicio de palabra: tras esquema/guion bajo o en mayúscula (CamelCase)
+        return pos == 0 or name[pos - 1] in "._ " or self._items[name][pos].isupper()
+
+    def search(self, query, limit=100):
+        q = query.strip().lower()
+        if not q:
+            return self.items[:limit]
+
+        # Menor puntuación = más relevante
+        scores = {}
+        for name in self._prefix_range(q):
+            scores[name] = 0 if name == q else 1
+
+        grams = self._ngrams(q)
+        if grams:
+            postings = sorted((self._grams.get(g, set()) for g in grams), key=len)
+            candidates = set.intersection(*postings) if postings[0] else set()
+        else:
+            candidates = self._lower
+        for name in candidates:
+            if name in scores:
+                continue
+            pos = name.find(q)
+            if pos >= 0:
+                scores[name] = 2 if self._is_boundary(name, pos) else 3
+
+        # Coincidencia aproximada por trigramas compartidos (errores de tipeo)
+        if len(scores) < limit and len(grams) > 1:
+            shared = {}
+            for gram in grams:
+                for name in self._grams.get(gram, ()):
+                    shared[name] = shared.get(name, 0) + 1
+            needed = max(2, (len(grams) + 1) // 2)
+            for name, count in shared.items():
+                if name not in scores and count >= needed:
+                    scores[name] = 5 - count / len(grams)
+
+        ranked = heapq.nsmallest(limit, scores, key=lambda name: (scores[name], len(name), name))
+        return [self._items[name] for name in ranked]
 
 class AutocompleteCombobox(ttk.Combobox):
+    DEBOUNCE_MS = 120
+    MAX_RESULTS = 200
+
     def set_completion_list(self, completion_list):
-        self._completion_list = sorted(completion_list, key=str.lower)
+        # Acepta una lista de nombres o un SearchIndex ya construido (compartido)
+        self._index = completion_list if isinstance(completion_list, SearchIndex) else SearchIndex(completion_list)
+        self._completion_list = self._index.items
         self._hits = []
         self._hit_index = 0
         self.position = 0
+        self._after_id = None
         self.bind('<KeyRelease>', self.handle_keyrelease)
+        self.bind('<Return>', self.handle_return)
         self['values'] = self._completion_list
 
-    def autocomplete(self, delta=0):
-        if delta:
-            self.delete(self.position, tk.END)
-        else:
-            self.position = len(self.get())
+    def autocomplete(self, delta=0):
+        self._after_id = None
+        if delta:
+            self.delete(self.position, tk.END)
+        else:
+            self.position = len(self.get())
+
+        typed = self.get()[:self.position]
+        hits = self._index.search(typed, self.MAX_RESULTS)
+
+        if hits != self._hits:
+            self._hit_index = 0
+            self._hits = hits
+            self['values'] = hits if typed else self._completion_list
+
+        # Completar en línea solo cuando el mejor resultado empieza por lo escrito
+        if hits and hits[self._hit_index].lower().startswith(typed.lower()):
+            self.delete(0, tk.END)
+            self.insert(0, hits[self._hit_index])
+            self.select_range(self.position, tk.END)
+
+    def handle_keyrelease(self, event):
+        if event.keysym in ("BackSpace", "Left", "Right", "Up", "Down", "Shift_L", "Shift_R",
+                            "Return", "Tab", "Escape"):
+            return
+        # Esperar a que el usuario deje de teclear antes de buscar
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+        self._after_id = self.after(self.DEBOUNCE_MS, self.autocomplete)
+
+    def handle_return(self, event):
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+            self.autocomplete()
+        if self._hits and self.get() not in self._completion_list:
+            self.set(self._hits[0])
+        self.icursor(tk.END)
+        # Solo se notifica una selección si el texto es un elemento de la lista
+        if self.get() in self._completion_list:
+            self.event_generate("<<ComboboxSelected>>")
+
+class VirtualTreeview(ttk.Frame):
+    # Treeview virtualizado: solo existen items para las filas visibles y se
+    # reutilizan al desplazarse. Las subclases definen row_count/row_values.
+    ROW_HEIGHT = 20
+
+    def __init__(self, master, columns, headings, widths, height=15, anchors=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.body = ttk.Frame(self)
+        self.body.pack(fill=tk.BOTH, expand=True)
+        self.scroll = ttk.Scrollbar(self.body, orient=tk.VERTICAL, command=self.yview)
+        self.scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree = ttk.Treeview(self.body, columns=columns, show="headings", height=height, selectmode="none")
+        for i, (col, text, width) in enumerate(zip(columns, headings, widths)):
+            self.tree.heading(col, text=text)
+            self.tree.column(col, width=width, anchor=(anchors[i] if anchors else "w"))
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.offset = 0
+        self.visible = height
+        self._items = []
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", self._on_wheel)
+        self.tree.bind("<Button-5>", self._on_wheel)
+
+    def row_count(self):
+        return 0
+
+    def row_values(self, index):
+        return ()
+
+    def row_tags(self, index):
+        return ()
+
+    def _on_resize(self, event):
+        rowheight = int(ttk.Style().lookup("Treeview", "rowheight") or self.ROW_HEIGHT)
+        # Descontar la fila de encabezados
+        visible = max(1, event.height // rowheight - 1)
+        if visible != self.visible:
+            self.visible = visible
+            self.refresh()
+
+    def _on_wheel(self, event):
+        step = -3 if (event.num == 4 or getattr(event, "delta", 0) > 0) else 3
+        self.yview("scroll", step, "units")
+        return "break"
+
+    def yview(self, *args):
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * self.row_count())
+        elif args[0] == "scroll":
+            self.offset += int(args[1]) * (self.visible if args[2] == "pages" else 1)
+        self.refresh()
+
+    def refresh(self):
+        total = self.row_count()
+        self.offset = max(0, min(self.offset, total - self.visible))
+        count = min(self.visible, total - self.offset)
+        # Reutilizar los items existentes; crear o borrar solo la diferencia
+        while len(self._items) < count:
+            self._items.append(self.tree.insert("", "end"))
+        if len(self._items) > count:
+            self.tree.delete(*self._items[count:])
+            del self._items[count:]
+        for k, item in enumerate(self._items):
+            index = self.offset + k
+            self.tree.item(item, values=self.row_values(index), tags=self.row_tags(index))
+        if total:
+            self.scroll.set(self.offset / total, (self.offset + count) / total)
+        else:
+            self.scroll.set(0, 1)
+
+    def index_at(self, y):
+        item = self.tree.identify_row(y)
+        if not item:
+            return None
+        return self.offset + self._items.index(item)
+
+class ColumnGrid(VirtualTreeview):
+    # Lista de columnas con casilla "Incluir", filtro por nombre o regex y
+    # operaciones masivas sobre las filas filtradas. Cada operación llama a
+    # on_change una sola vez, sin importar cuántas filas toque.
+    def __init__(self, master, on_change=None, height=15, column_width=150):
+        self.rows = []
+        self.view = []
+        self.on_change = on_change
+        super().__init__(master, ("column", "include"), ("Columna", "Incluir"), (column_width, 50),
+                         height=height, anchors=("w", "center"))
+        self.tree.tag_configure("checked", foreground="#4CAF50")  # Verde
+        self.tree.tag_configure("unchecked", foreground="#757575")  # Gris
+        self.tree.tag_configure("missing", foreground="#ff6b6b")  # Rojo: ya no existe
+        self.missing = set()
+        self.tree.bind("<Button-1>", self._on_click)
+
+        toolbar = ttk.Frame(self)
+        toolbar.pack(fill=tk.X, pady=(0, 5), before=self.body)
+        ttk.Label(toolbar, text="Filtro:").pack(side=tk.LEFT)
+        self.filter_entry = ttk.Entry(toolbar, width=15)
+        self.filter_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.filter_entry.bind("<KeyRelease>", lambda _: self.apply_filter())
+        ttk.Button(toolbar, text="Todo", width=5, command=self.select_all).pack(side=tk.LEFT)
+        ttk.Button(toolbar, text="Nada", width=5, command=self.select_none).pack(side=tk.LEFT)
+        ttk.Button(toolbar, text="Invertir", width=8, command=self.invert).pack(side=tk.LEFT)
+        self.count_label = ttk.Label(self, text="")
+        self.count_label.pack(anchor="w")
+
+    def row_count(self):
+        return len(self.view)
+
+    def row_values(self, index):
+        row = self.rows[self.view[index]]
+        return (row[0], "✓" if row[1] else " ")
+
+    def row_tags(self, index):
+        row = self.rows[self.view[index]]
+        if row[0] in self.missing:
+            return ("missing",)
+        return ("checked" if row[1] else "unchecked",)
+
+    def set_rows(self, rows):
+        # rows: iterable de (nombre, incluida, extra)
+        self.rows = [[name, bool(selected), extra] for name, selected, extra in rows]
+        self.missing = set()
+        self.offset = 0
+        self.apply_filter(notify=False)
+
+    def merge_names(self, names, selected=True, keep_missing=False):
+        # Actualiza las filas sin perder la selección. Las que ya no existen se
+        # quitan o, con keep_missing, se conservan en rojo si estaban incluidas.
+        current = {row[0].lower(): row for row in self.rows}
+        rows = []
+        for name in names:
+            row = current.pop(name.lower(), None)
+            rows.append([name, row[1], row[2]] if row else [name, selected, None])
+        gone = [row for row in current.values() if keep_missing and row[1]]
+        self.rows = rows + gone
+        self.missing = {row[0] for row in gone}
+        self.apply_filter(notify=False)
+        return [row[0] for row in current.values()]
+
+    def set_missing(self, names):
+        self.missing = set(names)
+        self.refresh()
+
+    def add_row(self, name, selected=True, extra=None):
+        self.rows.append([name, selected, extra])
+        self.apply_filter(notify=False)
+
+    def clear(self):
+        self.set_rows([])
+
+    def selected_names(self):
+        return [row[0] for row in self.rows if row[1]]
+
+    def selected_rows(self):
+        return [(row[0], row[2]) for row in self.rows if row[1]]
+
+    def apply_filter(self, notify=False):
+        text = self.filter_entry.get().strip()
+        if text:
+            try:
+                pattern = re.compile(text, re.IGNORECASE)
+            except re.error:
+                pattern = re.compile(re.escape(text), re.IGNORECASE)
+            self.view = [i for i, row in enumerate(self.rows) if pattern.search(row[0])]
+        else:
+            self.view = list(range(len(self.rows)))
+        self.refresh()
+        self._update_count()
+
+    def _update_count(self):
+        selected = sum(1 for row in self.rows if row[1])
+        shown = f" ({len(self.view)} filtradas)" if len(self.view) != len(self.rows) else ""
+        self.count_label.config(text=f"{selected} / {len(self.rows)} seleccionadas{shown}")
+
+    def _on_click(self, event):
+        if self.tree.identify("region", event.x, event.y) != "cell":
+            return
+        if self.tree.identify_column(event.x) != "#2":  # Checkbox column
+            return
+        index = self.index_at(event.y)
+        if index is not None:
+            self._apply(lambda row: not row[1], [self.view[index]])
+
+    def _apply(self, value_for, indices):
+        for i in indices:
+            row = self.rows[i]
+            row[1] = value_for(row)
+        self.refresh()
+        self._update_count()
+        if self.on_change:
+            self.on_change()
+
+    def select_all(self):
+        self._apply(lambda row: True, self.view)
+
+    def select_none(self):
+        self._apply(lambda row: False, self.view)
+
+    def invert(self):
+        self._apply(lambda row: not row[1], self.view)
+
+class DataGrid(VirtualTreeview):
+    # Resultados de la vista previa. Las filas llegan por lotes mientras la
+    # consulta sigue en curso; solo se dibujan las visibles.
+    COLUMN_WIDTH = 120
+
+    def __init__(self, master, height=10):
+        self.rows = []
+        self.columns = []
+        super().__init__(master, (), (), (), height=height)
+        xscroll = ttk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.tree.xview)
+        xscroll.pack(side=tk.BOTTOM, fill=tk.X, before=self.body)
+        self.tree.configure(xscrollcommand=xscroll.set)
+
+    def row_count(self):
+        return len(self.rows)
+
+    def row_values(self, index):
+        return self.rows[index]
+
+    def set_columns(self, names):
+        self.tree.delete(*self._items)
+        self._items = []
+        self.rows = []
+        self.offset = 0
+        self.columns = list(names)
+        ids = [f"c{i}" for i in range(len(self.columns))]
+        self.tree.configure(columns=ids)
+        for col, name in zip(ids, self.columns):
+            self.tree.heading(col, text=name)
+            self.tree.column(col, width=self.COLUMN_WIDTH, minwidth=40, stretch=False)
+        self.refresh()
+
+    def append(self, rows):
+        self.rows.extend(rows)
+        self.refresh()
+
+    def clear(self):
+        self.set_columns([])
+
+class SchemaCatalog:
+    # Catálogo en memoria: esquema.tabla -> columnas ordenadas con su tipo.
+    # Se carga con una sola consulta al conectar y se invalida explícitamente.
+    # Los métodos fetch_* solo leen del servidor (se pueden usar desde un hilo
+    # de trabajo); los cambios se aplican después desde el hilo de Tk.
+    # Las tablas de la base principal se nombran esquema.tabla; las de las bases
+    # adicionales (load_database), base.esquema.tabla.
+    CATALOG_QUERY = (
+        "SELECT t.TABLE_SCHEMA, t.TABLE_NAME, t.TABLE_TYPE, c.COLUMN_NAME, c.DATA_TYPE "
+        "FROM INFORMATION_SCHEMA.TABLES t "
+        "JOIN INFORMATION_SCHEMA.COLUMNS c "
+        "ON c.TABLE_SCHEMA = t.TABLE_SCHEMA AND c.TABLE_NAME = t.TABLE_NAME"
+    )
+    ORDER_BY = " ORDER BY t.TABLE_SCHEMA, t.TABLE_NAME, c.ORDINAL_POSITION"
+    # Marcadores de cambio para el refresco incremental
+    OBJECTS_QUERY = (
+        "SELECT o.object_id, CONCAT(OBJECT_SCHEMA_NAME(o.object_id), '.', o.name), o.type, o.modify_date "
+        "FROM sys.objects o WHERE o.type IN ('U', 'V') AND o.is_ms_shipped = 0"
+    )
+    # Huella de una sola fila: si no cambia, no hace falta comparar objeto a objeto
+    FINGERPRINT_QUERY = (
+        "SELECT COUNT(*), MAX(o.modify_date), CHECKSUM_AGG(BINARY_CHECKSUM(o.object_id, o.modify_date)) "
+        "FROM sys.objects o WHERE o.type IN ('U', 'V') AND o.is_ms_shipped = 0"
+    )
+    # Límite de parámetros por consulta al refrescar tablas sueltas
+    MAX_PARAMS = 1000
+
+    def __init__(self):
+        self.database = None  # nombre de la base principal (para base.esquema.tabla)
+        self.clear()
+
+    def clear(self):
+        self.tables = []
+        self.views = []
+        self._columns = {}
+        self._column_keys = {}
+        self._names = {}
+        self._types = {}
+        self._databases = {}
+        self._short = {}
+        self.objects = {}
+        self.loaded = False
+
+    @staticmethod
+    def normalize(name):
+        return re.sub(r"[\[\]]", "", name or "").strip().lower()
+
+    def resolve(self, table):
+        # Acepta base.esquema.tabla, esquema.tabla o solo la tabla, con o sin
+        # corchetes. Sin esquema se prefiere dbo de la base principal.
+        key = self.normalize(table)
+        if key in self._columns:
+            return key
+        parts = key.split(".")
+        if len(parts) == 3 and self.database and parts[0] == self.database.lower():
+            key = ".".join(parts[1:])
+            return key if key in self._columns else None
+        candidates = self._short.get(parts[-1])
+        if len(parts) > 1 or not candidates:
+            return None
+        if "dbo." + key in candidates:
+            return "dbo." + key
+        return candidates[0]
+
+    # ---------- Lectura desde el servidor ----------
+    def fetch_rows(self, cursor, tables=None):
+        if tables is None:
+            cursor.execute(self.CATALOG_QUERY + self.ORDER_BY)
+            return [tuple(r) for r in cursor.fetchall()]
+        # esquema.tabla filtra por los dos; un nombre sin esquema, solo por la tabla
+        names = list(dict.fromkeys(tuple(self.normalize(t).split(".")[-2:]) for t in tables if t))
+        rows = []
+        size = self.MAX_PARAMS // 2
+        for start in range(0, len(names), size):
+            chunk = names[start:start + size]
+            conditions = " OR ".join("(t.TABLE_SCHEMA = ? AND t.TABLE_NAME = ?)" if len(n) == 2 else "t.TABLE_NAME = ?"
+                                     for n in chunk)
+            cursor.execute(self.CATALOG_QUERY + f" WHERE {conditions}" + self.ORDER_BY, [p for n in chunk for p in n])
+            rows.extend(tuple(r) for r in cursor.fetchall())
+        return rows
+
+    def fetch_fingerprint(self, cursor):
+        cursor.execute(self.FINGERPRINT_QUERY)
+        return tuple(str(v) for v in cursor.fetchone())
+
+    def fetch_objects(self, cursor):
+        cursor.execute(self.OBJECTS_QUERY)
+        return {r[0]: (r[1], r[2].strip(), str(r[3])) for r in cursor.fetchall()}
+
+    def fetch_changes(self, cursor, known=None):
+        # Compara modify_date con lo conocido y solo vuelve a leer lo que cambió
+        known = self.objects if known is None else known
+        current = self.fetch_objects(cursor)
+        if not known:
+            return {'full': True, 'objects': current, 'stale': [], 'changed': [], 'rows': self.fetch_rows(cursor)}
+        changed = [oid for oid, info in current.items() if known.get(oid) != info]
+        removed = [oid for oid in known if oid not in current]
+        stale = [known[oid][0] for oid in removed]
+        stale += [known[oid][0] for oid in changed if oid in known]
+        fresh = [current[oid][0] for oid in changed]
+        rows = self.fetch_rows(cursor, fresh) if fresh else []
+        return {'full': False, 'objects': current, 'stale': list(dict.fromkeys(stale + fresh)), 'changed': changed,
+                'rows': rows}
+
+    # ---------- Aplicación en memoria ----------
+    def apply_changes(self, delta):
+        # Devuelve None si se recargó todo, o la lista de tablas afectadas
+        if delta['full']:
+            self.load_rows(delta['rows'], delta['objects'])
+            return None
+        self.apply_rows(delta['stale'], delta['rows'])
+        self.objects = delta['objects']
+        return delta['stale']
+
+    def apply_rows(self, tables, rows):
+        for name in tables:
+            self.invalidate(name)
+        self._ingest(rows)
+
+    def load_rows(self, rows, objects):
+        # Solo la base principal: las adicionales se conservan
+        self._drop(None)
+        self._ingest(rows)
+        self.objects = dict(objects)
+        self.loaded = True
+
+    def load_database(self, database, rows):
+        # Base adicional del mismo servidor, solo para consultar y hacer JOIN
+        self._drop(database)
+        self._ingest(rows, database)
+
+    def load(self, cursor):
+        self.load_rows(self.fetch_rows(cursor), self.fetch_objects(cursor))
+
+    def sync(self, cursor):
+        return self.apply_changes(self.fetch_changes(cursor))
+
+    def refresh(self, cursor, tables=None):
+        if tables is None:
+            self.load(cursor)
+            return
+        self.apply_rows(tables, self.fetch_rows(cursor, tables))
+
+    def invalidate(self, table=None):
+        if table is None:
+            self.clear()
+            return
+        key = self.resolve(table)
+        # Un nombre de la base principal no debe borrar su homónimo de otra base
+        if key is not None and (self._databases[key] is None or self.normalize(table) == key):
+            self._remove(key)
+
+    def _remove(self, key):
+        name = self._names.pop(key)
+        del self._columns[key]
+        del self._column_keys[key]
+        del self._types[key]
+        del self._databases[key]
+        short = self._short[key.rsplit(".", 1)[-1]]
+        short.remove(key)
+        if not short:
+            del self._short[key.rsplit(".", 1)[-1]]
+        if name in self.tables:
+            self.tables.remove(name)
+        if name in self.views:
+            self.views.remove(name)
+
+    def _drop(self, database):
+        for key in [k for k, db in self._databases.items() if db == database]:
+            self._remove(key)
+
+    def _ingest(self, rows, database=None):
+        prefix = f"{database}." if database else ""
+        for schema, table_name, table_type, column_name, data_type in rows:
+            name = f"{prefix}{schema}.{table_name}"
+            key = name.lower()
+            if key not in self._columns:
+                self._columns[key] = []
+                self._column_keys[key] = set()
+                self._names[key] = name
+                self._types[key] = table_type
+                self._databases[key] = database
+                self._short.setdefault(table_name.lower(), []).append(key)
+                if table_type == 'BASE TABLE':
+                    self.tables.append(name)
+                else:
+                    self.views.append(name)
+            self._columns[key].append((column_name, data_type))
+            self._column_keys[key].add(column_name.lower())
+
+    # ---------- Consultas ----------
+    def has_table(self, table):
+        return self.resolve(table) is not None
+
+    def display_name(self, table):
+        # Nombre tal como aparece en los selectores (None si no está en el catálogo)
+        key = self.resolve(table)
+        return self._names[key] if key is not None else None
+
+    def is_table(self, table):
+        key = self.resolve(table)
+        return key is not None and self._types[key] == 'BASE TABLE'
+
+    def database_of(self, table):
+        key = self.resolve(table)
+        return self._databases[key] if key is not None else None
+
+    def has_column(self, table, column):
+        key = self.resolve(table)
+        return key is not None and self.normalize(column) in self._column_keys[key]
+
+    def get_columns(self, table):
+        key = self.resolve(table)
+        if key is None:
+            return []
+        return [name for name, _ in self._columns[key]]
+
+    def get_column_types(self, table):
+        key = self.resolve(table)
+        if key is None:
+            return {}
+        return dict(self._columns[key])
+
+    def missing(self, tables):
+        return [t for t in dict.fromkeys(tables) if t and not self.has_table(t)]
+
+def table_key(name):
+    # esquema.tabla (o base.esquema.tabla) en minúsculas; sin esquema, dbo
+    key = SchemaCatalog.normalize(name)
+    return key if "." in key else "dbo." + key
+
+class TableNames:
+    # Claves esquema.tabla conocidas por un índice (FK, índices, linaje), con
+    # cuántas entradas usa cada una. Resuelve los nombres sin esquema igual que
+    # SchemaCatalog.resolve: dbo si existe, si no la primera con ese nombre.
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._count = {}
+        self._short = {}
+
+    def add(self, name):
+        key = table_key(name)
+        if key not in self._count:
+            self._count[key] = 0
+            self._short.setdefault(key.rsplit(".", 1)[-1], []).append(key)
+        self._count[key] += 1
+        return key
+
+    def discard(self, key):
+        if key not in self._count:
+            return
+        self._count[key] -= 1
+        if not self._count[key]:
+            del self._count[key]
+            short = self._short[key.rsplit(".", 1)[-1]]
+            short.remove(key)
+            if not short:
+                del self._short[key.rsplit(".", 1)[-1]]
+
+    def key(self, name):
+        key = SchemaCatalog.normalize(name)
+        if "." in key:
+            return key
+        candidates = self._short.get(key)
+        if not candidates or "dbo." + key in candidates:
+            return "dbo." + key
+        return candidates[0]
+
+class ForeignKey:
+    __slots__ = ("name", "table", "referenced", "columns", "trusted")
+
+    def __init__(self, name, table, referenced, columns=None, trusted=False):
+        self.name = name
+        self.table = table
+        self.referenced = referenced
+        # [(columna en table, columna en referenced)]; más de una si la clave es compuesta
+        self.columns = columns or []
+        # Verificada por el servidor (no creada WITH NOCHECK)
+        self.trusted = trusted
+
+class ForeignKeyGraph:
+    # Grafo de claves foráneas cargado de una vez: tabla -> FKs salientes.
+    # Las rutas siguen las FK en su sentido (muchos a uno), así que ningún
+    # JOIN sugerido multiplica las filas de la tabla principal.
+    QUERY = (
+        "SELECT fk.name, CONCAT(OBJECT_SCHEMA_NAME(fk.parent_object_id), '.', OBJECT_NAME(fk.parent_object_id)), "
+        "CONCAT(OBJECT_SCHEMA_NAME(fk.referenced_object_id), '.', OBJECT_NAME(fk.referenced_object_id)), pc.name, rc.name, "
+        "fk.is_not_trusted "
+        "FROM sys.foreign_keys fk "
+        "JOIN sys.foreign_key_columns fkc ON fkc.constraint_object_id = fk.object_id "
+        "JOIN sys.columns pc ON pc.object_id = fkc.parent_object_id AND pc.column_id = fkc.parent_column_id "
+        "JOIN sys.columns rc ON rc.object_id = fkc.referenced_object_id AND rc.column_id = fkc.referenced_column_id "
+        "WHERE fk.is_disabled = 0"
+    )
+    ORDER_BY = " ORDER BY fk.object_id, fkc.constraint_column_id"
+    MAX_DEPTH = 4
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.rows = []
+        self.keys = []
+        self._out = {}
+        self._paths = {}
+        self._names = TableNames()
+        self.loaded = False
+
+    def key(self, table):
+        return self._names.key(table)
+
+    def fetch_rows(self, cursor, object_ids=None):
+        # object_ids: solo las FK que salen de esas tablas o llegan a ellas
+        if object_ids is None:
+            cursor.execute(self.QUERY + self.ORDER_BY)
+            return [tuple(r) for r in cursor.fetchall()]
+        rows = []
+        size = SchemaCatalog.MAX_PARAMS // 2
+        for start in range(0, len(object_ids), size):
+            chunk = object_ids[start:start + size]
+            placeholders = ", ".join("?" for _ in chunk)
+            cursor.execute(self.QUERY + f" AND (fk.parent_object_id IN ({placeholders}) "
+                           f"OR fk.referenced_object_id IN ({placeholders}))" + self.ORDER_BY, chunk + chunk)
+            rows.extend(tuple(r) for r in cursor.fetchall())
+        return rows
+
+    def merge_rows(self, tables, rows):
+        # Filas actuales sin las FK de las tablas que cambiaron, más las releídas
+        keys = {table_key(t) for t in tables}
+        kept = [r for r in self.rows if table_key(r[1]) not in keys and table_key(r[2]) not in keys]
+        return kept + rows
+
+    def load_rows(self, rows):
+        # rows: (fk, tabla, tabla referenciada, columna, columna referenciada, no verificada)
+        # en orden de columna
+        self.clear()
+        self.rows = list(rows)
+        keys = {}
+        for name, table, referenced, column, referenced_column, not_trusted in rows:
+            fk = keys.get((name, table))
+            if fk is None:
+                fk = keys[(name, table)] = ForeignKey(name, table, referenced, trusted=not_trusted == 0)
+                self._out.setdefault(self._names.add(table), []).append(fk)
+                self._names.add(referenced)
+            fk.columns.append((column, referenced_column))
+        self.keys = list(keys.values())
+        self.loaded = True
+
+    def direct(self, table):
+        return list(self._out.get(self.key(table), ()))
+
+    def find(self, table, referenced, columns):
+        # FK de table a referenced exactamente por esas columnas
+        wanted = [(c.lower(), r.lower()) for c, r in columns]
+        for fk in self._out.get(self.key(table), ()):
+            if self.key(fk.referenced) == self.key(referenced) and [(c.lower(), r.lower()) for c, r in fk.columns] == wanted:
+                return fk
+        return None
+
+    def paths_from(self, table, max_depth=None):
+        # BFS por niveles: cada tabla alcanzable con sus rutas más cortas.
+        # Se guardan todas las FK del último salto (p. ej. FechaPedido y
+        # FechaEnvío hacia DimFecha). Resultado cacheado por tabla.
+        max_depth = max_depth or self.MAX_DEPTH
+        start = self.key(table)
+        cache_key = (start, max_depth)
+        if cache_key in self._paths:
+            return self._paths[cache_key]
+        visited = {start}
+        frontier = [()]
+        result = []
+        for _ in range(max_depth):
+            reached = {}
+            for path in frontier:
+                node = self.key(path[-1].referenced) if path else start
+                for fk in self._out.get(node, ()):
+                    target = self.key(fk.referenced)
+                    if target not in visited:
+                        reached.setdefault(target, []).append(path + (fk,))
+            if not reached:
+                break
+            visited.update(reached)
+            frontier = [p for paths in reached.values() for p in paths]
+            result.extend(sorted(frontier, key=lambda p: (p[-1].referenced.lower(), p[-1].name)))
+        self._paths[cache_key] = result
+        return result
+
+    def shortest_paths(self, source, target):
+        target = self.key(target)
+        return [p for p in self.paths_from(source) if self.key(p[-1].referenced) == target]
+
+class IndexCatalog:
+    # Índices, estadísticas y tipos exactos de columna de las tablas de usuario.
+    # Tres lecturas masivas al conectar; el linter de JOIN solo consulta memoria.
+    INDEX_QUERY = (
+        "SELECT CONCAT(OBJECT_SCHEMA_NAME(i.object_id), '.', OBJECT_NAME(i.object_id)), i.name, i.is_unique, c.name "
+        "FROM sys.indexes i "
+        "JOIN sys.index_columns ic ON ic.object_id = i.object_id AND ic.index_id = i.index_id "
+        "JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id "
+        "JOIN sys.objects o ON o.object_id = i.object_id "
+        "WHERE o.type = 'U' AND o.is_ms_shipped = 0 AND i.is_hypothetical = 0 AND i.is_disabled = 0 "
+        "AND ic.key_ordinal > 0{filter} "
+        "ORDER BY i.object_id, i.index_id, ic.key_ordinal"
+    )
+    STATS_QUERY = (
+        "SELECT CONCAT(OBJECT_SCHEMA_NAME(s.object_id), '.', OBJECT_NAME(s.object_id)), c.name FROM sys.stats s "
+        "JOIN sys.stats_columns sc ON sc.object_id = s.object_id AND sc.stats_id = s.stats_id "
+        "AND sc.stats_column_id = 1 "
+        "JOIN sys.columns c ON c.object_id = sc.object_id AND c.column_id = sc.column_id "
+        "JOIN sys.objects o ON o.object_id = s.object_id "
+        "WHERE o.type = 'U' AND o.is_ms_shipped = 0{filter}"
+    )
+    COLUMNS_QUERY = (
+        "SELECT CONCAT(OBJECT_SCHEMA_NAME(c.object_id), '.', OBJECT_NAME(c.object_id)), c.name, t.name, "
+        "c.max_length, c.precision, c.scale, c.is_nullable, "
+        "OBJECT_SCHEMA_NAME(c.object_id) "
+        "FROM sys.columns c JOIN sys.types t ON t.user_type_id = c.user_type_id "
+        "JOIN sys.objects o ON o.object_id = c.object_id "
+        "WHERE o.type = 'U' AND o.is_ms_shipped = 0{filter}"
+    )
+    # Filas por tabla (montón o índice clustered) y filas por valor de la
+    # primera columna de cada estadística. Necesitan VIEW DATABASE STATE y el
+    # histograma SQL Server 2016 SP1 CU2; sin ellos el estimador no tiene cifras.
+    ROWCOUNT_QUERY = (
+        "SELECT CONCAT(OBJECT_SCHEMA_NAME(ps.object_id), '.', OBJECT_NAME(ps.object_id)), SUM(ps.row_count) "
+        "FROM sys.dm_db_partition_stats ps "
+        "JOIN sys.objects o ON o.object_id = ps.object_id "
+        "WHERE o.type = 'U' AND o.is_ms_shipped = 0 AND ps.index_id IN (0, 1){filter} "
+        "GROUP BY ps.object_id"
+    )
+    HISTOGRAM_QUERY = (
+        "SELECT CONCAT(OBJECT_SCHEMA_NAME(s.object_id), '.', OBJECT_NAME(s.object_id)), c.name, "
+        "SUM(h.equal_rows + h.range_rows), SUM(1 + h.distinct_range_rows) "
+        "FROM sys.stats s "
+        "JOIN sys.stats_columns sc ON sc.object_id = s.object_id AND sc.stats_id = s.stats_id "
+        "AND sc.stats_column_id = 1 "
+        "JOIN sys.columns c ON c.object_id = sc.object_id AND c.column_id = sc.column_id "
+        "JOIN sys.objects o ON o.object_id = s.object_id "
+        "CROSS APPLY sys.dm_db_stats_histogram(s.object_id, s.stats_id) h "
+        "WHERE o.type = 'U' AND o.is_ms_shipped = 0{filter} "
+        "GROUP BY s.object_id, s.stats_id, c.name"
+    )
+    # Ancho que se cuenta para una columna (n)varchar(max), varbinary(max), xml...
+    MAX_WIDTH = 8000
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.data = {}
+        self._indexes = {}
+        self._stats = set()
+        self._columns = {}
+        self._tables = {}
+        self._rows = {}
+        self._rows_per_key = {}
+        self._names = TableNames()
+        self.loaded = False
+
+    def key(self, name):
+        return self._names.key(name)
+
+    def fetch_rows(self, cursor, object_ids=None):
+        # object_ids: solo los metadatos de esas tablas (todas si es None)
+        chunks = [[]] if object_ids is None else [object_ids[start:start + SchemaCatalog.MAX_PARAMS]
+                                                  for start in range(0, len(object_ids), SchemaCatalog.MAX_PARAMS)]
+        result = {name: [] for name in ('indexes', 'stats', 'columns', 'rowcounts', 'histograms')}
+        for chunk in chunks:
+            where = f" AND o.object_id IN ({', '.join('?' for _ in chunk)})" if chunk else ""
+            for name, query in (('indexes', self.INDEX_QUERY), ('stats', self.STATS_QUERY),
+                                ('columns', self.COLUMNS_QUERY)):
+                cursor.execute(query.format(filter=where), *chunk)
+                result[name].extend(tuple(r) for r in cursor.fetchall())
+            for name, query in (('rowcounts', self.ROWCOUNT_QUERY), ('histograms', self.HISTOGRAM_QUERY)):
+                try:
+                    cursor.execute(query.format(filter=where), *chunk)
+                    result[name].extend(tuple(r) for r in cursor.fetchall())
+                except require_pyodbc().Error:
+                    pass
+        return result
+
+    def apply_rows(self, tables, data):
+        # Sustituye los metadatos de las tablas que cambiaron por los releídos
+        keys = {table_key(t) for t in tables}
+        self.load_rows({name: [r for r in self.data.get(name, ()) if table_key(r[0]) not in keys] + data[name]
+                        for name in data})
+
+    def load_rows(self, data):
+        self.clear()
+        self.data = data
+        for table, index, unique, column in data['indexes']:
+            indexes = self._indexes.setdefault(self.key(table), {})
+            if index not in indexes:
+                indexes[index] = (bool(unique), [])
+            indexes[index][1].append(column.lower())
+        self._stats = {(self.key(table), column.lower()) for table, column in data['stats']}
+        for table, column, type_name, max_length, precision, scale, nullable, schema in data['columns']:
+            key = self._names.add(table)
+            self._columns[(key, column.lower())] = (
+                type_name.lower(), format_sql_type(type_name, max_length, precision, scale), bool(nullable),
+                self.MAX_WIDTH if max_length == -1 else max_length)
+            self._tables[key] = (schema, short_table_name(table))
+        self._rows = {self.key(table): int(rows) for table, rows in data.get('rowcounts', ())}
+        for table, column, rows, distinct in data.get('histograms', ()):
+            if distinct:
+                self._rows_per_key[(self.key(table), column.lower())] = max(1.0, float(rows) / float(distinct))
+        self.loaded = True
+
+    def has_table(self, table):
+        return self.key(table) in self._tables
+
+    def qualified_name(self, table):
+        # esquema.tabla tal como existe en el servidor (None si no es una tabla de usuario)
+        info = self._tables.get(self.key(table))
+        return f"{quote_name(info[0])}.{quote_name(info[1])}" if info else None
+
+    def unique_keys(self, table):
+        return sorted((keys for unique, keys in self._indexes.get(self.key(table), {}).values() if unique), key=len)
+
+    def is_leading(self, table, column):
+        # Alguna clave de índice empieza por la columna: el JOIN puede hacer seek
+        column = column.lower()
+        return any(columns[0] == column for _, columns in self._indexes.get(self.key(table), {}).values())
+
+    def is_unique(self, table, columns):
+        # Un índice único cuyas claves están todas entre las del JOIN garantiza una fila por valor
+        columns = {c.lower() for c in columns}
+        return any(unique and set(keys) <= columns for unique, keys in self._indexes.get(self.key(table), {}).values())
+
+    def has_stats(self, table, column):
+        return (self.key(table), column.lower()) in self._stats
+
+    def column(self, table, column):
+        # (tipo base, tipo completo para DDL, admite NULL, bytes) o None
+        return self._columns.get((self.key(table), column.lower()))
+
+    def row_count(self, table):
+        return self._rows.get(self.key(table))
+
+    def rows_per_key(self, table, columns):
+        # Filas de la tabla por cada valor de la clave: 1 si hay índice único,
+        # la media del histograma si es una sola columna, None si no se sabe
+        if self.is_unique(table, columns):
+            return 1.0
+        if len(columns) == 1:
+            return self._rows_per_key.get((self.key(table), columns[0].lower()))
+        return None
+
+def format_sql_type(type_name, max_length, precision, scale):
+    name = type_name.lower()
+    if name in ("varchar", "char", "varbinary", "binary"):
+        return f"{name}({'max' if max_length == -1 else max_length})"
+    if name in ("nvarchar", "nchar"):
+        return f"{name}({'max' if max_length == -1 else max_length // 2})"
+    if name in ("decimal", "numeric"):
+        return f"{name}({precision}, {scale})"
+    if name in ("datetime2", "time", "datetimeoffset"):
+        return f"{name}({scale})"
+    return name
+
+class CatalogSnapshot:
+    # Copia local del catálogo en SQLite, una por servidor + base de datos.
+    # Permite arrancar sin esperar al servidor y trabajar sin conexión.
+    SNAPSHOT_DIR = os.path.join(os.path.expanduser("~"), ".generador_vistas")
+
+    def __init__(self, server, database, directory=None):
+        key = hashlib.sha1(f"{server.strip().lower()}|{database.strip().lower()}".encode("utf-8")).hexdigest()[:16]
+        self.directory = directory or self.SNAPSHOT_DIR
+        self.path = os.path.join(self.directory, f"catalogo_{key}.sqlite")
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def _connect(self):
+        os.makedirs(self.directory, exist_ok=True)
+        db = sqlite3.connect(self.path)
+        db.executescript(
+            "CREATE TABLE IF NOT EXISTS objects (object_id INTEGER PRIMARY KEY, name TEXT, type TEXT, modify_date TEXT);"
+            "CREATE TABLE IF NOT EXISTS columns (table_schema TEXT, table_name TEXT, table_type TEXT, ordinal INTEGER, "
+            "column_name TEXT, data_type TEXT);"
+            "CREATE TABLE IF NOT EXISTS lineage (object_id INTEGER PRIMARY KEY, name TEXT, modify_date TEXT, data TEXT);"
+            "CREATE TABLE IF NOT EXISTS foreign_keys (name TEXT, table_name TEXT, referenced TEXT, "
+            "column_name TEXT, referenced_column TEXT, not_trusted INTEGER);"
+        )
+        # Snapshots anteriores a la columna not_trusted
+        if "not_trusted" not in [r[1] for r in db.execute("PRAGMA table_info(foreign_keys)")]:
+            db.execute("ALTER TABLE foreign_keys ADD COLUMN not_trusted INTEGER")
+        # Snapshots sin esquema: se descartan para forzar una recarga completa
+        if "table_schema" not in [r[1] for r in db.execute("PRAGMA table_info(columns)")]:
+            with db:
+                db.execute("DROP TABLE columns")
+                db.execute("DELETE FROM objects")
+                db.execute("DELETE FROM lineage")
+                db.execute("CREATE TABLE columns (table_schema TEXT, table_name TEXT, table_type TEXT, ordinal INTEGER, "
+                           "column_name TEXT, data_type TEXT)")
+        db.execute("CREATE INDEX IF NOT EXISTS ix_columns_table ON columns (table_name, table_schema)")
+        return db
+
+    def load_into(self, catalog):
+        if not self.exists():
+            return False
+        db = self._connect()
+        try:
+            objects = {r[0]: (r[1], r[2], r[3]) for r in db.execute("SELECT object_id, name, type, modify_date FROM objects")}
+            rows = db.execute("SELECT table_schema, table_name, table_type, column_name, data_type FROM columns "
+                              "ORDER BY table_schema, table_name, ordinal").fetchall()
+        finally:
+            db.close()
+        if not objects:
+            return False
+        catalog.load_rows(rows, objects)
+        return True
+
+    def write(self, rows, objects, tables=None):
+        # tables=None reescribe todo; con una lista solo reemplaza esas tablas.
+        # No toca el catálogo en memoria, así que puede ejecutarse en segundo plano.
+        db = self._connect()
+        try:
+            with db:
+                if tables is None:
+                    db.execute("DELETE FROM columns")
+                else:
+                    db.executemany("DELETE FROM columns WHERE table_schema = ? COLLATE NOCASE "
+                                   "AND table_name = ? COLLATE NOCASE",
+                                   [tuple(SchemaCatalog.normalize(t).split(".")[-2:]) for t in tables if "." in t])
+                ordinal = {}
+                batch = []
+                for schema, name, table_type, column_name, data_type in rows:
+                    ordinal[schema, name] = ordinal.get((schema, name), 0) + 1
+                    batch.append((schema, name, table_type, ordinal[schema, name], column_name, data_type))
+                db.executemany("INSERT INTO columns VALUES (?, ?, ?, ?, ?, ?)", batch)
+                db.execute("DELETE FROM objects")
+                db.executemany("INSERT INTO objects VALUES (?, ?, ?, ?)",
+                               [(oid,) + tuple(info) for oid, info in objects.items()])
+        finally:
+            db.close()
+
+    def write_changes(self, delta):
+        self.write(delta['rows'], delta['objects'], None if delta['full'] else delta['stale'])
+
+    def load_foreign_keys(self, graph):
+        if not self.exists():
+            return False
+        db = self._connect()
+        try:
+            rows = db.execute("SELECT name, table_name, referenced, column_name, referenced_column, not_trusted "
+                              "FROM foreign_keys ORDER BY rowid").fetchall()
+        finally:
+            db.close()
+        graph.load_rows(rows)
+        return bool(rows)
+
+    def write_foreign_keys(self, rows):
+        db = self._connect()
+        try:
+            with db:
+                db.execute("DELETE FROM foreign_keys")
+                db.executemany("INSERT INTO foreign_keys VALUES (?, ?, ?, ?, ?, ?)", rows)
+        finally:
+            db.close()
+
+    def load_lineage(self, index):
+        if not self.exists():
+            return False
+        db = self._connect()
+        try:
+            rows = db.execute("SELECT object_id, name, modify_date, data FROM lineage").fetchall()
+        finally:
+            db.close()
+        # Sin filas, o guardadas con el nombre de vista sin esquema: recarga completa
+        if not rows or any("." not in name for _, name, _, _ in rows):
+            return False
+        index.load_records({oid: (name, modify_date, json.loads(data)) for oid, name, modify_date, data in rows})
+        return True
+
+    def write_lineage(self, delta):
+        db = self._connect()
+        try:
+            with db:
+                if delta['full']:
+                    db.execute("DELETE FROM lineage")
+                else:
+                    db.executemany("DELETE FROM lineage WHERE object_id = ?", [(oid,) for oid in delta['removed']])
+                db.executemany("INSERT OR REPLACE INTO lineage VALUES (?, ?, ?, ?)",
+                               [(oid, name, modify_date, json.dumps(data))
+                                for oid, (name, modify_date, data) in delta['records'].items()])
+        finally:
+            db.close()
+
+# ========== INSTRUMENTACIÓN ==========
+# Opcional (--profile o el panel de rendimiento): mide cada execute/fetch y
+# los manejadores de la interfaz. Desactivado solo cuesta comprobar enabled.
+class Profiler:
+    MAX_EVENTS = 100000
+    SAMPLES = 5000
+    SQL_CHARS = 300
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.events = deque(maxlen=self.MAX_EVENTS)
+            # (categoría, nombre) -> [n, total, máximo, muestras recientes]
+            self._stats = {}
+
+    def record(self, category, name, start, duration, args=None):
+        with self._lock:
+            self.events.append((category, name, start - self._origin, duration, threading.get_ident(), args))
+            stat = self._stats.get((category, name))
+            if stat is None:
+                stat = self._stats[(category, name)] = [0, 0.0, 0.0, deque(maxlen=self.SAMPLES)]
+            stat[0] += 1
+            stat[1] += duration
+            stat[2] = max(stat[2], duration)
+            stat[3].append(duration)
+
+    @contextmanager
+    def span(self, category, name, args=None):
+        if not self.enabled:
+            yield args
+            return
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            self.record(category, name, start, time.perf_counter() - start, args)
+
+    def wrap(self, category, name, func):
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            with self.span(category, name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def stats(self):
+        # [(categoría, nombre, n, p50, p95, total, máximo)] en segundos, por total descendente
+        with self._lock:
+            items = [(key, stat[0], stat[1], stat[2], sorted(stat[3])) for key, stat in self._stats.items()]
+        rows = []
+        for (category, name), count, total, peak, samples in items:
+            p50 = samples[(len(samples) - 1) // 2]
+            p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+            rows.append((category, name, count, p50, p95, total, peak))
+        return sorted(rows, key=lambda r: -r[5])
+
+    def chrome_trace(self):
+        # Formato Trace Event (chrome://tracing, Perfetto): eventos completos "X" en µs
+        with self._lock:
+            events = list(self.events)
+        return {
+            'traceEvents': [{'name': name, 'cat': category, 'ph': "X", 'ts': round(start * 1e6, 1),
+                             'dur': round(duration * 1e6, 1), 'pid': os.getpid(), 'tid': tid,
+                             'args': args or {}}
+                            for category, name, start, duration, tid, args in events],
+            'displayTimeUnit': "ms",
+        }
+
+    def export_chrome_trace(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+
+class TracedCursor:
+    # Envuelve un cursor pyodbc y registra cada execute/fetch con su SQL y filas
+    # En el panel se agrupa por el SQL abreviado; la traza lleva el texto completo (recortado a SQL_CHARS)
+    NAME_CHARS = 80
+
+    def __init__(self, cursor, profiler):
+        self._cursor = cursor
+        self._profiler = profiler
+        self._sql = ""
+        self._name = ""
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def execute(self, sql, *params):
+        self._sql = sql[:self._profiler.SQL_CHARS]
+        self._name = " ".join(sql.split())[:self.NAME_CHARS]
+        with self._profiler.span("execute", self._name, {'sql': self._sql, 'params': len(params)}):
+            self._cursor.execute(sql, *params)
+        return self
+
+    def _fetch(self, name, *args):
+        with self._profiler.span("fetch", self._name, {'sql': self._sql, 'method': name}) as info:
+            result = getattr(self._cursor, name)(*args)
+            info['rows'] = len(result) if isinstance(result, list) else int(result is not None)
+        return result
+
+    def fetchone(self):
+        return self._fetch("fetchone")
+
+    def fetchall(self):
+        return self._fetch("fetchall")
+
+    def fetchmany(self, size=None):
+        return self._fetch("fetchmany", size) if size is not None else self._fetch("fetchmany")
+
+class BrokenConnectionError(Exception):
+    # La operación falló y dejó la conexión en un estado que no se puede
+    # deshacer: el pool la descarta en lugar de devolverla, sin reintentar
+    pass
+
+class ConnectionManager:
+    # Pool pequeño de conexiones pyodbc. Cada operación pide su propio cursor;
+    # las conexiones inactivas se validan antes de reutilizarse y se reabren
+    # con reintentos y espera exponencial si el servidor las cerró.
+    VALIDATE_AFTER = 60
+    RETRIES = 3
+    BACKOFF = 0.5
+    ACQUIRE_TIMEOUT = 60
+
+    def __init__(self, conn_str, size=4, connect_timeout=15, query_timeout=120, profiler=None):
+        self.conn_str = conn_str
+        self.profiler = profiler
+        self.size = size
+        self.connect_timeout = connect_timeout
+        self.query_timeout = query_timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._active = {}
+        self._closed = False
+
+    @staticmethod
+    def is_disconnect(error):
+        # SQLSTATE 08xxx: errores de conexión (caída, conexión cerrada, etc.)
+        state = error.args[0] if getattr(error, "args", None) else ""
+        return isinstance(state, str) and state.startswith("08")
+
+    def _connect(self):
+        driver = require_pyodbc()
+        delay = self.BACKOFF
+        for attempt in range(self.RETRIES):
+            try:
+                connection = driver.connect(self.conn_str, timeout=self.connect_timeout)
+                connection.timeout = self.query_timeout
+                return connection
+            except driver.Error:
+                if attempt == self.RETRIES - 1:
+                    raise
+                time.sleep(delay)
+                delay *= 2
+
+    def _is_alive(self, connection):
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, connection):
+        with self._lock:
+            self._created -= 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        if self._closed:
+            raise RuntimeError("El pool de conexiones está cerrado")
+        while True:
+            try:
+                connection, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_create = self._created < self.size
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    try:
+                        return self._connect()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                try:
+                    connection, last_used = self._idle.get(timeout=self.ACQUIRE_TIMEOUT)
+                except queue.Empty:
+                    raise TimeoutError("No hay conexiones libres en el pool")
+            if time.monotonic() - last_used < self.VALIDATE_AFTER or self._is_alive(connection):
+                return connection
+            self._discard(connection)
+
+    def release(self, connection, broken=False):
+        if broken or self._closed:
+            self._discard(connection)
+        else:
+            self._idle.put((connection, time.monotonic()))
+
+    @contextmanager
+    def cursor(self, commit=False):
+        connection = self.acquire()
+        broken = False
+        thread_id = threading.get_ident()
+        try:
+            cursor = connection.cursor()
+            self._active[thread_id] = cursor
+            if self.profiler is not None and self.profiler.enabled:
+                cursor = TracedCursor(cursor, self.profiler)
+            yield cursor
+            if commit:
+                connection.commit()
+        except Exception as e:
+            broken = self.is_disconnect(e) or isinstance(e, BrokenConnectionError)
+            if not broken:
+                try:
+                    connection.rollback()
+                except Exception:
+                    broken = True
+            raise
+        finally:
+            self._active.pop(thread_id, None)
+            self.release(connection, broken)
+
+    def run(self, func, commit=False):
+        # Ejecuta func(cursor); si la conexión se cayó, reintenta con otra nueva
+        for attempt in range(self.RETRIES):
+            try:
+                with self.cursor(commit=commit) as cursor:
+                    return func(cursor)
+            except Exception as e:
+                if not self.is_disconnect(e) or attempt == self.RETRIES - 1:
+                    raise
+                time.sleep(self.BACKOFF * 2 ** attempt)
+
+    def cancel(self, thread_id=None):
+        targets = list(self._active.values()) if thread_id is None else [self._active.get(thread_id)]
+        for cursor in targets:
+            if cursor is not None:
+                cursor.cancel()
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(connection)
+
+class DBTask:
+    def __init__(self, task_id, description, on_success, on_error, timeout, on_cancel, on_progress=None):
+        self.id = task_id
+        self.description = description
+        self.on_success = on_success
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.timeout = timeout
+        self.on_cancel = on_cancel
+        self.started = time.monotonic()
+        self.cancelled = False
+        self.future = None
+        self.thread_id = None
+
+class DBWorker:
+    # Ejecuta el acceso a la base de datos fuera del hilo de Tk. Los resultados
+    # vuelven por una cola que se drena con root.after, así que los callbacks
+    # siempre corren en el hilo de la interfaz.
+    POLL_MS = 50
+
+    def __init__(self, root, max_workers=1, on_busy=None, profiler=None):
+        self.root = root
+        self.profiler = profiler or Profiler()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+        self.results = queue.Queue()
+        self.pending = {}
+        self.on_busy = on_busy
+        self._ids = itertools.count(1)
+        self._polling = False
+
+    def submit(self, func, *args, on_success=None, on_error=None, timeout=None, on_cancel=None, description="",
+               on_progress=None):
+        # Con on_progress, func recibe como último argumento report(valor), que
+        # entrega resultados parciales al hilo de Tk mientras la tarea sigue en curso
+        task = DBTask(next(self._ids), description, on_success, on_error, timeout, on_cancel, on_progress)
+        if on_progress is not None:
+            args = args + (lambda value: self.results.put((task, value, None, False)),)
+        self.pending[task.id] = task
+        task.future = self.executor.submit(self._run, task, func, args)
+        self._notify()
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.POLL_MS, self._poll)
+        return task
+
+    def _run(self, task, func, args):
+        if task.cancelled:
+            return
+        task.thread_id = threading.get_ident()
+        try:
+            with self.profiler.span("task", task.description or getattr(func, "__name__", "tarea")):
+                result = func(*args)
+            self.results.put((task, result, None, True))
+        except Exception as e:
+            self.results.put((task, None, e, True))
+
+    def _poll(self):
+        while True:
+            try:
+                task, result, error, done = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if not done:
+                if task.id in self.pending:
+                    task.on_progress(result)
+                continue
+            # Ignorar resultados de tareas canceladas o vencidas
+            if self.pending.pop(task.id, None) is None:
+                continue
+            if error is not None:
+                self._fail(task, error)
+            elif task.on_success:
+                task.on_success(result)
+
+        now = time.monotonic()
+        for task in [t for t in self.pending.values() if t.timeout and now - t.started > t.timeout]:
+            self._cancel(task)
+            self._fail(task, TimeoutError(f"La operación '{task.description}' superó {task.timeout} s"))
+
+        self._notify()
+        if self.pending:
+            self.root.after(self.POLL_MS, self._poll)
+        else:
+            self._polling = False
+
+    def _fail(self, task, error):
+        if task.on_error:
+            task.on_error(error)
+        else:
+            messagebox.showerror("Error de base de datos", str(error))
+
+    def _cancel(self, task):
+        self.pending.pop(task.id, None)
+        task.cancelled = True
+        if task.future is not None and not task.future.cancel() and task.on_cancel:
+            # Ya está en ejecución: pedir al driver que aborte la consulta
+            try:
+                task.on_cancel(task)
+            except Exception:
+                pass
+
+    def cancel(self, task=None):
+        for t in ([task] if task else list(self.pending.values())):
+            self._cancel(t)
+        self._notify()
+
+    def busy(self):
+        return bool(self.pending)
+
+    def _notify(self):
+        if self.on_busy:
+            # Las tareas sin descripción (vigilancia de fondo) no ocupan la barra de estado
+            self.on_busy([t.description for t in self.pending.values() if t.description])
+
+    def shutdown(self):
+        self.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+# ========== MODELO DE VISTA Y COMPILADOR SQL ==========
+# Representación de una vista independiente de Tkinter: la interfaz solo
+# construye un ViewSpec y compile_view_sql lo convierte en T-SQL.
+
+class JoinSpec:
+    def __init__(self, table, main_fk, related_pk, alias, columns=None, join_type="LEFT", condition=None,
+                 parent=None):
+        self.table = table
+        self.main_fk = main_fk
+        self.related_pk = related_pk
+        self.alias = alias
+        # [(columna, alias de columna)]; la columna '*' se expande con el catálogo
+        self.columns = [tuple(c) for c in (columns or [])]
+        self.join_type = join_type
+        # Condición ON literal cuando no es una igualdad simple de claves
+        self.condition = condition
+        # Alias del JOIN del que cuelga (copo de nieve); None = tabla principal
+        self.parent = parent
+
+    def to_dict(self):
+        data = {
+            'table': self.table,
+            'main_fk': self.main_fk,
+            'related_pk': self.related_pk,
+            'alias': self.alias,
+            'columns': [list(c) for c in self.columns],
+            'join_type': self.join_type,
+        }
+        if self.condition:
+            data['condition'] = self.condition
+        if self.parent:
+            data['parent'] = self.parent
+        return data
+
+    @classmethod
+    def from_dict(cls, data, index=0):
+        table = data['table']
+        columns = []
+        for col in data.get('columns', []):
+            # Acepta "columna" o ["columna", "alias"]
+            if isinstance(col, str):
+                columns.append((col, f"{short_table_name(table)}_{col}"))
+            else:
+                columns.append((col[0], col[1] if len(col) > 1 and col[1] else f"{short_table_name(table)}_{col[0]}"))
+        return cls(table, data.get('main_fk'), data.get('related_pk'), data.get('alias') or default_join_alias(table, index),
+                   columns, data.get('join_type', "LEFT"), data.get('condition'), data.get('parent'))
+
+class ViewSpec:
+    def __init__(self, fact_table, fact_columns=None, joins=None, name=None, fact_alias="f",
+                 expressions=None, tail=None, select_modifier=None):
+        self.name = name
+        self.fact_table = fact_table
+        self.fact_alias = fact_alias
+        self.fact_columns = list(fact_columns or [])
+        self.joins = list(joins or [])
+        # Partes que no encajan en el modelo y se conservan literalmente:
+        # expresiones del SELECT [(expresión, alias)], DISTINCT/TOP y lo que
+        # sigue a los JOIN (WHERE, GROUP BY, ...)
+        self.expressions = [tuple(e) for e in (expressions or [])]
+        self.tail = tail
+        self.select_modifier = select_modifier
+
+    def referenced_tables(self):
+        return [self.fact_table] + [j.table for j in self.joins]
+
+    def to_dict(self):
+        data = {
+            'name': self.name,
+            'fact_table': self.fact_table,
+            'fact_alias': self.fact_alias,
+            'fact_columns': list(self.fact_columns),
+            'joins': [j.to_dict() for j in self.joins],
+        }
+        if self.expressions:
+            data['expressions'] = [list(e) for e in self.expressions]
+        if self.tail:
+            data['tail'] = self.tail
+        if self.select_modifier:
+            data['select_modifier'] = self.select_modifier
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data.get('fact_table'):
+            raise ValueError("La especificación no tiene 'fact_table'")
+        joins = [JoinSpec.from_dict(j, i) for i, j in enumerate(data.get('joins', []))]
+        expressions = [(e, None) if isinstance(e, str) else (e[0], e[1] if len(e) > 1 else None)
+                       for e in data.get('expressions', [])]
+        return cls(data['fact_table'], data.get('fact_columns', []), joins, data.get('name'), data.get('fact_alias', "f"),
+                   expressions, data.get('tail'), data.get('select_modifier'))
+
+def short_table_name(table):
+    # Última parte de base.esquema.tabla, sin corchetes
+    return re.sub(r"[\[\]]", "", table).rsplit(".", 1)[-1].strip()
+
+def quote_table(name):
+    # base.esquema.tabla con corchetes en cada parte, para que el SQL generado
+    # no dependa del esquema por defecto del usuario
+    parts = [t.name for t in tokenize_sql(name) if t.kind in ("ident", "qident")]
+    if not parts:
+        return name
+    return ".".join("[" + p.replace("]", "]]") + "]" for p in parts)
+
+def default_join_alias(table, index):
+    return short_table_name(table)[:3] + str(index)
+
+def quote_alias(alias):
+    return "[" + alias.strip().strip("[]") + "]"
+
+def order_joins(spec):
+    # Orden estable en el que cada JOIN aparece después de aquel del que cuelga
+    # (solo se mueven los que aparecen antes que su padre)
+    ordered = []
+    placed = {spec.fact_alias.lower()}
+    pending = []
+    for join in spec.joins:
+        pending.append(join)
+        progress = True
+        while progress:
+            progress = False
+            for j in list(pending):
+                if (j.parent or spec.fact_alias).lower() in placed:
+                    ordered.append(j)
+                    placed.add(j.alias.lower())
+                    pending.remove(j)
+                    progress = True
+    if pending:
+        j = pending[0]
+        raise ValueError(f"El JOIN con {j.table} ({j.alias}) cuelga de '{j.parent}', que no está en la vista")
+    return ordered
+
+def canonicalize_joins(spec, is_unique=None, dropped=None):
+    # Une los JOIN repetidos (misma tabla, tipo, claves y padre) en un solo alias
+    # que proyecta todas las columnas pedidas, y quita los LEFT JOIN que no
+    # proyectan nada ni se usan en expresiones, condiciones o WHERE/GROUP BY.
+    # Solo si is_unique(tabla, columnas) confirma que la clave es única: un LEFT
+    # JOIN a una clave repetida multiplica filas aunque no proyecte nada.
+    # Los JOIN quitados se añaden a dropped.
+    renamed = {}
+    merged = []
+    by_key = {}
+    for j in order_joins(spec):
+        parent = renamed.get((j.parent or "").lower(), j.parent)
+        condition = rename_qualifiers(j.condition, renamed) if j.condition else None
+        key = None
+        if not condition and j.join_type != "CROSS":
+            key = (j.table.lower(), (parent or "").lower(), j.join_type, (j.main_fk or "").lower(), (j.related_pk or "").lower())
+        target = by_key.get(key) if key else None
+        if target is not None:
+            target.columns.extend(c for c in j.columns if c not in target.columns)
+            renamed[j.alias.lower()] = target.alias
+            continue
+        join = JoinSpec(j.table, j.main_fk, j.related_pk, j.alias, j.columns, j.join_type, condition, parent)
+        merged.append(join)
+        if key:
+            by_key[key] = join
+
+    expressions = [(rename_qualifiers(e, renamed), alias) for e, alias in spec.expressions]
+    tail = rename_qualifiers(spec.tail, renamed) if spec.tail else spec.tail
+
+    used = referenced_aliases([e for e, _ in expressions] + [tail or ""])
+    for j in merged:
+        used.update(referenced_aliases([j.condition or ""]) - {j.alias.lower()})
+    keep = {j.alias.lower() for j in merged if j.columns or j.join_type != "LEFT" or j.alias.lower() in used
+            or j.condition or is_unique is None or not is_unique(j.table, [j.related_pk])}
+    parents = {j.alias.lower(): (j.parent or "").lower() for j in merged}
+    for key in list(keep):
+        while parents.get(key):
+            key = parents[key]
+            keep.add(key)
+
+    if dropped is not None:
+        dropped.extend(j for j in merged if j.alias.lower() not in keep)
+    return ViewSpec(spec.fact_table, spec.fact_columns, [j for j in merged if j.alias.lower() in keep], spec.name,
+                    spec.fact_alias, expressions, tail, spec.select_modifier)
+
+def dropped_joins_note(dropped):
+    return "JOIN sin uso quitados (clave única, no cambian las filas): " + ", ".join(
+        f"{j.alias} → {j.table}" for j in dropped)
+
+def compile_view_sql(spec, columns_for=None, is_unique=None, dropped=None):
+    # columns_for(tabla) -> columnas; solo se usa para expandir '*'.
+    # is_unique y dropped: ver canonicalize_joins
+    spec = canonicalize_joins(spec, is_unique, dropped)
+    select_parts = [f"{spec.fact_alias}.{quote_name(col)}" for col in spec.fact_columns]
+    select_parts.extend(f"{expr} AS {quote_alias(alias)}" if alias else expr for expr, alias in spec.expressions)
+    joins = []
+    for j in order_joins(spec):
+        for col, col_alias in j.columns:
+            if col == "*":
+                if columns_for is None:
+                    raise ValueError(f"No se pueden expandir las columnas de {j.table} sin catálogo")
+                select_parts.extend(f"{j.alias}.{quote_name(c)} AS [{short_table_name(j.table)}_{c}]"
+                                    for c in columns_for(j.table))
+            else:
+                select_parts.append(f"{j.alias}.{quote_name(col)} AS "
+                                    f"{quote_alias(col_alias or f'{short_table_name(j.table)}_{col}')}")
+        if j.join_type == "CROSS":
+            joins.append(f"CROSS JOIN {quote_table(j.table)} {j.alias}")
+        elif j.condition:
+            joins.append(f"{j.join_type} JOIN {quote_table(j.table)} {j.alias} ON {j.condition}")
+        else:
+            joins.append(f"{j.join_type} JOIN {quote_table(j.table)} {j.alias} ON "
+                         f"{j.parent or spec.fact_alias}.{quote_name(j.main_fk)} = {j.alias}.{quote_name(j.related_pk)}")
+
+    if not select_parts:
+        raise ValueError("La vista no tiene columnas")
+
+    head = f"SELECT {spec.select_modifier}" if spec.select_modifier else "SELECT"
+    sql = (
+        head + "\n    " + ",\n    ".join(select_parts) +
+        f"\nFROM {quote_table(spec.fact_table)} {spec.fact_alias}\n" +
+        "\n".join(joins)
+    )
+    if spec.tail:
+        sql += "\n" + spec.tail
+    return sql
+
+# ========== REVISIÓN DE RENDIMIENTO DE LOS JOIN ==========
+# Reglas sobre metadatos en caché (IndexCatalog); no consulta el servidor.
+STRING_TYPES = {"char", "varchar", "text"}
+NSTRING_TYPES = {"nchar", "nvarchar", "ntext"}
+INTEGER_TYPES = {"tinyint", "smallint", "int", "bigint"}
+NUMERIC_TYPES = INTEGER_TYPES | {"decimal", "numeric", "float", "real", "money", "smallmoney", "bit"}
+
+class LintIssue:
+    LABELS = {"error": "⛔ Error", "warning": "⚠ Aviso", "info": "ℹ Info"}
+
+    def __init__(self, severity, join, message, ddl=None):
+        self.severity = severity
+        self.join = join
+        self.message = message
+        self.ddl = ddl
+
+    def __str__(self):
+        return f"{self.LABELS[self.severity]} [{self.join}] {self.message}"
+
+def index_name(prefix, table, columns):
+    return re.sub(r"\W", "", f"{prefix}_{table.rsplit('.', 1)[-1]}_{'_'.join(columns)}")
+
+def lint_join_types(issues, label, parent_table, main_fk, table, related_pk, catalog, indexes):
+    left = indexes.column(parent_table, main_fk)
+    right = indexes.column(table, related_pk)
+    if left is None or right is None:
+        # Sin metadatos exactos: comparar el DATA_TYPE del catálogo
+        left_type = {k.lower(): v for k, v in catalog.get_column_types(parent_table).items()}.get(main_fk.lower())
+        right_type = {k.lower(): v for k, v in catalog.get_column_types(table).items()}.get(related_pk.lower())
+        if not left_type or not right_type:
+            return
+        left, right = (left_type.lower(), left_type.lower(), True), (right_type.lower(), right_type.lower(), True)
+    if left[0] == right[0]:
+        return
+    pair = f"{parent_table}.{main_fk} ({left[1]}) = {table}.{related_pk} ({right[1]})"
+    ddl = (f"ALTER TABLE {indexes.qualified_name(parent_table) or quote_table(parent_table)} ALTER COLUMN {quote_name(main_fk)} {right[1]} "
+           f"{'NULL' if left[2] else 'NOT NULL'};")
+    kinds = {left[0], right[0]}
+    if kinds <= STRING_TYPES | NSTRING_TYPES:
+        issues.append(LintIssue("warning", label, f"varchar/nvarchar distintos en {pair}: conversión implícita "
+                                "a nvarchar; el índice del lado varchar no admite seek", ddl))
+    elif kinds <= INTEGER_TYPES:
+        issues.append(LintIssue("warning", label, f"Enteros de distinto tamaño en {pair}: conversión implícita", ddl))
+    elif kinds & NUMERIC_TYPES and kinds & (STRING_TYPES | NSTRING_TYPES):
+        issues.append(LintIssue("error", label, f"Número contra texto en {pair}: conversión fila a fila y "
+                                "posibles errores de conversión", ddl))
+    else:
+        issues.append(LintIssue("warning", label, f"Tipos distintos en {pair}", ddl))
+
+def lint_view_spec(spec, catalog, indexes):
+    # Revisa cada JOIN por clave: índice en la dimensión, unicidad (multiplicación
+    # de filas), tipos compatibles y estadísticas en la columna de la tabla principal
+    issues = []
+    tables = {spec.fact_alias.lower(): spec.fact_table}
+    tables.update((j.alias.lower(), j.table) for j in spec.joins)
+    for j in spec.joins:
+        if j.join_type == "CROSS" or j.condition or not j.main_fk or not j.related_pk:
+            continue
+        parent_table = tables.get((j.parent or spec.fact_alias).lower(), spec.fact_table)
+        label = f"{j.alias} → {j.table}"
+        lint_join_types(issues, label, parent_table, j.main_fk, j.table, j.related_pk, catalog, indexes)
+        if not indexes.loaded or not indexes.has_table(j.table):
+            continue  # sin metadatos o es una vista
+
+        target = f"{j.table}.{j.related_pk}"
+        unique = indexes.is_unique(j.table, [j.related_pk])
+        if not unique:
+            ddl = (f"ALTER TABLE {indexes.qualified_name(j.table)} ADD CONSTRAINT "
+                   f"{index_name('UQ', j.table, [j.related_pk])} UNIQUE ({quote_name(j.related_pk)});")
+            detail = "" if indexes.is_leading(j.table, j.related_pk) else " y sin índice: recorre toda la tabla"
+            issues.append(LintIssue("warning", label, f"{target} no es PK ni único{detail}; cada valor repetido "
+                                    "duplica filas de la tabla principal", ddl))
+
+        if indexes.has_table(parent_table):
+            source = f"{parent_table}.{j.main_fk}"
+            if not indexes.is_leading(parent_table, j.main_fk):
+                ddl = (f"CREATE NONCLUSTERED INDEX {index_name('IX', parent_table, [j.main_fk])} "
+                       f"ON {indexes.qualified_name(parent_table)} ({quote_name(j.main_fk)});")
+                issues.append(LintIssue("info", label, f"{source} no tiene índice; útil si la vista se filtra "
+                                        "o se refresca de forma incremental", ddl))
+            if not indexes.has_stats(parent_table, j.main_fk):
+                ddl = (f"CREATE STATISTICS {index_name('ST', parent_table, [j.main_fk])} "
+                       f"ON {indexes.qualified_name(parent_table)} ({quote_name(j.main_fk)});")
+                issues.append(LintIssue("warning", label, f"{source} no tiene estadísticas: el optimizador "
+                                        "estima a ciegas la cardinalidad del JOIN", ddl))
+    order = {"error": 0, "warning": 1, "info": 2}
+    return sorted(issues, key=lambda i: order[i.severity])
+
+def lint_report(issues):
+    lines = [str(issue) for issue in issues]
+    ddl = [issue.ddl for issue in issues if issue.ddl]
+    if ddl:
+        lines += ["", "-- DDL sugerido"] + list(dict.fromkeys(ddl))
+    return "\n".join(lines)
+
+# ---------- Cardinalidad estimada ----------
+class JoinEstimate:
+    def __init__(self, join, fanout, rows, note, flagged=False):
+        self.join = join
+        self.fanout = fanout
+        self.rows = rows
+        self.note = note
+        self.flagged = flagged
+
+class CardinalityEstimate:
+    def __init__(self):
+        self.rows = None
+        self.width = 0
+        self.exact = True  # False si algún JOIN o columna no tiene cifras
+        self.joins = {}
+        self.distinct = []
+
+    @property
+    def size(self):
+        return self.rows * self.width if self.rows is not None else None
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+def join_key_columns(j):
+    # Columnas de la tabla relacionada que intervienen en el ON
+    if j.condition:
+        return list(dict.fromkeys(c for q, c in qualified_references([j.condition])
+                                  if q.lower() == j.alias.lower() and c not in (None, "*")))
+    return [j.related_pk] if j.related_pk else []
+
+def estimate_view_cardinality(spec, catalog, indexes):
+    # Filas de la tabla principal multiplicadas por las filas por valor de
+    # clave de cada JOIN (1 si la clave es única). Los JOIN repetidos que el
+    # compilador une cuentan una sola vez; joins se indexa por alias.
+    estimate = CardinalityEstimate()
+    rows = indexes.row_count(spec.fact_table)
+    if rows is None:
+        estimate.exact = False
+    seen = {}
+    for j in order_joins(spec):
+        key = (j.table.lower(), (j.parent or "").lower(), j.join_type, (j.main_fk or "").lower(),
+               (j.related_pk or "").lower(), j.condition or "")
+        if key in seen:
+            estimate.joins[j.alias.lower()] = seen[key]
+            continue
+        columns = join_key_columns(j)
+        if j.join_type == "CROSS":
+            fanout = indexes.row_count(j.table)
+            note, flagged = "CROSS JOIN: producto cartesiano", True
+        elif not indexes.has_table(j.table):
+            fanout, note, flagged = None, "sin metadatos (¿vista?)", False
+        elif not columns:
+            fanout, note, flagged = None, "condición sin claves reconocibles", False
+        else:
+            fanout = indexes.rows_per_key(j.table, columns)
+            if fanout == 1.0:
+                note, flagged = "clave única", False
+            elif fanout is None:
+                note, flagged = "clave no única y sin estadísticas: posible multiplicación de filas", True
+            else:
+                note = f"clave no única: ≈{fanout:,.1f} filas por valor"
+                flagged = fanout > 1.01
+        if fanout is None:
+            estimate.exact = False
+        elif rows is not None:
+            # INNER con clave única puede quitar filas; se toma el máximo
+            rows = rows * max(fanout, 1.0) if j.join_type != "CROSS" else rows * fanout
+        seen[key] = estimate.joins[j.alias.lower()] = JoinEstimate(j, fanout, rows, note, flagged)
+    estimate.rows = rows
+    estimate.distinct = list(seen.values())
+
+    def width(table, column):
+        info = indexes.column(table, column)
+        if info is None:
+            estimate.exact = False
+            return 0
+        return info[3]
+
+    for column in spec.fact_columns:
+        names = catalog.get_columns(spec.fact_table) if column == "*" else [column]
+        estimate.width += sum(width(spec.fact_table, c) for c in names)
+    # El ancho suma las columnas de todos los JOIN, también de los que se unen
+    # a otro: distinct solo sirve para no multiplicar las filas dos veces
+    for j in spec.joins:
+        for column, _ in j.columns:
+            names = catalog.get_columns(j.table) if column == "*" else [column]
+            estimate.width += sum(width(j.table, c) for c in names)
+    if spec.expressions:
+        estimate.exact = False
+    return estimate
+
+def cardinality_summary(estimate):
+    approx = "≈ " if estimate.exact else "≥ "
+    rows = f"{approx}{estimate.rows:,.0f} filas" if estimate.rows is not None else "Filas desconocidas"
+    text = f"{rows} · {estimate.width:,} B/fila"
+    if estimate.size is not None:
+        text += f" · {approx}{format_bytes(estimate.size)}"
+    flagged = sum(1 for e in estimate.distinct if e.flagged)
+    if flagged:
+        text += f" · ⚠ {flagged} JOIN con fan-out"
+    return text
+
+# ========== VISTAS INDEXADAS (SCHEMABINDING) ==========
+# Opciones SET que exige SQL Server al crear la vista y su índice
+INDEXED_VIEW_SET_OPTIONS = [
+    "SET ANSI_NULLS ON", "SET QUOTED_IDENTIFIER ON", "SET ANSI_PADDING ON", "SET ANSI_WARNINGS ON",
+    "SET ARITHABORT ON", "SET CONCAT_NULL_YIELDS_NULL ON", "SET NUMERIC_ROUNDABORT OFF",
+]
+NONDETERMINISTIC_FUNCTIONS = {
+    "GETDATE", "GETUTCDATE", "SYSDATETIME", "SYSUTCDATETIME", "SYSDATETIMEOFFSET", "CURRENT_TIMESTAMP",
+    "NEWID", "NEWSEQUENTIALID", "RAND", "CURRENT_USER", "SESSION_USER", "SYSTEM_USER", "USER_NAME",
+    "HOST_NAME", "APP_NAME", "DB_NAME", "ERROR_MESSAGE",
+}
+INDEXED_VIEW_FORBIDDEN = {
+    "SELECT": "subconsultas", "OVER": "funciones de ventana (OVER)", "UNION": "UNION", "EXCEPT": "EXCEPT",
+    "INTERSECT": "INTERSECT", "TOP": "TOP", "ORDER": "ORDER BY", "HAVING": "HAVING", "APPLY": "APPLY",
+    "PIVOT": "PIVOT", "UNPIVOT": "UNPIVOT", "TABLESAMPLE": "TABLESAMPLE", "OPENROWSET": "OPENROWSET",
+    "OPENQUERY": "OPENQUERY", "CONTAINS": "CONTAINS", "FREETEXT": "FREETEXT",
+    "GROUP": "GROUP BY (este modo solo materializa vistas sin agregación)",
+}
+AGGREGATE_FUNCTIONS = {"COUNT", "COUNT_BIG", "SUM", "AVG", "MIN", "MAX", "STDEV", "STDEVP", "VAR", "VARP"}
+
+def two_part_name(name, default_schema="dbo"):
+    parts = [t.name for t in tokenize_sql(name) if t.kind in ("ident", "qident")]
+    if len(parts) == 1:
+        parts.insert(0, default_schema)
+    return ".".join(quote_name(p) for p in parts[-2:])
+
+def indexed_view_expression_problems(texts):
+    problems = []
+    for text in texts:
+        tokens = list(tokenize_sql(text))
+        for i, token in enumerate(tokens):
+            word = token.keyword
+            if token.kind == "var" and token.value.startswith("@@"):
+                problems.append(f"{token.value} no es determinista")
+            elif word in NONDETERMINISTIC_FUNCTIONS:
+                problems.append(f"{word} no es determinista")
+            elif word in INDEXED_VIEW_FORBIDDEN:
+                problems.append(f"No se permiten {INDEXED_VIEW_FORBIDDEN[word]}")
+            elif word in AGGREGATE_FUNCTIONS and i + 1 < len(tokens) and tokens[i + 1].value == "(":
+                problems.append(f"No se permiten agregados ({word}) sin GROUP BY")
+    return problems
+
+def plan_indexed_view(spec, view_name, catalog, indexes, fk_graph):
+    # Comprueba si la vista se puede materializar y devuelve (lotes SQL, problemas, notas).
+    # Cada problema es una regla incumplida explicada para el usuario.
+    if not indexes.loaded or not fk_graph.loaded:
+        return [], ["Faltan los metadatos de índices y claves foráneas: conéctate a la base de datos"], []
+    problems = []
+    notes = []
+    if not view_name:
+        problems.append("Escribe el nombre de la vista")
+    spec = canonicalize_joins(spec, indexes.is_unique)
+    if spec.select_modifier:
+        problems.append(f"{spec.select_modifier} no está permitido en una vista indexada")
+
+    for table in spec.referenced_tables():
+        if len([t for t in tokenize_sql(table) if t.kind in ("ident", "qident")]) > 2:
+            problems.append(f"{table} está en otra base de datos")
+        elif indexes.qualified_name(table) is None:
+            problems.append(f"{table} no es una tabla base de esta base de datos (una vista indexada no puede usar vistas)")
+
+    tables = {spec.fact_alias.lower(): spec.fact_table}
+    tables.update((j.alias.lower(), j.table) for j in spec.joins)
+    join_types = {}
+    for j in spec.joins:
+        label = f"JOIN con {j.table} ({j.alias})"
+        parent_table = tables.get((j.parent or spec.fact_alias).lower(), spec.fact_table)
+        join_types[j.alias] = j.join_type
+        if j.join_type == "LEFT":
+            if j.condition:
+                problems.append(f"{label}: LEFT JOIN con condición literal; no se puede convertir a INNER")
+                continue
+            fk = fk_graph.find(parent_table, j.table, [(j.main_fk, j.related_pk)])
+            column = indexes.column(parent_table, j.main_fk)
+            if fk is None:
+                problems.append(f"{label}: LEFT JOIN sin FK declarada {parent_table}.{j.main_fk} → "
+                                f"{j.table}.{j.related_pk}; no se puede convertir a INNER")
+            elif not fk.trusted:
+                problems.append(f"{label}: la FK {fk.name} no es de confianza (WITH NOCHECK). Verifícala con "
+                                f"ALTER TABLE {indexes.qualified_name(parent_table) or quote_table(parent_table)} "
+                                f"WITH CHECK CHECK CONSTRAINT {quote_name(fk.name)}")
+            elif column is None or column[2]:
+                problems.append(f"{label}: {parent_table}.{j.main_fk} admite NULL; el LEFT JOIN conserva filas "
+                                "que un INNER JOIN perdería")
+            else:
+                join_types[j.alias] = "INNER"
+                notes.append(f"{label}: LEFT JOIN convertido a INNER (FK {fk.name} de confianza y NOT NULL)")
+        elif j.join_type != "INNER":
+            problems.append(f"{label}: {j.join_type} JOIN no está permitido en una vista indexada")
+            continue
+        if not j.condition and not indexes.is_unique(j.table, [j.related_pk]):
+            problems.append(f"{label}: {j.table}.{j.related_pk} no es único; las filas de la vista no se "
+                            f"pueden identificar por la clave de {spec.fact_table}")
+
+    problems.extend(indexed_view_expression_problems(
+        [e for e, _ in spec.expressions] + [spec.tail or ""] + [j.condition or "" for j in spec.joins]))
+
+    # El índice clustered único usa una clave única de la tabla principal proyectada en la vista
+    projected = {c.lower(): c for c in spec.fact_columns}
+    keys = indexes.unique_keys(spec.fact_table)
+    key = next((k for k in keys if all(c in projected for c in k)), None)
+    if key is None:
+        wanted = " o ".join("(" + ", ".join(k) + ")" for k in keys) or "una PK o índice único (no tiene ninguno)"
+        problems.append(f"Incluye en la vista la clave de {spec.fact_table}: {wanted}")
+
+    problems = list(dict.fromkeys(problems))
+    if problems:
+        return [], problems, notes
+
+    # Nombres en dos partes y columnas explícitas (SCHEMABINDING no admite '*')
+    joins = []
+    for j in spec.joins:
+        columns = []
+        for col, alias in j.columns:
+            if col == "*":
+                columns.extend((c, f"{short_table_name(j.table)}_{c}") for c in catalog.get_columns(j.table))
+            else:
+                columns.append((col, alias or f"{short_table_name(j.table)}_{col}"))
+        joins.append(JoinSpec(indexes.qualified_name(j.table), j.main_fk, j.related_pk, j.alias, columns,
+                              join_types[j.alias], j.condition, j.parent))
+    bound = ViewSpec(indexes.qualified_name(spec.fact_table), spec.fact_columns, joins, spec.name, spec.fact_alias,
+                     spec.expressions, spec.tail)
+    name = two_part_name(view_name)
+    index = quote_name(index_name("UCX", view_name, [projected[c] for c in key]))
+    return [
+        "\n".join(INDEXED_VIEW_SET_OPTIONS),
+        f"CREATE OR ALTER VIEW {name} WITH SCHEMABINDING AS\n{compile_view_sql(bound)}",
+        f"CREATE UNIQUE CLUSTERED INDEX {index} ON {name} ({', '.join(quote_name(projected[c]) for c in key)})",
+    ], [], notes
+
+# ========== TOKENIZADOR Y PARSER T-SQL ==========
+# Analiza en tiempo lineal el subconjunto de T-SQL que genera la herramienta
+# (y variantes razonables: corchetes, esquemas, comentarios, INNER JOIN,
+# funciones con comas) y lo convierte en un ViewSpec.
+
+TOKEN_RE = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<comment>--[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<string>N?'(?:[^']|'')*'?)
+  | (?P<qident>\[(?:[^\]]|\]\])*\]?|"(?:[^"]|"")*"?)
+  | (?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+)
+  | (?P<var>@@?[\w@$#]+)
+  | (?P<ident>[^\W\d][\w@$#]*|\#[\w@$#]*)
+  | (?P<op><>|!=|>=|<=|[-+*/%=<>(),.;~&|^!])
+  | (?P<other>.)
+""", re.VERBOSE | re.DOTALL)
+
+SQL_KEYWORDS = {
+    "ADD", "ALL", "ALTER", "AND", "ANY", "APPLY", "AS", "ASC", "BETWEEN", "BY", "CASE", "CAST", "CREATE",
+    "CROSS", "DESC", "DISTINCT", "ELSE", "END", "EXCEPT", "EXISTS", "FOR", "FROM", "FULL", "GROUP",
+    "HAVING", "IN", "INDEX", "INNER", "INTERSECT", "IS", "JOIN", "KEY", "LEFT", "LIKE", "NOT", "NULL",
+    "ON", "OPTION", "OR", "ORDER", "OUTER", "OVER", "PERCENT", "PRIMARY", "RIGHT", "SCHEMABINDING",
+    "SELECT", "SET", "TABLE", "THEN", "TOP", "UNION", "UNIQUE", "VIEW", "WHEN", "WHERE", "WITH",
+}
+
+class Token:
+    __slots__ = ("kind", "value", "start", "end")
+
+    def __init__(self, kind, value, start, end):
+        self.kind = kind
+        self.value = value
+        self.start = start
+        self.end = end
+
+    @property
+    def keyword(self):
+        return self.value.upper() if self.kind == "ident" else None
+
+    @property
+    def name(self):
+        # Valor de un identificador sin corchetes ni comillas
+        if self.kind == "qident":
+            close = "]" if self.value.startswith("[") else '"'
+            return self.value[1:].rstrip(close).replace(close * 2, close)
+        return self.value
+
+def tokenize_sql(sql, keep_comments=False):
+    for match in TOKEN_RE.finditer(sql):
+        kind = match.lastgroup
+        if kind == "ws" or (kind == "comment" and not keep_comments):
+            continue
+        yield Token(kind, match.group(), match.start(), match.end())
+
+def quote_name(name):
+    # Solo pone corchetes cuando el nombre los necesita
+    if re.fullmatch(r"[A-Za-z_][\w@$#]*", name) and name.upper() not in SQL_KEYWORDS:
+        return name
+    return "[" + name.replace("]", "]]") + "]"
+
+class SQLParseError(ValueError):
+    pass
+
+class ViewParser:
+    CLAUSE_END = {"WHERE", "GROUP", "HAVING", "ORDER", "UNION", "EXCEPT", "INTERSECT", "OPTION", "FOR"}
+    JOIN_START = {"JOIN", "INNER", "LEFT", "RIGHT", "FULL", "CROSS", "OUTER"}
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.tokens = list(tokenize_sql(sql))
+        self.pos = 0
+
+    # ---------- utilidades ----------
+    def peek(self, offset=0):
+        i = self.pos + offset
+        return self.tokens[i] if i < len(self.tokens) else None
+
+    def keyword(self, offset=0):
+        token = self.peek(offset)
+        return token.keyword if token else None
+
+    def is_op(self, value, offset=0):
+        token = self.peek(offset)
+        return token is not None and token.kind == "op" and token.value == value
+
+    def accept(self, *words):
+        if self.keyword() in words:
+            self.pos += 1
+            return True
+        return False
+
+    def expect(self, word):
+        if not self.accept(word):
+            token = self.peek()
+            found = token.value if token else "fin del texto"
+            raise SQLParseError(f"Se esperaba {word} y se encontró '{found}'")
+
+    def skip_parens(self):
+        depth = 0
+        while self.pos < len(self.tokens):
+            token = self.tokens[self.pos]
+            self.pos += 1
+            if token.kind == "op" and token.value == "(":
+                depth += 1
+            elif token.kind == "op" and token.value == ")":
+                depth -= 1
+                if depth == 0:
+                    return
+        raise SQLParseError("Paréntesis sin cerrar")
+
+    def text(self, first, last):
+        return self.sql[self.tokens[first].start:self.tokens[last].end]
+
+    def multipart_name(self):
+        parts = []
+        while True:
+            token = self.peek()
+            if token is None or token.kind not in ("ident", "qident"):
+                raise SQLParseError("Se esperaba un nombre de tabla")
+            parts.append(token.name)
+            self.pos += 1
+            if not self.is_op("."):
+                return parts
+            self.pos += 1
+
+    # ---------- gramática ----------
+    def parse(self):
+        if self.keyword() == "WITH":
+            raise SQLParseError("Las vistas con CTE (WITH ...) no están soportadas")
+        self._skip_header()
+        self.expect("SELECT")
+
+        modifier_start = self.pos
+        self.accept("ALL", "DISTINCT")
+        if self.accept("TOP"):
+            if self.is_op("("):
+                self.skip_parens()
+            else:
+                self.pos += 1
+            self.accept("PERCENT")
+            if self.keyword() == "WITH" and self.keyword(1) == "TIES":
+                self.pos += 2
+        modifier = self.text(modifier_start, self.pos - 1) if self.pos > modifier_start else None
+
+        items = self._select_items()
+        self.expect("FROM")
+        fact_table, fact_alias = self._table_source()
+
+        joins = []
+        while True:
+            join_type = self._join_type()
+            if join_type is None:
+                break
+            table, alias = self._table_source()
+            join = JoinSpec(table, None, None, alias, join_type=join_type)
+            if join_type != "CROSS":
+                self.expect("ON")
+                self._join_condition(join, fact_alias, joins)
+            joins.append(join)
+
+        tail = None
+        if self.pos < len(self.tokens):
+            tail = self.sql[self.tokens[self.pos].start:].strip().rstrip(";").strip() or None
+
+        spec = ViewSpec(fact_table, fact_alias=fact_alias, joins=joins,
+                        tail=tail, select_modifier=modifier)
+        self._assign_items(spec, items)
+        return spec
+
+    def _skip_header(self):
+        # CREATE [OR ALTER] VIEW nombre [(columnas)] [WITH opciones] AS
+        if self.keyword() not in ("CREATE", "ALTER"):
+            return
+        while self.pos < len(self.tokens) and self.keyword() != "VIEW":
+            self.pos += 1
+        self.expect("VIEW")
+        self.multipart_name()
+        if self.is_op("("):
+            self.skip_parens()
+        if self.accept("WITH"):
+            while self.pos < len(self.tokens) and self.keyword() != "AS":
+                self.pos += 1
+        self.expect("AS")
+
+    def _select_items(self):
+        items = []
+        depth = 0
+        start = self.pos
+        while True:
+            token = self.peek()
+            if token is None:
+                raise SQLParseError("No se encontró la cláusula FROM")
+            if token.kind == "op" and token.value == "(":
+                depth += 1
+            elif token.kind == "op" and token.value == ")":
+                depth -= 1
+            elif depth == 0 and (token.keyword == "FROM" or (token.kind == "op" and token.value == ",")):
+                if self.pos == start:
+                    raise SQLParseError("Elemento vacío en la lista SELECT")
+                items.append(self._select_item(start, self.pos))
+                if token.keyword == "FROM":
+                    return items
+                start = self.pos + 1
+            self.pos += 1
+
+    def _select_item(self, first, stop):
+        tokens = self.tokens[first:stop]
+        alias = None
+        # alias = expresión
+        if len(tokens) > 2 and tokens[0].kind in ("ident", "qident", "string") and tokens[1].kind == "op" and tokens[1].value == "=":
+            return ("expr", self.text(first + 2, stop - 1), self._alias_name(tokens[0]))
+        if len(tokens) > 2 and tokens[-2].keyword == "AS":
+            alias = self._alias_name(tokens[-1])
+            tokens = tokens[:-2]
+        elif len(tokens) > 1 and self._is_implicit_alias(tokens[-2], tokens[-1]):
+            alias = tokens[-1].name
+            tokens = tokens[:-1]
+
+        # Referencia simple a columna: [calificador.]columna (o esquema.tabla.columna)
+        names = tokens[0::2]
+        dots = tokens[1::2]
+        if (len(tokens) % 2 == 1 and all(t.kind in ("ident", "qident") for t in names)
+                and all(t.kind == "op" and t.value == "." for t in dots)
+                and not (len(names) == 1 and names[0].keyword in SQL_KEYWORDS)):
+            qualifier = names[-2].name if len(names) > 1 else None
+            return ("column", qualifier, names[-1].name, alias)
+        return ("expr", self.sql[tokens[0].start:tokens[-1].end], alias)
+
+    @staticmethod
+    def _alias_name(token):
+        if token.kind == "string":
+            return token.value[token.value.index("'") + 1:-1].replace("''", "'")
+        return token.name
+
+    @staticmethod
+    def _is_implicit_alias(previous, last):
+        if last.kind == "qident" or (last.kind == "ident" and last.keyword not in SQL_KEYWORDS):
+            return previous.kind in ("ident", "qident", "number", "string") or (previous.kind == "op" and previous.value == ")")
+        return False
+
+    def _table_source(self):
+        if self.is_op("("):
+            raise SQLParseError("Las subconsultas en FROM/JOIN no están soportadas")
+        parts = self.multipart_name()
+        table = ".".join(quote_name(p) for p in parts)
+        # Sin alias, las columnas se califican con el nombre de la tabla
+        alias = parts[-1]
+        self.accept("AS")
+        token = self.peek()
+        if token is not None and (token.kind == "qident" or (token.kind == "ident" and token.keyword not in SQL_KEYWORDS)):
+            alias = token.name
+            self.pos += 1
+        # Sugerencias de tabla WITH (NOLOCK): se ignoran
+        if self.keyword() == "WITH" and self.is_op("(", 1):
+            self.pos += 1
+            self.skip_parens()
+        return table, alias
+
+    def _join_type(self):
+        kw = self.keyword()
+        if kw == "JOIN":
+            self.pos += 1
+            return "INNER"
+        if kw in ("INNER", "CROSS") and self.keyword(1) == "JOIN":
+            self.pos += 2
+            return kw
+        if kw in ("LEFT", "RIGHT", "FULL"):
+            if self.keyword(1) == "JOIN":
+                self.pos += 2
+                return kw
+            if self.keyword(1) == "OUTER" and self.keyword(2) == "JOIN":
+                self.pos += 3
+                return kw
+        return None
+
+    def _join_condition(self, join, fact_alias, previous):
+        first = self.pos
+        depth = 0
+        while self.pos < len(self.tokens):
+            token = self.tokens[self.pos]
+            if token.kind == "op" and token.value == "(":
+                depth += 1
+            elif token.kind == "op" and token.value == ")":
+                depth -= 1
+            elif depth == 0 and (token.kind == "op" and token.value == ";"):
+                break
+            elif depth == 0 and (token.keyword in self.CLAUSE_END or
+                                 (token.keyword in self.JOIN_START and not self.is_op("(", 1))):
+                break
+            self.pos += 1
+        if self.pos == first:
+            raise SQLParseError(f"JOIN con {join.table} sin condición")
+
+        tokens = self.tokens[first:self.pos]
+        # Igualdad simple a.x = b.y entre la tabla del JOIN y la principal
+        # o un JOIN anterior (copo de nieve)
+        shape = [t.kind if t.kind != "op" else t.value for t in tokens]
+        if len(tokens) == 7 and shape[1] == "." and shape[3] == "=" and shape[5] == ".":
+            left = (tokens[0].name.lower(), tokens[2].name)
+            right = (tokens[4].name.lower(), tokens[6].name)
+            own = join.alias.lower()
+            parents = {j.alias.lower(): j.alias for j in previous}
+            parents[fact_alias.lower()] = None
+            if left[0] == own and right[0] in parents:
+                left, right = right, left
+            if left[0] in parents and right[0] == own:
+                join.main_fk, join.related_pk = left[1], right[1]
+                join.parent = parents[left[0]]
+                return
+        join.condition = self.text(first, self.pos - 1)
+
+    def _assign_items(self, spec, items):
+        # Búsquedas por hash: alias de JOIN -> JoinSpec
+        joins_by_alias = {j.alias.lower(): j for j in spec.joins}
+        fact = spec.fact_alias.lower()
+        for item in items:
+            if item[0] == "expr":
+                spec.expressions.append((item[1], item[2]))
+                continue
+            _, qualifier, column, alias = item
+            owner = qualifier.lower() if qualifier else (fact if not spec.joins else None)
+            if owner == fact and (alias is None or alias.lower() == column.lower()):
+                spec.fact_columns.append(column)
+            elif owner in joins_by_alias:
+                joins_by_alias[owner].columns.append((column, alias or column))
+            else:
+                text = f"{quote_name(qualifier)}.{quote_name(column)}" if qualifier else quote_name(column)
+                spec.expressions.append((text, alias))
+
+def parse_view_definition(sql):
+    return ViewParser(sql).parse()
+
+def qualified_references(texts):
+    # Pares (calificador, columna) de fragmentos SQL; columna None si no es un nombre
+    for text in texts:
+        tokens = list(tokenize_sql(text))
+        for i in range(len(tokens) - 1):
+            token, following = tokens[i], tokens[i + 1]
+            if token.kind in ("ident", "qident") and following.kind == "op" and following.value == ".":
+                name = tokens[i + 2] if i + 2 < len(tokens) else None
+                if name is not None and name.kind in ("ident", "qident"):
+                    yield token.name, name.name
+                elif name is not None and name.value == "*":
+                    yield token.name, "*"
+                else:
+                    yield token.name, None
+
+def rename_qualifiers(text, mapping):
+    # Cambia alias.columna por nuevo_alias.columna (mapping en minúsculas)
+    if not mapping:
+        return text
+    tokens = list(tokenize_sql(text))
+    parts = []
+    last = 0
+    for token, following in zip(tokens, tokens[1:]):
+        if (token.kind in ("ident", "qident") and following.kind == "op" and following.value == "."
+                and token.name.lower() in mapping):
+            parts.append(text[last:token.start])
+            parts.append(mapping[token.name.lower()])
+            last = token.end
+    parts.append(text[last:])
+    return "".join(parts)
+
+def referenced_aliases(texts):
+    # Calificadores usados en fragmentos SQL (alias.columna), en minúsculas
+    return {qualifier.lower() for qualifier, _ in qualified_references(texts)}
+
+def view_lineage(definition):
+    # Tablas, columnas y JOINs que usa una vista; solo datos serializables
+    try:
+        spec = parse_view_definition(definition or "")
+    except SQLParseError as e:
+        return {'tables': [], 'columns': [], 'joins': [], 'error': str(e)}
+    aliases = {spec.fact_alias.lower(): spec.fact_table}
+    aliases.update((j.alias.lower(), j.table) for j in spec.joins)
+    columns = [(spec.fact_table, c) for c in spec.fact_columns]
+    for j in spec.joins:
+        columns.extend((j.table, c) for c, _ in j.columns)
+        if j.main_fk:
+            columns.append((aliases.get((j.parent or spec.fact_alias).lower(), spec.fact_table), j.main_fk))
+        if j.related_pk:
+            columns.append((j.table, j.related_pk))
+    # Columnas calificadas dentro de expresiones, condiciones y WHERE/GROUP BY
+    texts = [e for e, _ in spec.expressions] + [spec.tail or ""] + [j.condition or "" for j in spec.joins]
+    for qualifier, column in qualified_references(texts):
+        table = aliases.get(qualifier.lower())
+        if table is not None and column is not None:
+            columns.append((table, column))
+    return {
+        'tables': spec.referenced_tables(),
+        'columns': [list(c) for c in dict.fromkeys((t, c) for t, c in columns)],
+        'joins': [[j.table, j.alias, j.join_type, j.main_fk, j.related_pk, j.parent] for j in spec.joins],
+        'error': None,
+    }
+
+def lineage_job(rows):
+    # Se ejecuta en un proceso del pool: (object_id, nombre, fecha, definición) -> linaje
+    return [(oid, name, modify_date, view_lineage(definition)) for oid, name, modify_date, definition in rows]
+
+def parse_lineage(rows, workers=1):
+    if workers > 1 and len(rows) >= LineageIndex.PARALLEL_MIN:
+        size = max(1, len(rows) // (workers * 4))
+        chunks = [rows[i:i + size] for i in range(0, len(rows), size)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = [r for chunk in executor.map(lineage_job, chunks) for r in chunk]
+    else:
+        parsed = lineage_job(rows)
+    return {oid: (name, modify_date, data) for oid, name, modify_date, data in parsed}
+
+class LineageIndex:
+    # Índices invertidos sobre todas las vistas de la base de datos:
+    # tabla -> vistas, (tabla, columna) -> vistas, columna -> vistas.
+    # Igual que SchemaCatalog: fetch_* en el hilo de trabajo, apply_* en el de Tk.
+    DEFINITIONS_QUERY = (
+        "SELECT v.object_id, CONCAT(OBJECT_SCHEMA_NAME(v.object_id), '.', v.name), v.modify_date, m.definition "
+        "FROM sys.views v "
+        "JOIN sys.sql_modules m ON m.object_id = v.object_id"
+    )
+    MARKERS_QUERY = "SELECT v.object_id, v.modify_date FROM sys.views v"
+    # Por debajo de este número de vistas no compensa arrancar procesos
+    PARALLEL_MIN = 200
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.records = {}
+        self._views = {}
+        self._by_table = {}
+        self._by_column = {}
+        self._by_name = {}
+        self._tables = TableNames()
+        self._view_names = TableNames()
+        self.loaded = False
+
+    def key(self, name):
+        # Tabla referenciada por alguna vista (esquema.tabla)
+        return self._tables.key(name)
+
+    def markers(self):
+        return {oid: record[1] for oid, record in self.records.items()}
+
+    # ---------- Lectura desde el servidor ----------
+    def fetch_changes(self, cursor, known=None):
+        # Solo las definiciones nuevas o modificadas; todas en una consulta si no hay nada conocido
+        known = self.markers() if known is None else known
+        if not known:
+            cursor.execute(self.DEFINITIONS_QUERY)
+            rows = cursor.fetchall()
+            return {'full': True, 'rows': [(r[0], r[1], str(r[2]), r[3]) for r in rows], 'removed': []}
+        cursor.execute(self.MARKERS_QUERY)
+        current = {r[0]: str(r[1]) for r in cursor.fetchall()}
+        changed = [oid for oid, modify_date in current.items() if known.get(oid) != modify_date]
+        removed = [oid for oid in known if oid not in current]
+        rows = []
+        for start in range(0, len(changed), SchemaCatalog.MAX_PARAMS):
+            chunk = changed[start:start + SchemaCatalog.MAX_PARAMS]
+            placeholders = ", ".join("?" for _ in chunk)
+            cursor.execute(self.DEFINITIONS_QUERY + f" WHERE v.object_id IN ({placeholders})", chunk)
+            rows.extend((r[0], r[1], str(r[2]), r[3]) for r in cursor.fetchall())
+        return {'full': False, 'rows': rows, 'removed': removed}
+
+    # ---------- Aplicación en memoria ----------
+    def apply_changes(self, delta):
+        if delta['full']:
+            self.clear()
+        for oid in delta['removed']:
+            self._remove(oid)
+        for oid, record in delta['records'].items():
+            self._remove(oid)
+            self._add(oid, record)
+        self.loaded = True
+
+    def load_records(self, records):
+        self.apply_changes({'full': True, 'records': records, 'removed': []})
+
+    def _entries(self, data):
+        # Las claves no dependen de qué otras vistas haya cargadas (sin esquema, dbo)
+        for table in data['tables']:
+            yield self._by_table, table_key(table)
+        for table, column in data['columns']:
+            column = column.lower()
+            yield self._by_column, (table_key(table), column)
+            yield self._by_name, column
+
+    def _add(self, oid, record):
+        self.records[oid] = record
+        self._views[self._view_names.add(record[0])] = oid
+        for table in record[2]['tables']:
+            self._tables.add(table)
+        for index, key in self._entries(record[2]):
+            index.setdefault(key, set()).add(oid)
+
+    def _remove(self, oid):
+        record = self.records.pop(oid, None)
+        if record is None:
+            return
+        key = table_key(record[0])
+        self._views.pop(key, None)
+        self._view_names.discard(key)
+        for index, key in self._entries(record[2]):
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(oid)
+                if not ids:
+                    del index[key]
+        for table in record[2]['tables']:
+            self._tables.discard(table_key(table))
+
+    # ---------- Consultas ----------
+    def _names(self, ids):
+        return sorted((self.records[oid][0] for oid in ids), key=str.lower)
+
+    def views_using(self, table, column=None):
+        key = self.key(table)
+        if column is None:
+            return self._names(self._by_table.get(key, ()))
+        column = SchemaCatalog.normalize(column)
+        # Una vista con tabla.* también usa cualquier columna de la tabla
+        return self._names(self._by_column.get((key, column), set()) | self._by_column.get((key, "*"), set()))
+
+    def search(self, text):
+        # "Tabla", "Tabla.Columna", "esquema.Tabla.Columna" o solo "Columna"
+        name = SchemaCatalog.normalize(text)
+        if not name:
+            return []
+        if self.key(name) in self._by_table:
+            return self.views_using(name)
+        if "." in name:
+            table, column = name.rsplit(".", 1)
+            return self.views_using(table, column)
+        return self._names(self._by_name.get(name, ()))
+
+    def lineage(self, view):
+        oid = self._views.get(self._view_names.key(view))
+        return self.records[oid][2] if oid is not None else None
+
+    def joins_of(self, view):
+        data = self.lineage(view)
+        return data['joins'] if data else []
+
+    def broken_views(self, catalog, views=None, dropped=()):
+        # Vistas cuyas columnas ya no existen en el catálogo. Una tabla que el
+        # catálogo no conoce solo cuenta si se sabe que se eliminó (dropped):
+        # puede ser de otra base de datos o un sinónimo.
+        dropped = {self.key(t) for t in dropped}
+        ids = self.records if views is None else [self._views[k] for k in map(self._view_names.key, views)
+                                                  if k in self._views]
+        broken = {}
+        for oid in ids:
+            name, _, data = self.records[oid]
+            missing = []
+            for table in data['tables']:
+                if self.key(table) in dropped and not catalog.has_table(table):
+                    missing.append(f"{table} (eliminada)")
+            for table, column in data['columns']:
+                if column != "*" and catalog.has_table(table) and not catalog.has_column(table, column):
+                    missing.append(f"{table}.{column}")
+            if missing:
+                broken[name] = list(dict.fromkeys(missing))
+        return broken
+
+    def errors(self):
+        return sorted(((r[0], r[2]['error']) for r in self.records.values() if r[2]['error']), key=lambda e: e[0].lower())
+
+# ========== PLANIFICADOR DE DESPLIEGUE ==========
+# CREATE OR ALTER VIEW recompila la vista, invalida sus planes en caché y
+# cambia el modify_date que vigilan los procesos posteriores, así que solo se
+# despliegan las vistas cuya definición cambia de verdad. Se comparan hashes
+# de la definición normalizada: sin comentarios, espacios, corchetes ni
+# mayúsculas en los nombres, y sin la cabecera CREATE [OR ALTER] VIEW nombre.
+
+def view_key(name):
+    return SchemaCatalog.normalize(two_part_name(name))
+
+def view_body(sql):
+    # Lo que sigue al nombre: (columnas), WITH opciones, AS y el SELECT
+    tokens = list(tokenize_sql(sql))
+    for i, token in enumerate(tokens):
+        if token.keyword == "VIEW":
+            i += 1
+            while i < len(tokens) and tokens[i].kind in ("ident", "qident"):
+                i += 1
+                if i < len(tokens) and tokens[i].value == ".":
+                    i += 1
+                else:
+                    break
+            return sql[tokens[i].start:] if i < len(tokens) else ""
+        if token.keyword not in ("CREATE", "OR", "ALTER"):
+            break
+    return sql
+
+SELECT_LIST_END = {"FROM", "WHERE", "GROUP", "HAVING", "ORDER", "UNION", "EXCEPT", "INTERSECT", "INTO", "OPTION"}
+
+def normalize_definition(sql):
+    # Identificadores en minúsculas, salvo los nombres de columna que ve quien
+    # consulta la vista: la lista (col, ...) de la cabecera y, en el SELECT
+    # exterior, el alias de cada columna (AS x, x implícito o x = expr) o, sin
+    # alias, su último identificador
+    tokens = list(tokenize_sql(view_body(sql)))
+    keep = set()
+    item = []
+
+    def close_item():
+        names = [i for i, d in item if d == 0 and tokens[i].kind in ("ident", "qident")
+                 and tokens[i].keyword not in SQL_KEYWORDS]
+        if names and not columns:
+            if len(item) > 1 and item[0][0] == names[0] and tokens[item[1][0]].value == "=":
+                keep.add(names[0])
+            else:
+                keep.add(names[-1])
+        item.clear()
+
+    depth = 0
+    # Con lista de columnas en la cabecera, los nombres del SELECT no se ven
+    header = columns = bool(tokens) and tokens[0].value == "("
+    in_select = False
+    for i, token in enumerate(tokens):
+        if token.value == "(":
+            depth += 1
+        elif token.value == ")":
+            depth -= 1
+            header = header and depth > 0
+        if header:
+            keep.add(i)
+        elif depth == 0 and token.keyword == "SELECT":
+            in_select = True
+        elif in_select and depth == 0 and (token.keyword in SELECT_LIST_END or token.value in (",", ";")):
+            close_item()
+            in_select = token.value == ","
+        elif in_select:
+            item.append((i, depth))
+    close_item()
+
+    parts = [(t.name if i in keep else t.name.lower()) if t.kind in ("ident", "qident") else t.value
+             for i, t in enumerate(tokens)]
+    while parts and parts[-1] == ";":
+        parts.pop()
+    return " ".join(parts)
+
+def definition_hash(sql):
+    return hashlib.sha1(normalize_definition(sql).encode("utf-8")).hexdigest()
+
+class DeployChange:
+    __slots__ = ("name", "sql", "deployed", "action")
+    LABELS = {"create": "+ crear", "alter": "~ modificar", "unchanged": "= sin cambios"}
+
+    def __init__(self, name, sql, deployed=None):
+        self.name = name
+        self.sql = sql
+        # Definición actual en sys.sql_modules (None si la vista no existe)
+        self.deployed = deployed
+        if deployed is None:
+            self.action = "create"
+        elif definition_hash(deployed) == definition_hash(sql):
+            self.action = "unchanged"
+        else:
+            self.action = "alter"
+
+    def diff(self, context=3):
+        old = view_body(self.deployed).strip().splitlines() if self.deployed else []
+        return list(difflib.unified_diff(old, view_body(self.sql).strip().splitlines(), f"{self.name} (desplegada)",
+                                         f"{self.name} (nueva)", n=context, lineterm=""))
+
+def view_select(sql):
+    # Solo el SELECT de una definición CREATE VIEW ... AS (o el texto tal cual si no la tiene)
+    body = view_body(sql)
+    if body is sql:
+        return sql.strip()
+    for token in tokenize_sql(body):
+        if token.keyword == "AS":
+            return body[token.end:].strip()
+    return body.strip()
+
+def side_by_side_diff(old, new):
+    # Para SideBySideDiff: (texto izquierdo, texto derecho, [marcas izquierda, marcas derecha])
+    # con las líneas alineadas (huecos en blanco) y marcas {tipo: [números de línea]}
+    old_lines, new_lines = old.splitlines(), new.splitlines()
+    left, right = [], []
+    marks = ({}, {})
+    for op, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old_lines, new_lines).get_opcodes():
+        if op == "equal":
+            left.extend(old_lines[i1:i2])
+            right.extend(new_lines[j1:j2])
+            continue
+        a, b = old_lines[i1:i2], new_lines[j1:j2]
+        for k in range(max(len(a), len(b))):
+            for lines, side, part in ((left, marks[0], a), (right, marks[1], b)):
+                lines.append(part[k] if k < len(part) else "")
+                side.setdefault(op if k < len(part) else "gap", []).append(len(lines))
+    return "\n".join(left), "\n".join(right), marks
+
+class DeployError(Exception):
+    # Fallo de una de las vistas del despliegue; la transacción entera se deshace
+    def __init__(self, view, error):
+        super().__init__(f"{view}: {type(error).__name__}: {error}")
+        self.view = view
+        self.error = error
+
+class DeployPlan:
+    # fetch lee las definiciones desplegadas (hilo de trabajo); execute lanza
+    # solo los cambios, todos en la transacción del cursor (commit al final)
+    DEFINITIONS_QUERY = (
+        "SELECT CONCAT(OBJECT_SCHEMA_NAME(v.object_id), '.', v.name), m.definition FROM sys.views v "
+        "JOIN sys.sql_modules m ON m.object_id = v.object_id"
+    )
+
+    def __init__(self, changes=()):
+        self.changes = list(changes)
+
+    @classmethod
+    def fetch(cls, cursor, statements):
+        # statements: [(nombre de la vista, CREATE OR ALTER VIEW ...)]
+        names = list(dict.fromkeys(two_part_name(name) for name, _ in statements))
+        deployed = {}
+        for start in range(0, len(names), SchemaCatalog.MAX_PARAMS):
+            chunk = names[start:start + SchemaCatalog.MAX_PARAMS]
+            placeholders = ", ".join("OBJECT_ID(?)" for _ in chunk)
+            cursor.execute(cls.DEFINITIONS_QUERY + f" WHERE v.object_id IN ({placeholders})", chunk)
+            deployed.update((view_key(name), definition) for name, definition in cursor.fetchall())
+        return cls(DeployChange(name, sql, deployed.get(view_key(name))) for name, sql in statements)
+
+    @property
+    def pending(self):
+        return [c for c in self.changes if c.action != "unchanged"]
+
+    def count(self, action):
+        return sum(1 for c in self.changes if c.action == action)
+
+    def execute(self, cursor):
+        for change in self.pending:
+            try:
+                cursor.execute(change.sql)
+            except Exception as e:
+                # Una conexión caída se deja tal cual para que el pool reintente
+                if ConnectionManager.is_disconnect(e):
+                    raise
+                raise DeployError(change.name, e) from e
+        return len(self.pending)
+
+    def summary(self):
+        return (f"Crear: {self.count('create')}  Modificar: {self.count('alter')}  "
+                f"Sin cambios: {self.count('unchanged')}")
+
+    def report(self, diff=True):
+        lines = []
+        for change in self.changes:
+            lines.append(f"{DeployChange.LABELS[change.action]} {change.name}")
+            if diff and change.action == "alter":
+                lines.extend("    " + line for line in change.diff())
+        lines.append(self.summary())
+        return "\n".join(lines)
+
+# ========== PLAN DE EJECUCIÓN ESTIMADO ==========
+# SET SHOWPLAN_XML ON devuelve el plan sin ejecutar la consulta; el XML se
+# resume aquí sin conexión para poder probarlo con planes guardados.
+SHOWPLAN_NS = {"sp": "http://schemas.microsoft.com/sqlserver/2004/07/showplan"}
+SEEK_OPS = {"Index Seek", "Clustered Index Seek"}
+SCAN_OPS = {"Index Scan", "Clustered Index Scan", "Table Scan"}
+LOOKUP_OPS = {"Key Lookup", "RID Lookup"}
+
+def normalize_sql(sql):
+    # Sin comentarios ni espacios y con las palabras clave en mayúsculas
+    return " ".join(t.keyword if t.keyword in SQL_KEYWORDS else t.value for t in tokenize_sql(sql))
+
+def sql_hash(sql):
+    return hashlib.sha1(normalize_sql(sql).encode("utf-8")).hexdigest()
+
+def showplan_object(element):
+    # [esquema].[tabla].[índice] del operador, sin la base de datos
+    return ".".join(element.get(k) for k in ("Schema", "Table", "Index") if element.get(k))
+
+class PlanOperator:
+    __slots__ = ("physical", "logical", "target", "rows", "cost")
+
+    def __init__(self, physical, logical, target, rows, cost):
+        self.physical = physical
+        self.logical = logical
+        self.target = target
+        self.rows = rows
+        self.cost = cost
+
+class ShowPlan:
+    def __init__(self):
+        self.cost = 0.0
+        self.rows = 0.0
+        self.operators = []
+        self.missing_indexes = []
+        self.warnings = []
+
+    def count(self, ops):
+        return sum(1 for op in self.operators if op.physical in ops)
+
+    def add_xml(self, xml):
+        import xml.etree.ElementTree as ET
+        root = ET.fromstring(xml)
+        for stmt in root.iterfind(".//sp:StmtSimple", SHOWPLAN_NS):
+            self.cost += float(stmt.get("StatementSubTreeCost", 0))
+            self.rows += float(stmt.get("StatementEstRows", 0))
+        for relop in root.iterfind(".//sp:RelOp", SHOWPLAN_NS):
+            target = relop.find("./*/sp:Object", SHOWPLAN_NS)
+            self.operators.append(PlanOperator(
+                relop.get("PhysicalOp"), relop.get("LogicalOp"),
+                showplan_object(target) if target is not None else "",
+                float(relop.get("EstimateRows", 0)), float(relop.get("EstimatedTotalSubtreeCost", 0))))
+        for warnings in root.iterfind(".//sp:Warnings", SHOWPLAN_NS):
+            for warning in warnings:
+                name = warning.tag.split("}")[-1]
+                detail = warning.get("Expression") or ", ".join(
+                    c.get("Column") for c in warning.iterfind(".//sp:ColumnReference", SHOWPLAN_NS) if c.get("Column"))
+                self.warnings.append(f"{name}: {detail}" if detail else name)
+        for group in root.iterfind(".//sp:MissingIndexGroup", SHOWPLAN_NS):
+            impact = float(group.get("Impact", 0))
+            for index in group.iterfind("sp:MissingIndex", SHOWPLAN_NS):
+                usage = {}
+                for columns in index.iterfind("sp:ColumnGroup", SHOWPLAN_NS):
+                    usage[columns.get("Usage")] = [c.get("Name") for c in columns.iterfind("sp:Column", SHOWPLAN_NS)]
+                table = ".".join(index.get(k) for k in ("Schema", "Table") if index.get(k))
+                self.missing_indexes.append((impact, table, usage.get("EQUALITY", []) + usage.get("INEQUALITY", []),
+                                             usage.get("INCLUDE", [])))
+        self.warnings = list(dict.fromkeys(self.warnings))
+        return self
+
+    @staticmethod
+    def missing_index_ddl(table, keys, include):
+        name = index_name("IX", table.replace("[", "").replace("]", ""), [k.strip("[]") for k in keys])
+        ddl = f"CREATE NONCLUSTERED INDEX {name} ON {table} ({', '.join(keys)})"
+        if include:
+            ddl += f" INCLUDE ({', '.join(include)})"
+        return ddl + ";"
+
+    def report(self, top=8):
+        lines = [f"Coste estimado: {self.cost:.4f}",
+                 f"Filas estimadas: {self.rows:,.0f}",
+                 f"Seeks: {self.count(SEEK_OPS)}  ·  Scans: {self.count(SCAN_OPS)}  ·  "
+                 f"Lookups: {self.count(LOOKUP_OPS)}"]
+        scans = [op for op in self.operators if op.physical in SCAN_OPS]
+        if scans:
+            lines += ["", "Scans:"] + [f"  {op.physical} {op.target} ≈{op.rows:,.0f} filas" for op in scans]
+        lines += ["", "Operadores más costosos:"]
+        for op in sorted(self.operators, key=lambda o: -o.cost)[:top]:
+            target = f" {op.target}" if op.target else ""
+            lines.append(f"  {op.cost:.4f}  {op.physical}{target} ≈{op.rows:,.0f} filas")
+        if self.warnings:
+            lines += ["", "⚠ Avisos:"] + [f"  {w}" for w in self.warnings]
+        if self.missing_indexes:
+            lines += ["", "Índices que faltan:"]
+            for impact, table, keys, include in sorted(self.missing_indexes, key=lambda m: -m[0]):
+                lines.append(f"  -- impacto {impact:.1f}%")
+                lines.append("  " + self.missing_index_ddl(table, keys, include))
+        return "\n".join(lines)
+
+def parse_showplan_xml(*documents):
+    plan = ShowPlan()
+    for xml in documents:
+        plan.add_xml(xml)
+    return plan
+
+class PlanCache:
+    # Planes ya resumidos, por hash del SQL normalizado: volver a mostrar el
+    # panel con el mismo SQL no consulta el servidor. Se vacía si cambia el esquema.
+    MAX_ENTRIES = 64
+
+    def __init__(self):
+        self._plans = {}
+
+    def get(self, key):
+        plan = self._plans.pop(key, None)
+        if plan is not None:
+            self._plans[key] = plan
+        return plan
+
+    def put(self, key, plan):
+        self._plans.pop(key, None)
+        self._plans[key] = plan
+        while len(self._plans) > self.MAX_ENTRIES:
+            del self._plans[next(iter(self._plans))]
+
+    def clear(self):
+        self._plans.clear()
+
+    @staticmethod
+    def fetch_xml(cursor, sql):
+        # Hilo de trabajo. SHOWPLAN_XML tiene que ir solo en su lote; si no se
+        # puede desactivar, la conexión no debe volver al pool así.
+        cursor.execute("SET SHOWPLAN_XML ON")
+        try:
+            cursor.execute(sql)
+            documents = []
+            while True:
+                if cursor.description:
+                    documents.extend(row[0] for row in cursor.fetchall())
+                if not cursor.nextset():
+                    break
+        except Exception as e:
+            try:
+                cursor.execute("SET SHOWPLAN_XML OFF")
+            except Exception:
+                raise BrokenConnectionError(str(e)) from e
+            raise
+        cursor.execute("SET SHOWPLAN_XML OFF")
+        return documents
+
+def describe_fk_path(path):
+    # FactVentas.ClienteId → DimCliente.GeografiaId → DimGeografia
+    text = path[0].table
+    for fk in path:
+        text += "." + "+".join(c for c, _ in fk.columns) + " → " + fk.referenced
+    return text
+
+def fk_join_condition(fk, parent_alias, alias):
+    return " AND ".join(f"{parent_alias}.{quote_name(c)} = {alias}.{quote_name(r)}" for c, r in fk.columns)
+
+def create_view_statement(view_name, sql):
+    return f"CREATE OR ALTER VIEW {view_name} AS\n{sql}"
+
+def preview_query(sql, limit):
+    return f"SELECT TOP ({int(limit)}) * FROM (\n{sql}\n) AS preview"
+
+def preview_cell(value, limit=200):
+    # Texto corto para la rejilla: los valores enormes no viajan al hilo de Tk
+    if value is None:
+        return "NULL"
+    if isinstance(value, (bytes, bytearray)):
+        text = "0x" + value[:limit // 2].hex().upper()
+        return text + "…" if len(value) > limit // 2 else text
+    text = str(value)
+    return text[:limit] + "…" if len(text) > limit else text
+
+def replace_text(widget, new_text):
+    # Reemplaza en un tk.Text solo el bloque de líneas que cambió, conservando
+    # el resto del buffer (y con ello el cursor y el desplazamiento).
+    # Devuelve las líneas (primera, última) del texto nuevo que hay que
+    # repintar, o None si el texto no cambió
+    old_lines = widget.get("1.0", "end-1c").split("\n")
+    new_lines = new_text.split("\n")
+    limit = min(len(old_lines), len(new_lines))
+    prefix = 0
+    while prefix < limit and old_lines[prefix] == new_lines[prefix]:
+        prefix += 1
+    if prefix == len(old_lines) == len(new_lines):
+        return
+    suffix = 0
+    while suffix < limit - prefix and old_lines[-1 - suffix] == new_lines[-1 - suffix]:
+        suffix += 1
+
+    changed = new_lines[prefix:len(new_lines) - suffix]
+    if suffix:
+        start = f"{prefix + 1}.0"
+        widget.delete(start, f"{len(old_lines) - suffix + 1}.0")
+        widget.insert(start, "".join(line + "\n" for line in changed))
+        return prefix + 1, prefix + max(len(changed), 1)
+    elif prefix:
+        start = f"{prefix}.end"
+        widget.delete(start, "end-1c")
+        widget.insert(start, "".join("\n" + line for line in changed))
+        return prefix, prefix + len(changed)
+    else:
+        widget.delete("1.0", "end-1c")
+        widget.insert("1.0", new_text)
+        return 1, len(new_lines)
+
+class SQLHighlighter:
+    # Resaltado T-SQL con el tokenizador del parser. Solo se vuelven a etiquetar
+    # las líneas que cambian (replace o lo que se teclea), así que un script de
+    # miles de líneas no se recorre entero en cada modificación.
+    COLORS = {"keyword": "#0000CC", "string": "#A31515", "comment": "#008000", "number": "#098658",
+              "qident": "#795E26", "var": "#AF00DB"}
+    KEYWORDS = SQL_KEYWORDS | {"GO", "USE", "DECLARE", "EXEC", "VIEW"}
+    # Índices por llamada a tag_add
+    BATCH = 2000
+
+    def __init__(self, widget):
+        self.widget = widget
+        for tag, color in self.COLORS.items():
+            widget.tag_configure(tag, foreground=color)
+        self._line = None
+        widget.bind("<KeyPress>", self._on_key_press, add="+")
+        widget.bind("<KeyRelease>", self._on_key_release, add="+")
+
+    def _insert_line(self):
+        return int(self.widget.index("insert").split(".")[0])
+
+    def _on_key_press(self, _):
+        if self._line is None:
+            self._line = self._insert_line()
+
+    def _on_key_release(self, _):
+        if self._line is None:
+            return
+        first, last = sorted((self._line, self._insert_line()))
+        self._line = None
+        self.highlight(first, last)
+
+    def replace(self, text):
+        # replace_text + repintar solo el bloque reemplazado
+        lines = replace_text(self.widget, text)
+        if lines is not None:
+            self.highlight(*lines)
+
+    def highlight(self, first=1, last=None):
+        w = self.widget
+        end = int(w.index("end-1c").split(".")[0])
+        last = end if last is None else min(max(last, first), end)
+        start, stop = f"{first}.0", f"{last}.end"
+        # Un comentario /* */ o una cadena de varias líneas que empieza antes o
+        # sigue después del tramo obliga a ampliarlo (también si la etiqueta que
+        # sigue es el resto de un comentario que ya no existe)
+        following = w.get(f"{stop}+1c", f"{stop}+3c")
+        for tag, opening in (("comment", ("--", "/*")), ("string", ("'", "N'"))):
+            if first > 1 and tag in w.tag_names(f"{start}-1c"):
+                previous = w.tag_prevrange(tag, start)
+                if previous:
+                    start = previous[0]
+            if tag in w.tag_names(stop) or (tag in w.tag_names(f"{stop}+1c") and not following.startswith(opening)):
+                stop = "end-1c"
+        text = w.get(start, stop)
+        if stop != "end-1c" and ("/*" in text or "*/" in text or text.count("'") % 2):
+            stop = "end-1c"
+            text = w.get(start, stop)
+        for tag in self.COLORS:
+            w.tag_remove(tag, start, stop)
+
+        line, column = map(int, w.index(start).split("."))
+        breaks = [m.start() for m in re.finditer("\n", text)]
+
+        def index(offset):
+            n = bisect.bisect_left(breaks, offset)
+            if n == 0:
+                return f"{line}.{column + offset}"
+            return f"{line + n}.{offset - breaks[n - 1] - 1}"
+
+        ranges = {}
+        for token in tokenize_sql(text, keep_comments=True):
+            kind = token.kind
+            if kind == "ident":
+                if token.value.upper() not in self.KEYWORDS:
+                    continue
+                kind = "keyword"
+            elif kind not in self.COLORS:
+                continue
+            ranges.setdefault(kind, []).extend((index(token.start), index(token.end)))
+        for tag, indices in ranges.items():
+            for i in range(0, len(indices), self.BATCH):
+                w.tag_add(tag, *indices[i:i + self.BATCH])
+
+class SideBySideDiff(tk.Toplevel):
+    # Definición desplegada frente al SQL del editor, con las líneas alineadas
+    # y un solo desplazamiento vertical. El diff llega ya calculado
+    # (side_by_side_diff en un hilo de trabajo).
+    COLORS = {"delete": "#ffd7d5", "insert": "#d4f7d4", "replace": "#fff3c4", "gap": "#e8e8e8"}
+
+    def __init__(self, master, title, on_refresh=None):
+        super().__init__(master)
+        self.title(title)
+        self.geometry("1200x700")
+        toolbar = ttk.Frame(self, padding=(10, 5))
+        toolbar.pack(fill=tk.X)
+        self.status = ttk.Label(toolbar, text="⏳ Calculando diferencias...")
+        self.status.pack(side=tk.LEFT)
+        if on_refresh is not None:
+            ttk.Button(toolbar, text="↻", width=3, command=on_refresh).pack(side=tk.RIGHT)
+
+        body = ttk.Frame(self, padding=(10, 0, 10, 10))
+        body.pack(fill=tk.BOTH, expand=True)
+        body.rowconfigure(1, weight=1)
+        self.scroll_y = ttk.Scrollbar(body, command=self._yview)
+        self.scroll_y.grid(row=1, column=2, sticky="ns")
+        self.panes = []
+        for column, label in enumerate(("Desplegada", "Editor")):
+            body.columnconfigure(column, weight=1)
+            ttk.Label(body, text=label, font=('Segoe UI', 10, 'bold')).grid(row=0, column=column, sticky="w")
+            text = tk.Text(body, wrap=tk.NONE, font=('Consolas', 10), bg='#f0f0f0', fg='black',
+                           yscrollcommand=self._on_scroll)
+            text.grid(row=1, column=column, sticky="nsew", padx=(0, 5))
+            for tag, color in self.COLORS.items():
+                text.tag_configure(tag, background=color)
+            self.panes.append((text, SQLHighlighter(text)))
+
+    def _yview(self, *args):
+        for text, _ in self.panes:
+            text.yview(*args)
 
-        hits = [elem for elem in self._completion_list if elem.lower().startswith(self.get().lower())]
+    def _on_scroll(self, first, last):
+        self.scroll_y.set(first, last)
+        for text, _ in self.panes:
+            if abs(text.yview()[0] - float(first)) > 1e-9:
+                text.yview_moveto(first)
 
-        if hits != self._hits:
-            self._hit_index = 0
-            self._hits = hits
+    def show(self, diff):
+        left, right, marks = diff
+        for (text, highlighter), content in zip(self.panes, (left, right)):
+            highlighter.replace(content)
+            for tag in self.COLORS:
+                text.tag_remove(tag, "1.0", "end")
+        for side, (text, _) in enumerate(self.panes):
+            for tag, lines in marks[side].items():
+                indices = [i for n in lines for i in (f"{n}.0", f"{n + 1}.0")]
+                for i in range(0, len(indices), SQLHighlighter.BATCH):
+                    text.tag_add(tag, *indices[i:i + SQLHighlighter.BATCH])
+        changes = sum(len(lines) for lines in marks[1].values() if lines)
+        self.status.config(text=f"{changes} línea(s) distintas" if changes else "Sin diferencias")
 
-        if hits:
-            self.delete(0, tk.END)
-            self.insert(0, hits[self._hit_index])
-            self.select_range(self.position, tk.END)
+def build_connection_string(server, database, user, password):
+    return f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};DATABASE={database};UID={user};PWD={password}"
 
-    def handle_keyrelease(self, event):
-        if event.keysym in ("BackSpace", "Left", "Right", "Up", "Down", "Shift_L", "Shift_R"):
-            return
-        self.autocomplete()
+def split_databases(text):
+    # "Ventas, Staging" -> ['Ventas', 'Staging']; la primera es la base principal
+    return list(dict.fromkeys(d.strip().strip("[]") for d in (text or "").split(",") if d.strip()))
+
+def fetch_database_catalog(conn_str, catalog, connect_timeout=15, query_timeout=120, profiler=None):
+    # Catálogo de una base adicional por su propia conexión; se llama en paralelo
+    # con la carga de la principal
+    pool = ConnectionManager(conn_str, size=1, connect_timeout=connect_timeout, query_timeout=query_timeout,
+                             profiler=profiler)
+    try:
+        return pool.run(catalog.fetch_rows)
+    finally:
+        pool.close()
 
 class ModernSQLViewGenerator:
-    def __init__(self, root):
+    CONNECT_TIMEOUT = 15
+    QUERY_TIMEOUT = 120
+    TASK_TIMEOUT = 300
+    POOL_SIZE = 4
+    PREVIEW_DELAY_MS = 150
+    PREVIEW_ROWS = 1000
+    PREVIEW_MAX_ROWS = 100000
+    PREVIEW_BATCH = 200
+    LINEAGE_FILTER_MS = 150
+    DIFF_DELAY_MS = 400
+    WATCH_INTERVAL_MS = 30000
+    PROFILER_REFRESH_MS = 1000
+    # Manejadores que se miden con el perfilador (se envuelven antes de enlazarlos a los widgets)
+    PROFILED_HANDLERS = (
+        "generate_sql", "generate_edited_sql", "build_view_spec", "get_columns", "load_fact_columns",
+        "load_related_columns", "update_join_suggestions", "add_join", "refresh_join_tree", "update_cardinality",
+        "parse_view_sql", "filter_views_by_lineage", "populate_catalog_widgets", "apply_schema_drift", "show_plan",
+        "_on_connected", "_on_catalog_refreshed", "_on_lineage_loaded", "_on_schema_polled", "_on_preview_rows",
+        "_on_view_diff",
+    )
+
+    def __init__(self, root, profile=False, lazy=True):
         self.root = root
+        self.lazy = lazy
+        self.startup = []  # [(fase, segundos)] para el informe de arranque
         self.root.title("Generador de Vistas SQL")
         self.root.geometry("1400x900")
         
@@ -64,26 +3230,70 @@ class ModernSQLViewGenerator:
                            padding=[10, 5], borderwidth=0)
         self.style.map('TNotebook.Tab', background=[('selected', '#0078D7')])
         
-        self.connection = None
-        self.cursor = None
+        self.pool = None
+        self.catalog = SchemaCatalog()
+        self.extra_databases = []
+        self.lineage = LineageIndex()
+        self.fk_graph = ForeignKeyGraph()
+        self.indexes = IndexCatalog()
+        self.snapshot = None
+        self.table_index = None
         self.main_tables = []
         self.related_tables = []
         self.existing_views = []
 
         self.current_fact_table = None
         self.selected_joins = []
+        self.fk_suggestions = []
+        self._pending_path = None
+        self.indexed_batches = None
+        self.indexed_problems = []
+        self.edit_spec = None
+        # Vista cargada en el editor y su definición en el servidor (para el diff)
+        self.edit_view_name = None
+        self.edit_deployed = None
+        self._diff_window = None
+        self._diff_job = None
+        self._diff_seq = 0
+        self._preview_job = None
+        self._lineage_job = None
+        self._watch_job = None
+        self._watch_task = None
+        self._schema_fingerprint = None
+        self.broken_views = {}
+        self.plans = PlanCache()
+        self._plan_key = None
+        self._data_task = None
+        self._data_stop = None
+        self.profiler = Profiler(enabled=profile)
+        self._profiler_window = None
+        for name in self.PROFILED_HANDLERS:
+            setattr(self, name, self.profiler.wrap("ui", name, getattr(self, name)))
         self.view_name = ""
         self.generated_sql = ""
         self.editing_mode = False
 
         self.setup_ui()
+        self.db = DBWorker(self.root, max_workers=self.POOL_SIZE, on_busy=self.on_db_busy, profiler=self.profiler)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def setup_ui(self):
         # Frame principal con padding
         main_frame = ttk.Frame(self.root, padding="10")
         main_frame.pack(fill=tk.BOTH, expand=True)
+
+        # Barra de estado para las operaciones en segundo plano
+        status_bar = ttk.Frame(main_frame)
+        status_bar.pack(side=tk.BOTTOM, fill=tk.X, pady=(5, 0))
+        self.busy_label = ttk.Label(status_bar, text="")
+        self.busy_label.pack(side=tk.LEFT)
+        self.busy_bar = ttk.Progressbar(status_bar, mode="indeterminate", length=150)
+        self.cancel_button = ttk.Button(status_bar, text="✖ Cancelar", command=self.cancel_db_tasks)
+        self.drift_label = ttk.Label(status_bar, text="")
+        self.drift_label.pack(side=tk.RIGHT)
+        ttk.Button(status_bar, text="⏱", width=3, command=self.show_profiler_panel).pack(side=tk.RIGHT, padx=(0, 10))
         
-        notebook = ttk.Notebook(main_frame)
+        notebook = self.notebook = ttk.Notebook(main_frame)
         notebook.pack(fill=tk.BOTH, expand=True)
 
         # Pestañas
@@ -97,10 +3307,32 @@ class ModernSQLViewGenerator:
         notebook.add(self.scripts_frame, text="📜 SQL Generado")
         notebook.add(self.editor_frame, text="✏️ Editor")
 
+        # Solo la pestaña de conexión se construye ya; las demás al seleccionarlas
+        # por primera vez o, como muy tarde, al conectar (sus widgets reciben el catálogo)
+        self._pending_tabs = {
+            str(self.builder_frame): ("Constructor", self.setup_builder_tab),
+            str(self.scripts_frame): ("SQL Generado", self.setup_scripts_tab),
+            str(self.editor_frame): ("Editor", self.setup_editor_tab),
+        }
         self.setup_connection_tab()
-        self.setup_builder_tab()
-        self.setup_scripts_tab()
-        self.setup_editor_tab()
+        if self.lazy:
+            notebook.bind("<<NotebookTabChanged>>", lambda _: self.build_tab(notebook.select()))
+        else:
+            self.build_all_tabs()
+
+    def build_tab(self, frame):
+        # También lo llaman los comandos que escriben en widgets de otra pestaña
+        pending = self._pending_tabs.pop(str(frame), None)
+        if pending is None:
+            return
+        name, setup = pending
+        started = time.perf_counter()
+        setup()
+        self.startup.append((f"pestaña {name}", time.perf_counter() - started))
+
+    def build_all_tabs(self):
+        for frame in list(self._pending_tabs):
+            self.build_tab(frame)
 
     def setup_connection_tab(self):
         # Frame con padding interno
@@ -135,6 +3367,7 @@ class ModernSQLViewGenerator:
         btn_frame = ttk.Frame(frame)
         btn_frame.pack(pady=20)
         ttk.Button(btn_frame, text="Conectar", command=self.connect_database).pack(pady=10)
+        ttk.Button(btn_frame, text="🔄 Recargar Catálogo", command=self.refresh_catalog).pack()
         
         # Estado de conexión
         self.connection_status = ttk.Label(frame, text="🔴 Desconectado", foreground="#ff6b6b")
@@ -156,22 +3389,13 @@ class ModernSQLViewGenerator:
         left_panel.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
         
         ttk.Label(left_panel, text="Tabla Principal:").pack(anchor="w")
-        self.main_combo = ttk.Combobox(left_panel, state="readonly")
+        self.main_combo = AutocompleteCombobox(left_panel)
         self.main_combo.pack(fill=tk.X, pady=(0, 10))
         self.main_combo.bind("<<ComboboxSelected>>", self.load_fact_columns)
 
         ttk.Label(left_panel, text="Columnas:").pack(anchor="w")
-        self.main_columns_tree = ttk.Treeview(left_panel, columns=("column", "include"), 
-                                            show="headings", height=15, selectmode="none")
-        self.main_columns_tree.heading("column", text="Columna")
-        self.main_columns_tree.heading("include", text="Incluir")
-        self.main_columns_tree.column("column", width=150)
-        self.main_columns_tree.column("include", width=50, anchor="center")
-        self.main_columns_tree.pack(fill=tk.BOTH, expand=True)
-        
-        self.main_columns_tree.tag_configure("checked", foreground="#4CAF50")  # Verde
-        self.main_columns_tree.tag_configure("unchecked", foreground="#757575")  # Gris
-        self.main_columns_tree.bind("<Button-1>", self.on_fact_column_click)
+        self.main_columns_grid = ColumnGrid(left_panel, on_change=self.schedule_sql_preview)
+        self.main_columns_grid.pack(fill=tk.BOTH, expand=True)
 
         # Panel central - Configuración de Joins
         center_panel = ttk.LabelFrame(main_frame, text=" Configurar Join ", padding=10)
@@ -181,6 +3405,8 @@ class ModernSQLViewGenerator:
         self.related_combo = AutocompleteCombobox(center_panel)
         self.related_combo.pack(fill=tk.X, pady=(0, 10))
         self.related_combo.bind("<<ComboboxSelected>>", self.load_related_columns)
+        self.path_label = ttk.Label(center_panel, text="", foreground="#0078D7", wraplength=300)
+        self.path_label.pack(anchor="w", pady=(0, 5))
 
         ttk.Label(center_panel, text="FK en Principal:").pack(anchor="w")
         self.main_fk_combo = ttk.Combobox(center_panel, state="readonly")
@@ -200,22 +3426,37 @@ class ModernSQLViewGenerator:
 
         ttk.Button(center_panel, text="➕ Agregar a Vista", command=self.add_join).pack(fill=tk.X, pady=10)
 
+        # Sugerencias a partir de las claves foráneas de la tabla principal
+        ttk.Label(center_panel, text="Sugerencias por FK (doble clic):").pack(anchor="w")
+        self.fk_tree = ttk.Treeview(center_panel, columns=("table", "path"), show="headings", height=6)
+        self.fk_tree.heading("table", text="Tabla")
+        self.fk_tree.heading("path", text="Ruta")
+        self.fk_tree.column("table", width=100, stretch=False)
+        self.fk_tree.column("path", width=200, stretch=True)
+        self.fk_tree.pack(fill=tk.BOTH, expand=True)
+        self.fk_tree.bind("<Double-1>", self.use_fk_suggestion)
+
         # Panel derecho - Joins configurados
         right_panel = ttk.LabelFrame(main_frame, text=" Joins Configurados ", padding=10)
         right_panel.grid(row=0, column=2, sticky="nsew", padx=5, pady=5)
         
-        self.join_tree = ttk.Treeview(right_panel, columns=("related_table", "main_fk", "related_pk", "related_col", "col_alias"), 
+        self.join_tree = ttk.Treeview(right_panel, columns=("related_table", "main_fk", "related_pk", "related_col", "col_alias",
+                                                           "estimate"),
                                     show="headings", height=15)
         self.join_tree.heading("related_table", text="Tabla Relacionada")
         self.join_tree.heading("main_fk", text="FK Fact")
         self.join_tree.heading("related_pk", text="PK Dim")
         self.join_tree.heading("related_col", text="Columna")
         self.join_tree.heading("col_alias", text="Alias")
+        self.join_tree.heading("estimate", text="Filas (est.)")
         
-        for col in ("related_table", "main_fk", "related_pk", "related_col", "col_alias"):
+        for col in ("related_table", "main_fk", "related_pk", "related_col", "col_alias", "estimate"):
             self.join_tree.column(col, width=100, stretch=True)
+        self.join_tree.tag_configure("fanout", foreground="#ff6b6b")  # Rojo: multiplica filas
             
         self.join_tree.pack(fill=tk.BOTH, expand=True)
+        self.cardinality_label = ttk.Label(right_panel, text="", wraplength=500)
+        self.cardinality_label.pack(fill=tk.X, pady=(5, 0))
         
         ttk.Button(right_panel, text="🗑️ Eliminar Selección", command=self.remove_join).pack(fill=tk.X, pady=(10, 0))
 
@@ -230,14 +3471,27 @@ class ModernSQLViewGenerator:
         ttk.Button(bottom_panel, text="💾 Crear Vista", command=self.create_view).pack(side=tk.LEFT, padx=5)
         ttk.Button(bottom_panel, text="📂 Cargar Vista", command=self.load_existing_view).pack(side=tk.LEFT, padx=5)
         ttk.Button(bottom_panel, text="🔄 Nueva Vista", command=self.reset_builder_view).pack(side=tk.LEFT, padx=5)
+        ttk.Button(bottom_panel, text="🔍 Revisar Rendimiento", command=self.review_view_performance).pack(side=tk.LEFT, padx=5)
+        
+        # Materializar como vista indexada (WITH SCHEMABINDING + índice clustered único)
+        self.indexed_view_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(bottom_panel, text="🧱 Vista indexada", variable=self.indexed_view_var,
+                        command=self.toggle_indexed_view).pack(side=tk.LEFT, padx=(20, 5))
+        self.indexed_label = ttk.Label(bottom_panel, text="")
+        self.indexed_label.pack(side=tk.LEFT)
 
     def setup_scripts_tab(self):
         main_frame = ttk.Frame(self.scripts_frame, padding=10)
         main_frame.pack(fill=tk.BOTH, expand=True)
         
-        # Editor SQL con scrollbar
-        frame = ttk.Frame(main_frame)
-        frame.pack(fill=tk.BOTH, expand=True)
+        # Editor SQL con scrollbar; el panel del plan se añade a su derecha al
+        # activarlo y el de la vista previa debajo
+        self.preview_pane = ttk.PanedWindow(main_frame, orient=tk.VERTICAL)
+        self.preview_pane.pack(fill=tk.BOTH, expand=True)
+        self.scripts_pane = ttk.PanedWindow(self.preview_pane, orient=tk.HORIZONTAL)
+        self.preview_pane.add(self.scripts_pane, weight=3)
+        frame = ttk.Frame(self.scripts_pane)
+        self.scripts_pane.add(frame, weight=3)
         
         scroll_y = ttk.Scrollbar(frame)
         scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
@@ -249,9 +3503,34 @@ class ModernSQLViewGenerator:
                               yscrollcommand=scroll_y.set, xscrollcommand=scroll_x.set,
                               bg='#f0f0f0', fg='black', insertbackground='black')
         self.sql_text.pack(fill=tk.BOTH, expand=True)
+        self.sql_highlighter = SQLHighlighter(self.sql_text)
         
         scroll_y.config(command=self.sql_text.yview)
         scroll_x.config(command=self.sql_text.xview)
+
+        self.plan_frame = ttk.Frame(self.scripts_pane, padding=(10, 0, 0, 0))
+        plan_header = ttk.Frame(self.plan_frame)
+        plan_header.pack(fill=tk.X)
+        ttk.Label(plan_header, text="Plan estimado", font=('Segoe UI', 10, 'bold')).pack(side=tk.LEFT)
+        ttk.Button(plan_header, text="↻", width=3, command=lambda: self.show_plan(refresh=True)).pack(side=tk.RIGHT)
+        self.plan_text = tk.Text(self.plan_frame, wrap=tk.NONE, font=('Consolas', 9), width=60,
+                                 bg='#f0f0f0', fg='black')
+        self.plan_text.pack(fill=tk.BOTH, expand=True, pady=(5, 0))
+
+        self.data_frame = ttk.Frame(self.preview_pane, padding=(0, 10, 0, 0))
+        data_header = ttk.Frame(self.data_frame)
+        data_header.pack(fill=tk.X)
+        ttk.Label(data_header, text="Vista previa", font=('Segoe UI', 10, 'bold')).pack(side=tk.LEFT)
+        ttk.Label(data_header, text="Filas:").pack(side=tk.LEFT, padx=(10, 0))
+        self.preview_limit = ttk.Spinbox(data_header, from_=1, to=self.PREVIEW_MAX_ROWS, width=7)
+        self.preview_limit.set(self.PREVIEW_ROWS)
+        self.preview_limit.pack(side=tk.LEFT, padx=5)
+        self.preview_stats = ttk.Label(data_header, text="")
+        self.preview_stats.pack(side=tk.LEFT, padx=10)
+        ttk.Button(data_header, text="✕", width=3, command=self.close_data_preview).pack(side=tk.RIGHT)
+        ttk.Button(data_header, text="■ Detener", command=self.cancel_data_preview).pack(side=tk.RIGHT, padx=5)
+        self.data_grid = DataGrid(self.data_frame, height=10)
+        self.data_grid.pack(fill=tk.BOTH, expand=True, pady=(5, 0))
         
         # Botones de acción
         btn_frame = ttk.Frame(main_frame)
@@ -259,6 +3538,10 @@ class ModernSQLViewGenerator:
         
         ttk.Button(btn_frame, text="📋 Copiar SQL", command=self.copy_sql).pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="💾 Guardar SQL", command=self.save_sql_file).pack(side=tk.LEFT, padx=5)
+        self.plan_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(btn_frame, text="📈 Plan", variable=self.plan_var,
+                        command=self.toggle_plan_panel).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="▶ Vista previa", command=self.run_data_preview).pack(side=tk.LEFT, padx=5)
 
     def setup_editor_tab(self):
         main_frame = ttk.Frame(self.editor_frame, padding=10)
@@ -273,6 +3556,18 @@ class ModernSQLViewGenerator:
         self.view_combo.pack(side=tk.LEFT, padx=(0, 10))
         ttk.Button(top_panel, text="📂 Cargar Vista", command=self.load_view_for_editing).pack(side=tk.LEFT)
         
+        # Filtro por linaje: vistas que usan una tabla o columna
+        ttk.Label(top_panel, text="Usa tabla/columna:").pack(side=tk.LEFT, padx=(20, 10))
+        self.lineage_entry = ttk.Entry(top_panel, width=30)
+        self.lineage_entry.pack(side=tk.LEFT, padx=(0, 10))
+        self.lineage_entry.bind('<KeyRelease>', lambda e: self.schedule_lineage_filter())
+        self.lineage_label = ttk.Label(top_panel, text="")
+        self.lineage_label.pack(side=tk.LEFT)
+        
+        # Vistas que referencian columnas que ya no existen
+        self.broken_label = ttk.Label(main_frame, text="", foreground="#ff6b6b")
+        self.broken_label.pack(fill=tk.X, pady=(0, 5))
+        
         # Panel principal - Editor
         editor_panel = ttk.Frame(main_frame)
         editor_panel.pack(fill=tk.BOTH, expand=True)
@@ -281,33 +3576,15 @@ class ModernSQLViewGenerator:
         fact_panel = ttk.LabelFrame(editor_panel, text=" Columnas de Fact ", padding=10)
         fact_panel.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
         
-        self.edit_main_columns_tree = ttk.Treeview(fact_panel, columns=("column", "include"), 
-                                                 show="headings", height=20, selectmode="none")
-        self.edit_main_columns_tree.heading("column", text="Columna")
-        self.edit_main_columns_tree.heading("include", text="Incluir")
-        self.edit_main_columns_tree.column("column", width=200)
-        self.edit_main_columns_tree.column("include", width=60, anchor="center")
-        self.edit_main_columns_tree.pack(fill=tk.BOTH, expand=True)
-        
-        self.edit_main_columns_tree.tag_configure("checked", foreground="#4CAF50")
-        self.edit_main_columns_tree.tag_configure("unchecked", foreground="#757575")
-        self.edit_main_columns_tree.bind("<Button-1>", self.on_edit_fact_column_click)
+        self.edit_main_columns_grid = ColumnGrid(fact_panel, height=20, column_width=200)
+        self.edit_main_columns_grid.pack(fill=tk.BOTH, expand=True)
         
         # Columnas de Dimensiones
         dim_panel = ttk.LabelFrame(editor_panel, text=" Columnas de Dimensiones ", padding=10)
         dim_panel.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
         
-        self.edit_related_columns_tree = ttk.Treeview(dim_panel, columns=("column", "include"), 
-                                                show="headings", height=20, selectmode="none")
-        self.edit_related_columns_tree.heading("column", text="Columna")
-        self.edit_related_columns_tree.heading("include", text="Incluir")
-        self.edit_related_columns_tree.column("column", width=200)
-        self.edit_related_columns_tree.column("include", width=60, anchor="center")
-        self.edit_related_columns_tree.pack(fill=tk.BOTH, expand=True)
-        
-        self.edit_related_columns_tree.tag_configure("checked", foreground="#4CAF50")
-        self.edit_related_columns_tree.tag_configure("unchecked", foreground="#757575")
-        self.edit_related_columns_tree.bind("<Button-1>", self.on_edit_related_column_click)
+        self.edit_related_columns_grid = ColumnGrid(dim_panel, height=20, column_width=200)
+        self.edit_related_columns_grid.pack(fill=tk.BOTH, expand=True)
         
         # Panel inferior - Nueva dimensión y acciones
         bottom_panel = ttk.Frame(main_frame)
@@ -321,7 +3598,7 @@ class ModernSQLViewGenerator:
         dim_grid.pack(fill=tk.X)
         
         ttk.Label(dim_grid, text="Tabla Relacionada:").grid(row=0, column=0, sticky="e", padx=5, pady=2)
-        self.new_related_combo = ttk.Combobox(dim_grid, width=20, state="readonly")
+        self.new_related_combo = AutocompleteCombobox(dim_grid, width=20)
         self.new_related_combo.grid(row=0, column=1, sticky="w", padx=5, pady=2)
         
         ttk.Label(dim_grid, text="FK en Principal:").grid(row=0, column=2, sticky="e", padx=5, pady=2)
@@ -348,6 +3625,7 @@ class ModernSQLViewGenerator:
         
         ttk.Button(sql_actions_panel, text="🔄 Actualizar Vista", command=self.update_view).pack(fill=tk.X, pady=5)
         ttk.Button(sql_actions_panel, text="⚡ Generar SQL", command=self.generate_edited_sql).pack(fill=tk.X, pady=5)
+        ttk.Button(sql_actions_panel, text="⇆ Comparar", command=self.show_view_diff).pack(fill=tk.X, pady=5)
         
         # Editor SQL
         sql_editor_panel = ttk.LabelFrame(bottom_panel, text=" SQL Generado ", padding=10)
@@ -363,68 +3641,623 @@ class ModernSQLViewGenerator:
                                    height=8, yscrollcommand=scroll_y.set, xscrollcommand=scroll_x.set,
                                    bg='#f0f0f0', fg='black', insertbackground='black')
         self.edit_sql_text.pack(fill=tk.BOTH, expand=True)
+        self.edit_highlighter = SQLHighlighter(self.edit_sql_text)
+        self.edit_sql_text.bind('<KeyRelease>', lambda e: self.schedule_view_diff(), add="+")
         
         scroll_y.config(command=self.edit_sql_text.yview)
         scroll_x.config(command=self.edit_sql_text.xview)
 
     
     def connect_database(self):
+        self.build_all_tabs()
+        server = self.server_entry.get()
+        # Varias bases separadas por comas: la primera es la principal (vistas,
+        # linaje, despliegue); las demás solo aportan tablas al catálogo
+        databases = split_databases(self.database_entry.get()) or [""]
+        database = databases[0]
+        self.extra_databases = databases[1:]
+        conn_str = build_connection_string(server, database, self.user_entry.get(), self.password_entry.get())
+        self.catalog.clear()
+        self.catalog.database = database
+
+        # Cargar primero el snapshot local para que la interfaz responda de inmediato
+        self.snapshot = CatalogSnapshot(server, database)
+        if not self.snapshot.load_lineage(self.lineage):
+            self.lineage.clear()
+        self.snapshot.load_foreign_keys(self.fk_graph)
+        if self.snapshot.load_into(self.catalog):
+            self.populate_catalog_widgets()
+            self.set_views(self.catalog.views)
+            self.update_broken_views()
+            self.connection_status.config(text="🟡 Snapshot local (conectando...)", foreground="#FFA000")
+        else:
+            self.catalog.clear()
+            self.connection_status.config(text="⏳ Conectando...", foreground="#FFA000")
+
+        self.db.submit(self._open_connection, conn_str, self.snapshot, dict(self.catalog.objects),
+                       on_success=self._on_connected, on_error=self._on_connect_error,
+                       timeout=self.TASK_TIMEOUT, description="Conectando")
+        self.load_extra_databases()
+
+    def load_extra_databases(self):
+        # Una conexión y una tarea por base: los selectores se actualizan según
+        # termina cada una, sin esperar a la más lenta
+        for database in self.extra_databases:
+            conn_str = build_connection_string(self.server_entry.get(), database, self.user_entry.get(),
+                                               self.password_entry.get())
+            self.db.submit(fetch_database_catalog, conn_str, self.catalog, self.CONNECT_TIMEOUT, self.QUERY_TIMEOUT,
+                           self.profiler,
+                           on_success=lambda rows, d=database: self._on_database_loaded(d, rows),
+                           on_error=lambda e, d=database: messagebox.showerror("Error de conexión", f"{d}: {e}"),
+                           timeout=self.TASK_TIMEOUT, description=f"Leyendo {database}")
+
+    def _on_database_loaded(self, database, rows):
+        self.catalog.load_database(database, rows)
+        self.populate_catalog_widgets()
+
+    def _open_connection(self, conn_str, snapshot, known):
+        # Hilo de trabajo: abrir el pool y traer solo lo que cambió desde el snapshot
+        pool = ConnectionManager(conn_str, size=self.POOL_SIZE, connect_timeout=self.CONNECT_TIMEOUT,
+                                 query_timeout=self.QUERY_TIMEOUT, profiler=self.profiler)
+        try:
+            with pool.cursor() as cursor:
+                delta = self.catalog.fetch_changes(cursor, known)
+                views = self._fetch_views(cursor)
+                foreign_keys = self.fk_graph.fetch_rows(cursor)
+        except Exception:
+            pool.close()
+            raise
+        if delta['full'] or delta['stale']:
+            snapshot.write_changes(delta)
+        snapshot.write_foreign_keys(foreign_keys)
+        return pool, delta, views, foreign_keys
+
+    def _on_connected(self, result):
+        pool, delta, views, foreign_keys = result
+        if self.pool is not None:
+            self.pool.close()
+        self.pool = pool
+        self._schema_fingerprint = None
+        self.connection_status.config(text="🟢 Conectado", foreground="#4CAF50")
+
+        if self.catalog.apply_changes(delta) != []:
+            self.populate_catalog_widgets()
+        self.set_views(views)
+        self.set_foreign_keys(foreign_keys)
+        self.refresh_lineage()
+        self.refresh_indexes()
+        self.schedule_schema_watch()
+
+    def _on_connect_error(self, error):
+        if self.catalog.loaded:
+            self.connection_status.config(text="🟡 Sin conexión (usando snapshot)", foreground="#FFA000")
+        else:
+            self.connection_status.config(text="🔴 Desconectado", foreground="#ff6b6b")
+        messagebox.showerror("Error de conexión", str(error))
+
+    def require_connection(self):
+        if self.pool is None:
+            messagebox.showwarning("Sin conexión", "Conéctate a la base de datos primero")
+            return False
+        return True
+
+    def populate_catalog_widgets(self, stale=None):
+        # Un solo índice de búsqueda compartido por los tres selectores de tabla.
+        # Con stale solo se añaden o quitan esas tablas, sin reconstruirlo
+        if stale is None or self.table_index is None:
+            self.table_index = SearchIndex(self.catalog.tables)
+        else:
+            for table in stale:
+                self.table_index.discard(table)
+                if self.catalog.is_table(table):
+                    self.table_index.add(self.catalog.display_name(table))
+        tables = self.table_index.items
+        self.main_tables = tables
+        self.related_tables = tables
+        self.main_combo.set_completion_list(self.table_index)
+        self.related_combo.set_completion_list(self.table_index)
+        self.new_related_combo.set_completion_list(self.table_index)
+
+    def refresh_catalog(self):
+        if not self.require_connection():
+            return
+        self.db.submit(self._fetch_full_catalog, self.snapshot, on_success=self._on_catalog_refreshed,
+                       on_error=lambda e: messagebox.showerror("Error al recargar catálogo", str(e)),
+                       timeout=self.TASK_TIMEOUT, on_cancel=self._cancel_current_query,
+                       description="Recargando catálogo")
+        self.load_extra_databases()
+
+    def _fetch_full_catalog(self, snapshot):
+        delta, views, foreign_keys = self.pool.run(lambda cursor: (self.catalog.fetch_changes(cursor, {}),
+                                                                   self._fetch_views(cursor),
+                                                                   self.fk_graph.fetch_rows(cursor)))
+        snapshot.write_changes(delta)
+        snapshot.write_foreign_keys(foreign_keys)
+        return delta, views, foreign_keys
+
+    def _on_catalog_refreshed(self, result):
+        delta, views, foreign_keys = result
+        self.catalog.apply_changes(delta)
+        self.populate_catalog_widgets()
+        self.set_views(views)
+        self.set_foreign_keys(foreign_keys)
+        self.apply_schema_drift(None)
+        self.refresh_lineage(full=True)
+        self.refresh_indexes()
+        messagebox.showinfo("Catálogo", f"Catálogo recargado: {len(self.catalog.tables)} tablas")
+
+    def _fetch_views(self, cursor):
+        cursor.execute("SELECT CONCAT(OBJECT_SCHEMA_NAME(v.object_id), '.', v.name) FROM sys.views v")
+        return [r[0] for r in cursor.fetchall()]
+
+    def refresh_indexes(self, stale=None, object_ids=None):
+        # Índices, estadísticas y tipos para el linter; en segundo plano.
+        # Con stale solo se releen las tablas con esos object_id
+        self.db.submit(lambda: self.pool.run(lambda cursor: self.indexes.fetch_rows(cursor, object_ids)),
+                       on_success=lambda data: self._on_indexes_loaded(data, stale),
+                       on_error=lambda e: self.drift_label.config(text=f"⚠ No se pudieron leer los índices: {e}"),
+                       timeout=self.TASK_TIMEOUT, on_cancel=self._cancel_current_query)
+
+    def _on_indexes_loaded(self, data, stale=None):
+        if stale is None or not self.indexes.loaded:
+            self.indexes.load_rows(data)
+        else:
+            self.indexes.apply_rows(stale, data)
+        if self.current_fact_table and self.generated_sql:
+            self.schedule_sql_preview()
+
+    def lint_sql(self, sql):
         try:
-            conn_str = f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={self.server_entry.get()};DATABASE={self.database_entry.get()};UID={self.user_entry.get()};PWD={self.password_entry.get()}"
-            self.connection = pyodbc.connect(conn_str)
-            self.cursor = self.connection.cursor()
-            self.connection_status.config(text="🟢 Conectado", foreground="#4CAF50")
-
-            # Load tables
-            self.cursor.execute("SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_TYPE = 'BASE TABLE'")
-            tables = [r[0] for r in self.cursor.fetchall()]
-            self.main_tables = tables
-            self.related_tables = tables
-            self.main_combo['values'] = tables
-            self.related_combo.set_completion_list(tables)
-            self.new_related_combo['values'] = tables
-
-            # Load views
-            self.cursor.execute("SELECT name FROM sys.views")
-            self.existing_views = [r[0] for r in self.cursor.fetchall()]
+            spec = parse_view_definition(sql)
+        except SQLParseError:
+            return []
+        return lint_view_spec(spec, self.catalog, self.indexes)
+
+    def show_lint_dialog(self, issues, title, confirm_text=None):
+        # Informe del linter con el DDL sugerido; con confirm_text pide confirmación
+        dialog = tk.Toplevel(self.root)
+        dialog.title(title)
+        dialog.geometry("900x400")
+        dialog.transient(self.root)
+        text = tk.Text(dialog, wrap=tk.WORD, font=('Consolas', 10), bg='#f0f0f0', fg='black')
+        text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        report = lint_report(issues) if issues else "✔ No se encontraron problemas en los JOIN."
+        if not self.indexes.loaded:
+            report += "\n\n(Sin metadatos de índices: solo se revisaron los tipos.)"
+        text.insert(tk.END, report)
+        text.config(state=tk.DISABLED)
+
+        result = {'ok': False}
+        buttons = ttk.Frame(dialog)
+        buttons.pack(fill=tk.X, padx=10, pady=(0, 10))
+
+        def copy_ddl():
+            self.root.clipboard_clear()
+            self.root.clipboard_append("\n".join(dict.fromkeys(i.ddl for i in issues if i.ddl)))
+
+        def close(ok):
+            result['ok'] = ok
+            dialog.destroy()
+
+        if any(i.ddl for i in issues):
+            ttk.Button(buttons, text="📋 Copiar DDL", command=copy_ddl).pack(side=tk.LEFT)
+        if confirm_text:
+            ttk.Button(buttons, text=confirm_text, command=lambda: close(True)).pack(side=tk.RIGHT, padx=5)
+            ttk.Button(buttons, text="Cancelar", command=lambda: close(False)).pack(side=tk.RIGHT)
+        else:
+            ttk.Button(buttons, text="Cerrar", command=lambda: close(False)).pack(side=tk.RIGHT)
+        dialog.grab_set()
+        self.root.wait_window(dialog)
+        return result['ok']
+
+    def confirm_lint(self, sql, confirm_text):
+        # True si se puede seguir: sin avisos o el usuario acepta desplegar igualmente
+        issues = [i for i in self.lint_sql(sql) if i.severity != "info"]
+        if not issues:
+            return True
+        return self.show_lint_dialog(issues, "Revisión de rendimiento", confirm_text)
+
+    def review_view_performance(self):
+        self.flush_sql_preview()
+        if not self.generated_sql:
+            messagebox.showwarning("Sin SQL", "Genera primero la vista")
+            return
+        self.show_lint_dialog(self.lint_sql(self.generated_sql), "Revisión de rendimiento")
+
+    def set_foreign_keys(self, rows):
+        self.fk_graph.load_rows(rows)
+        self.update_join_suggestions()
+
+    def set_views(self, views):
+        self.existing_views = sorted(views, key=str.lower)
+        self.filter_views_by_lineage()
+
+    def refresh_lineage(self, full=False):
+        # Índice de linaje: solo se releen y analizan las vistas que cambiaron
+        known = {} if full else self.lineage.markers()
+        self.db.submit(self._fetch_lineage, self.snapshot, known, on_success=self._on_lineage_loaded,
+                       on_error=lambda e: self.lineage_label.config(text=f"⚠ Índice de vistas: {e}"),
+                       timeout=self.TASK_TIMEOUT, on_cancel=self._cancel_current_query,
+                       description="Indexando vistas")
+
+    def _fetch_lineage(self, snapshot, known):
+        # Hilo de trabajo: leer definiciones y analizarlas en varios procesos
+        delta = self.pool.run(lambda cursor: self.lineage.fetch_changes(cursor, known))
+        delta['records'] = parse_lineage(delta.pop('rows'), os.cpu_count() or 1)
+        if delta['full'] or delta['records'] or delta['removed']:
+            snapshot.write_lineage(delta)
+        return delta
+
+    def _on_lineage_loaded(self, delta):
+        self.lineage.apply_changes(delta)
+        self.filter_views_by_lineage()
+        self.update_broken_views(None if delta['full'] else [r[0] for r in delta['records'].values()])
+
+    # ---------- Vigilancia de cambios de esquema ----------
+    def schedule_schema_watch(self):
+        if self._watch_job is not None:
+            self.root.after_cancel(self._watch_job)
+        self._watch_job = self.root.after(self.WATCH_INTERVAL_MS, self._watch_schema)
+
+    def _watch_schema(self):
+        self._watch_job = None
+        if self.pool is None:
+            return
+        if self._watch_task is not None and not self._watch_task.future.done():
+            # La comprobación anterior sigue en curso
+            self.schedule_schema_watch()
+            return
+        lineage_known = self.lineage.markers() if self.lineage.loaded else None
+        self._watch_task = self.db.submit(self._poll_schema, self.snapshot, self._schema_fingerprint,
+                                          dict(self.catalog.objects), lineage_known,
+                                          on_success=self._on_schema_polled, on_error=self._on_schema_poll_error,
+                                          timeout=self.QUERY_TIMEOUT, on_cancel=self._cancel_current_query)
+
+    def _poll_schema(self, snapshot, fingerprint, known, lineage_known):
+        # Hilo de trabajo: una consulta de una fila; solo si cambió se leen los deltas
+        def fetch(cursor):
+            current = self.catalog.fetch_fingerprint(cursor)
+            if current == fingerprint:
+                return current, None, None, None, None
+            delta = self.catalog.fetch_changes(cursor, known)
+            if not (delta['full'] or delta['stale']):
+                return current, None, None, None, None
+            views = self._fetch_views(cursor)
+            lineage = self.lineage.fetch_changes(cursor, lineage_known) if lineage_known is not None else None
+            if delta['full']:
+                return current, delta, views, lineage, self.fk_graph.fetch_rows(cursor)
+            # Solo las FK de las tablas que cambiaron
+            changed = self.fk_graph.fetch_rows(cursor, delta['changed'])
+            return current, delta, views, lineage, self.fk_graph.merge_rows(delta['stale'], changed)
+        current, delta, views, lineage, foreign_keys = self.pool.run(fetch)
+        if delta is not None:
+            snapshot.write_changes(delta)
+            snapshot.write_foreign_keys(foreign_keys)
+        if lineage is not None:
+            lineage['records'] = parse_lineage(lineage.pop('rows'), os.cpu_count() or 1)
+            if lineage['records'] or lineage['removed']:
+                snapshot.write_lineage(lineage)
+        return current, delta, views, lineage, foreign_keys
+
+    def _on_schema_polled(self, result):
+        self._watch_task = None
+        self._schema_fingerprint, delta, views, lineage, foreign_keys = result
+        if delta is not None:
+            stale = self.catalog.apply_changes(delta)
+            self.populate_catalog_widgets(stale)
+            self.set_views(views)
+            self.set_foreign_keys(foreign_keys)
+            if stale is None:
+                self.refresh_indexes()
+            else:
+                self.refresh_indexes(stale, delta['changed'])
+            changed_views = []
+            if lineage is not None:
+                self.lineage.apply_changes(lineage)
+                changed_views = [r[0] for r in lineage['records'].values()]
+            self.apply_schema_drift(stale, changed_views)
+            count = len(delta['objects']) if stale is None else len(stale)
+            self.drift_label.config(text=f"🔄 Esquema actualizado {time.strftime('%H:%M')}: {count} objeto(s)")
+        self.schedule_schema_watch()
+
+    def _on_schema_poll_error(self, error):
+        self._watch_task = None
+        self.drift_label.config(text=f"⚠ No se pudo comprobar el esquema: {error}")
+        self.schedule_schema_watch()
+
+    def apply_schema_drift(self, stale, changed_views=()):
+        # stale=None: se recargó todo el catálogo
+        keys = None if stale is None else {self.lineage.key(t) for t in stale}
+
+        def touched(table):
+            return bool(table) and (keys is None or self.lineage.key(table) in keys)
+
+        # Los planes en caché pueden haber cambiado con el esquema
+        self.plans.clear()
+
+        # Constructor: columnas de las tablas elegidas, conservando la selección
+        if touched(self.main_combo.get()):
+            columns = self.get_columns(self.main_combo.get())
+            self.main_fk_combo['values'] = columns
+            self.main_columns_grid.merge_names(columns)
+            self.schedule_sql_preview()
+        if touched(self.related_combo.get()):
+            self.load_related_columns(None)
+
+        # Editor: marcar en rojo lo que ya no existe
+        spec = self.edit_spec
+        if spec is not None and (touched(spec.fact_table) or any(touched(j['related_table']) for j in self.selected_joins)):
+            self.check_edited_view()
+
+        if keys is None:
+            self.update_broken_views()
+        else:
+            dropped = [t for t in stale if not self.catalog.has_table(t)]
+            affected = set(changed_views)
+            for table in stale:
+                affected.update(self.lineage.views_using(table))
+            self.update_broken_views(affected, dropped)
+
+    def check_edited_view(self):
+        # Solo se marcan columnas de tablas que el catálogo conoce: de una tabla
+        # desconocida (otra base de datos, un sinónimo) no se sabe qué columnas tiene
+        if self.catalog.has_table(self.edit_spec.fact_table):
+            fact_columns = self.get_columns(self.edit_spec.fact_table)
+            self.new_main_fk_combo['values'] = fact_columns
+            self.edit_main_columns_grid.merge_names(fact_columns, selected=False, keep_missing=True)
+        else:
+            self.edit_main_columns_grid.set_missing([])
+        tables = {j['alias'].lower(): j['related_table'] for j in self.selected_joins}
+        missing = []
+        for name, _, extra in self.edit_related_columns_grid.rows:
+            table = tables.get(extra[0].lower()) if extra else None
+            if (table and extra[1] != "*" and self.catalog.has_table(table)
+                    and not self.catalog.has_column(table, extra[1])):
+                missing.append(name)
+        self.edit_related_columns_grid.set_missing(missing)
+        return sorted(self.edit_main_columns_grid.missing) + missing
+
+    def update_broken_views(self, views=None, dropped=()):
+        if views is None:
+            self.broken_views = self.lineage.broken_views(self.catalog)
+        else:
+            for name in views:
+                self.broken_views.pop(name, None)
+            self.broken_views.update(self.lineage.broken_views(self.catalog, views, dropped))
+        # Vistas que ya no existen
+        for name in [v for v in self.broken_views if self.lineage.lineage(v) is None]:
+            del self.broken_views[name]
+
+        if not self.broken_views:
+            self.broken_label.config(text="")
+            return
+        names = sorted(self.broken_views, key=str.lower)
+        detail = ", ".join(f"{v} ({', '.join(self.broken_views[v][:2])})" for v in names[:3])
+        more = f" y {len(names) - 3} más" if len(names) > 3 else ""
+        self.broken_label.config(text=f"⚠ {len(names)} vista(s) usan columnas que ya no existen: {detail}{more}")
+
+    def schedule_lineage_filter(self):
+        if self._lineage_job is not None:
+            self.root.after_cancel(self._lineage_job)
+        self._lineage_job = self.root.after(self.LINEAGE_FILTER_MS, self.filter_views_by_lineage)
+
+    def filter_views_by_lineage(self):
+        self._lineage_job = None
+        text = self.lineage_entry.get().strip()
+        if not text:
             self.view_combo['values'] = self.existing_views
+            self.lineage_label.config(text="")
+            return
+        if not self.lineage.loaded:
+            self.lineage_label.config(text="Índice de vistas no disponible todavía")
+            return
+        views = self.lineage.search(text)
+        self.view_combo['values'] = views
+        self.lineage_label.config(text=f"{len(views)} vista(s) usan '{text}'")
 
-        except Exception as e:
-            messagebox.showerror("Error de conexión", str(e))
+    def _fetch_definition(self, view_name, cursor=None):
+        if cursor is None:
+            return self.pool.run(lambda c: self._fetch_definition(view_name, c))
+        cursor.execute("SELECT definition FROM sys.sql_modules WHERE object_id = OBJECT_ID(?)", view_name)
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def _execute_ddl(self, sql, view_name):
+        # Hilo de trabajo: desplegar y releer la vista y sus columnas.
+        # sql puede ser una lista de lotes que se ejecutan en la misma sesión
+        # (vista indexada); un único CREATE OR ALTER se omite si la definición
+        # desplegada es la misma (devuelve None).
+        if isinstance(sql, str):
+            plan = self.pool.run(lambda cursor: DeployPlan.fetch(cursor, [(view_name, sql)]))
+            if not plan.pending:
+                return None
+            self.pool.run(plan.execute, commit=True)
+        else:
+            def run(cursor):
+                for batch in sql:
+                    cursor.execute(batch)
+            self.pool.run(run, commit=True)
+        return self.pool.run(lambda cursor: (self._fetch_views(cursor), self.catalog.fetch_rows(cursor, [view_name])))
+
+    def _on_view_deployed(self, result, view_name, title, message):
+        if result is None:
+            messagebox.showinfo("Sin cambios", f"La vista '{view_name}' ya está desplegada con esta definición; "
+                                "no se ha vuelto a crear")
+            return
+        views, rows = result
+        self.catalog.apply_rows([view_name], rows)
+        if view_name == self.edit_view_name and self._diff_window is not None and self._diff_window.winfo_exists():
+            self.refresh_deployed_definition()
+        self.set_views(views)
+        self.refresh_lineage()
+        messagebox.showinfo(title, message)
+
+    def _cancel_current_query(self, task):
+        if self.pool is not None and task.thread_id is not None:
+            self.pool.cancel(task.thread_id)
+
+    def cancel_db_tasks(self):
+        self.cancel_data_preview()
+        self.db.cancel()
+
+    def on_db_busy(self, descriptions):
+        if descriptions:
+            extra = f" (+{len(descriptions) - 1})" if len(descriptions) > 1 else ""
+            self.busy_label.config(text=f"⏳ {descriptions[0]}{extra}")
+            if not self.busy_bar.winfo_ismapped():
+                self.busy_bar.pack(side=tk.LEFT, padx=10)
+                self.cancel_button.pack(side=tk.LEFT)
+                self.busy_bar.start(15)
+        else:
+            self.busy_label.config(text="")
+            self.busy_bar.stop()
+            self.busy_bar.pack_forget()
+            self.cancel_button.pack_forget()
+
+    def show_profiler_panel(self):
+        # Tiempos agregados en vivo (n, p50, p95, total) y exportación de la traza
+        if self._profiler_window is not None and self._profiler_window.winfo_exists():
+            self._profiler_window.lift()
+            return
+        window = self._profiler_window = tk.Toplevel(self.root)
+        window.title("Rendimiento")
+        window.geometry("900x450")
+        toolbar = ttk.Frame(window, padding=(10, 10, 10, 0))
+        toolbar.pack(fill=tk.X)
+        enabled = tk.BooleanVar(value=self.profiler.enabled)
+
+        def toggle():
+            self.profiler.enabled = enabled.get()
+
+        def export():
+            path = filedialog.asksaveasfilename(parent=window, defaultextension=".json",
+                                                filetypes=[("Chrome trace", "*.json"), ("All Files", "*.*")],
+                                                title="Exportar traza")
+            if path:
+                try:
+                    self.profiler.export_chrome_trace(path)
+                except Exception as e:
+                    messagebox.showerror("Error al exportar", str(e), parent=window)
+
+        ttk.Checkbutton(toolbar, text="Instrumentar", variable=enabled, command=toggle).pack(side=tk.LEFT)
+        ttk.Button(toolbar, text="Reiniciar", command=self.profiler.reset).pack(side=tk.LEFT, padx=5)
+        ttk.Button(toolbar, text="💾 Exportar traza (Chrome)", command=export).pack(side=tk.LEFT, padx=5)
+
+        columns = ("category", "name", "count", "p50", "p95", "total", "max")
+        tree = ttk.Treeview(window, columns=columns, show="headings")
+        for col, text, width in zip(columns, ("Tipo", "Nombre", "N", "p50 ms", "p95 ms", "Total ms", "Máx ms"),
+                                    (60, 300, 60, 80, 80, 90, 80)):
+            tree.heading(col, text=text)
+            tree.column(col, width=width, anchor="w" if col in ("category", "name") else "e")
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        def refresh():
+            if not window.winfo_exists():
+                return
+            rows = self.profiler.stats()
+            items = tree.get_children()
+            if len(items) > len(rows):
+                tree.delete(*items[len(rows):])
+            for i, (category, name, count, p50, p95, total, peak) in enumerate(rows):
+                values = (category, name, count, f"{p50 * 1000:.2f}", f"{p95 * 1000:.2f}",
+                          f"{total * 1000:.1f}", f"{peak * 1000:.2f}")
+                if i < len(items):
+                    tree.item(items[i], values=values)
+                else:
+                    tree.insert("", "end", values=values)
+            window.after(self.PROFILER_REFRESH_MS, refresh)
+
+        refresh()
+
+    def on_close(self):
+        if self._watch_job is not None:
+            self.root.after_cancel(self._watch_job)
+        self.db.shutdown()
+        if self.pool is not None:
+            self.pool.close()
+        self.root.destroy()
 
     def get_columns(self, table):
-        self.cursor.execute(f"SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_NAME = '{table}'")
-        return [r[0] for r in self.cursor.fetchall()]
+        return self.catalog.get_columns(table)
 
     def load_fact_columns(self, _):
+        self.build_tab(self.editor_frame)
         self.current_fact_table = self.main_combo.get()
         columns = self.get_columns(self.current_fact_table)
         self.main_fk_combo['values'] = columns
         self.new_main_fk_combo['values'] = columns
         
-        # Load columns into the treeview
-        self.main_columns_tree.delete(*self.main_columns_tree.get_children())
-        for col in columns:
-            self.main_columns_tree.insert("", "end", values=(col, "✓"), tags=("checked",))
+        # Load columns into the grid (solo se dibujan las filas visibles)
+        self.main_columns_grid.set_rows((col, True, None) for col in columns)
+        self.update_join_suggestions()
+        self.schedule_sql_preview()
 
-    def load_related_columns(self, _):
+    def load_related_columns(self, _, path=None):
         related_table = self.related_combo.get()
         columns = self.get_columns(related_table)
         self.related_pk_combo['values'] = columns
         self.related_col_combo['values'] = columns
+        # Rellenar FK/PK con la ruta más corta del grafo de claves foráneas
+        if path is None and self.current_fact_table:
+            paths = self.fk_graph.shortest_paths(self.current_fact_table, related_table)
+            path = paths[0] if paths else None
+        self.select_join_path(path)
 
-    def on_fact_column_click(self, event):
-        region = self.main_columns_tree.identify("region", event.x, event.y)
-        if region == "cell":
-            column = self.main_columns_tree.identify_column(event.x)
-            item = self.main_columns_tree.identify_row(event.y)
-            
-            if column == "#2":  # Checkbox column
-                current_values = self.main_columns_tree.item(item, "values")
-                new_value = " " if current_values[1] == "✓" else "✓"
-                self.main_columns_tree.item(item, values=(current_values[0], new_value), 
-                                          tags=("checked" if new_value == "✓" else "unchecked",))
-                self.generate_sql()
+    def update_join_suggestions(self):
+        self.fk_tree.delete(*self.fk_tree.get_children())
+        self.fk_suggestions = self.fk_graph.paths_from(self.current_fact_table) if self.current_fact_table else []
+        for i, path in enumerate(self.fk_suggestions):
+            self.fk_tree.insert("", "end", iid=str(i), values=(path[-1].referenced, describe_fk_path(path)))
+
+    def use_fk_suggestion(self, event):
+        item = self.fk_tree.identify_row(event.y)
+        if not item:
+            return
+        path = self.fk_suggestions[int(item)]
+        self.related_combo.set(path[-1].referenced)
+        self.load_related_columns(None, path)
+
+    def select_join_path(self, path):
+        self._pending_path = path
+        if path is None:
+            self.main_fk_combo['values'] = self.get_columns(self.current_fact_table) if self.current_fact_table else []
+            self.path_label.config(text="")
+            return
+        # En una ruta de varios saltos la FK del último JOIN está en la tabla intermedia
+        last = path[-1]
+        self.main_fk_combo['values'] = self.get_columns(last.table)
+        self.main_fk_combo.set(last.columns[0][0])
+        self.related_pk_combo.set(last.columns[0][1])
+        composite = " (clave compuesta)" if len(last.columns) > 1 else ""
+        self.path_label.config(text=f"Ruta: {describe_fk_path(path)}{composite}")
+
+    def new_join_alias(self, table):
+        # Alias estable: no cambia al quitar otros JOIN, así los encadenados siguen apuntando bien
+        used = {j['alias'].lower() for j in self.selected_joins if j.get('alias')}
+        index = len(self.selected_joins)
+        while default_join_alias(table, index).lower() in used:
+            index += 1
+        return default_join_alias(table, index)
+
+    def _path_join(self, fk, parent):
+        # JOIN intermedio de una ruta; se reutiliza si la vista ya lo tiene
+        main_fk, related_pk = fk.columns[0]
+        for j in self.selected_joins:
+            if (j['related_table'].lower() == fk.referenced.lower() and j.get('parent') == parent
+                    and j['main_fk'] == main_fk and j['related_pk'] == related_pk):
+                return j['alias']
+        alias = self.new_join_alias(fk.referenced)
+        self.selected_joins.append({
+            'related_table': fk.referenced,
+            'main_fk': main_fk,
+            'related_pk': related_pk,
+            'related_col': None,
+            'col_alias': None,
+            'alias': alias,
+            'parent': parent,
+            'condition': fk_join_condition(fk, parent or "f", alias) if len(fk.columns) > 1 else None
+        })
+        return alias
 
     def add_join(self):
         join = {
@@ -432,75 +4265,161 @@ class ModernSQLViewGenerator:
             'main_fk': self.main_fk_combo.get(),
             'related_pk': self.related_pk_combo.get(),
             'related_col': self.related_col_combo.get(),
-            'col_alias': self.col_alias_entry.get() or f"{self.related_combo.get()}_{self.related_col_combo.get()}"
+            'col_alias': self.col_alias_entry.get() or f"{short_table_name(self.related_combo.get())}_{self.related_col_combo.get()}"
         }
         if not all([join['related_table'], join['main_fk'], join['related_pk'], join['related_col']]):
             messagebox.showwarning("Campos incompletos", "Completa todos los campos para agregar un JOIN")
             return
+
+        path = self._pending_path
+        if path is not None and self.fk_graph.key(path[-1].referenced) != self.fk_graph.key(join['related_table']):
+            path = None
+        parent = None
+        if path is not None:
+            for fk in path[:-1]:
+                parent = self._path_join(fk, parent)
+        join['alias'] = self.new_join_alias(join['related_table'])
+        join['parent'] = parent
+        join['condition'] = None
+        # Clave compuesta sugerida: solo si el usuario no cambió FK/PK
+        if path is not None and len(path[-1].columns) > 1 and path[-1].columns[0] == (join['main_fk'], join['related_pk']):
+            join['condition'] = fk_join_condition(path[-1], parent or "f", join['alias'])
         self.selected_joins.append(join)
-        self.join_tree.insert("", "end", values=(join['related_table'], join['main_fk'], join['related_pk'], join['related_col'], join['col_alias']))
-        self.generate_sql()
+        self.refresh_join_tree()
+        self.schedule_sql_preview()
+
+    def refresh_join_tree(self):
+        aliases = {j['alias']: j['related_table'] for j in self.selected_joins}
+        self.join_tree.delete(*self.join_tree.get_children())
+        for j in self.selected_joins:
+            main_fk = f"{aliases.get(j['parent'], j['parent'])}.{j['main_fk']}" if j.get('parent') else j['main_fk']
+            self.join_tree.insert("", "end", values=(j['related_table'], main_fk, j['related_pk'],
+                                                     j['related_col'] or "(ruta)", j['col_alias'] or "", ""))
 
     def remove_join(self):
         selected_item = self.join_tree.selection()
         if not selected_item:
             return
         index = self.join_tree.index(selected_item)
-        self.join_tree.delete(selected_item)
-        if index < len(self.selected_joins):
-            del self.selected_joins[index]
-        self.generate_sql()
+        if index >= len(self.selected_joins):
+            return
+        # También se quitan los JOIN que cuelgan del eliminado
+        removed = {self.selected_joins[index]['alias']}
+        remaining = [j for i, j in enumerate(self.selected_joins) if i != index]
+        while True:
+            orphans = [j for j in remaining if j.get('parent') in removed]
+            if not orphans:
+                break
+            removed.update(j['alias'] for j in orphans)
+            remaining = [j for j in remaining if j['alias'] not in removed]
+        self.selected_joins = remaining
+        self.refresh_join_tree()
+        self.schedule_sql_preview()
+
+    def build_view_spec(self):
+        # Construye el ViewSpec a partir del estado del Constructor
+        fact_columns = self.main_columns_grid.selected_names()
+
+        joins = []
+        for i, j in enumerate(self.selected_joins):
+            columns = []
+            if j['related_col']:
+                columns.append((j['related_col'], j.get('col_alias') or f"{short_table_name(j['related_table'])}_{j['related_col']}"))
+            joins.append(JoinSpec(j['related_table'], j['main_fk'], j['related_pk'],
+                                  j.get('alias') or default_join_alias(j['related_table'], i), columns,
+                                  condition=j.get('condition'), parent=j.get('parent')))
+        return ViewSpec(self.current_fact_table, fact_columns, joins, self.view_name_entry.get().strip() or None)
 
     def generate_sql(self):
         if not self.current_fact_table:
             return
+        self.build_tab(self.scripts_frame)
 
-        # Obtener columnas seleccionadas de la tabla fact
-        fact_columns = []
-        for item in self.main_columns_tree.get_children():
-            values = self.main_columns_tree.item(item, "values")
-            if values[1] == "✓":
-                fact_columns.append(f"f.{values[0]}")
-
-        if not fact_columns:
+        spec = self.build_view_spec()
+        self.update_cardinality(spec)
+        if not spec.fact_columns:
             messagebox.showwarning("Sin columnas", "Selecciona al menos una columna de la tabla fact")
             return
 
-        select_parts = fact_columns
-        joins = []
+        dropped = []
+        self.generated_sql = compile_view_sql(spec, self.get_columns, self.indexes.is_unique, dropped)
+        if dropped:
+            text = self.cardinality_label.cget("text")
+            self.cardinality_label.config(text="\n".join(filter(None, [text, dropped_joins_note(dropped)])))
+        if self.indexed_view_var.get():
+            batches, self.indexed_problems, notes = plan_indexed_view(
+                spec, self.view_name_entry.get().strip(), self.catalog, self.indexes, self.fk_graph)
+            self.indexed_batches = batches or None
+            if batches:
+                converted = f" ({len(notes)} LEFT → INNER)" if notes else ""
+                self.indexed_label.config(text=f"✔ Apta{converted}", foreground="#4CAF50")
+                self.sql_highlighter.replace("\nGO\n".join(batches))
+                return
+            self.indexed_label.config(text=f"✖ No apta: {len(self.indexed_problems)} regla(s)", foreground="#ff6b6b")
+        self.sql_highlighter.replace(self.generated_sql)
 
-        for i, j in enumerate(self.selected_joins):
-            alias = j['related_table'][:3] + str(i)
-            related_col = j['related_col']
-            col_alias = j.get('col_alias', f"{j['related_table']}_{related_col}")
+    def update_cardinality(self, spec):
+        # Filas estimadas por JOIN y de la vista completa, con metadatos en caché
+        if not self.indexes.loaded:
+            self.cardinality_label.config(text="")
+            return
+        estimate = estimate_view_cardinality(spec, self.catalog, self.indexes)
+        for item, join in zip(self.join_tree.get_children(), spec.joins):
+            e = estimate.joins.get(join.alias.lower())
+            if e is None:
+                continue
+            rows = f"{e.rows:,.0f}" if e.rows is not None else "?"
+            fanout = f"×{e.fanout:,.1f} " if e.fanout not in (None, 1.0) else ""
+            self.join_tree.set(item, "estimate", f"{fanout}{rows}")
+            self.join_tree.item(item, tags=("fanout",) if e.flagged else ())
+        notes = [f"{e.join.alias} → {e.join.table}: {e.note}" for e in estimate.distinct if e.flagged]
+        self.cardinality_label.config(text="\n".join([cardinality_summary(estimate)] + notes),
+                                      foreground="#ff6b6b" if notes else "black")
 
-            # Si el usuario seleccionó '*', expandimos a todas las columnas
-            if related_col == "*":
-                try:
-                    related_cols = self.get_columns(j['related_table'])
-                    for col in related_cols:
-                        select_parts.append(f"{alias}.{col} AS [{j['related_table']}_{col}]")
-                except Exception as e:
-                    messagebox.showerror("Error obteniendo columnas", f"No se pudieron obtener las columnas de {j['related_table']}.\n{e}")
-                    return
-            else:
-                select_parts.append(f"{alias}.{related_col} AS [{col_alias}]")
+    def toggle_indexed_view(self):
+        if not self.indexed_view_var.get():
+            self.indexed_batches = None
+            self.indexed_label.config(text="")
+            self.schedule_sql_preview()
+            return
+        if not self.current_fact_table:
+            return
+        self.generate_sql()
+        if self.indexed_batches is None:
+            messagebox.showwarning("Vista indexada no disponible",
+                                   "La vista no cumple las reglas de una vista indexada:\n\n• " +
+                                   "\n• ".join(self.indexed_problems))
+            self.indexed_view_var.set(False)
+            self.toggle_indexed_view()
 
-            joins.append(f"LEFT JOIN {j['related_table']} {alias} ON f.{j['main_fk']} = {alias}.{j['related_pk']}")
+    def schedule_sql_preview(self):
+        # Agrupa los cambios seguidos (clics, joins) en una sola regeneración
+        if self._preview_job is not None:
+            self.root.after_cancel(self._preview_job)
+        self._preview_job = self.root.after(self.PREVIEW_DELAY_MS, self._run_sql_preview)
 
-        self.generated_sql = (
-            "SELECT\n    " + ",\n    ".join(select_parts) +
-            f"\nFROM {self.current_fact_table} f\n" +
-            "\n".join(joins)
-        )
+    def _run_sql_preview(self):
+        self._preview_job = None
+        self.generate_sql()
 
-        self.sql_text.delete("1.0", tk.END)
-        self.sql_text.insert(tk.END, self.generated_sql)
+    def flush_sql_preview(self):
+        if self._preview_job is not None:
+            self.root.after_cancel(self._preview_job)
+            self._run_sql_preview()
 
     def reset_builder_view(self):
+        self.build_tab(self.scripts_frame)
+        if self._preview_job is not None:
+            self.root.after_cancel(self._preview_job)
+            self._preview_job = None
         self.current_fact_table = None
         self.selected_joins = []
         self.generated_sql = ""
+        self.indexed_view_var.set(False)
+        self.indexed_batches = None
+        self.indexed_label.config(text="")
+        self.select_join_path(None)
+        self.update_join_suggestions()
         self.view_name_entry.delete(0, tk.END)
 
         # Reset Comboboxes
@@ -512,11 +4431,11 @@ class ModernSQLViewGenerator:
         self.col_alias_entry.delete(0, tk.END)
 
         # Borrar árboles
-        self.main_columns_tree.delete(*self.main_columns_tree.get_children())
+        self.main_columns_grid.clear()
         self.join_tree.delete(*self.join_tree.get_children())
 
         # Borrar texto SQL
-        self.sql_text.delete("1.0", tk.END)
+        self.sql_highlighter.replace("")
 
         messagebox.showinfo("Nueva Vista", "Constructor reiniciado. Puedes comenzar una nueva vista.")
 
@@ -525,37 +4444,46 @@ class ModernSQLViewGenerator:
         if not view_name:
             messagebox.showerror("Nombre faltante", "Debes ingresar un nombre para la vista")
             return
-        if not hasattr(self, 'generated_sql') or not self.generated_sql:
+        self.flush_sql_preview()
+        if not hasattr(self, 'generated_sql') or not self.generated_sql or self.indexed_view_var.get():
             self.generate_sql()
-        create_sql = f"CREATE OR ALTER VIEW {view_name} AS \n{self.generated_sql}"
-        try:
-            self.cursor.execute(create_sql)
-            self.connection.commit()
-            messagebox.showinfo("Vista creada", f"La vista '{view_name}' fue creada exitosamente")
-            # Refresh views list
-            self.cursor.execute("SELECT name FROM sys.views")
-            self.existing_views = [r[0] for r in self.cursor.fetchall()]
-            self.view_combo['values'] = self.existing_views
-        except Exception as e:
-            messagebox.showerror("Error al crear vista", str(e))
+        create_sql = create_view_statement(view_name, self.generated_sql)
+        if self.indexed_view_var.get():
+            if self.indexed_batches is None:
+                messagebox.showerror("Vista indexada no disponible", "\n".join(self.indexed_problems))
+                return
+            create_sql = self.indexed_batches
+        if not self.require_connection():
+            return
+        if not self.confirm_lint(self.generated_sql, "Crear de todos modos"):
+            return
+        self.db.submit(self._execute_ddl, create_sql, view_name,
+                       on_success=lambda r: self._on_view_deployed(r, view_name, "Vista creada", f"La vista '{view_name}' fue creada exitosamente"),
+                       on_error=lambda e: messagebox.showerror("Error al crear vista", str(e)),
+                       timeout=self.TASK_TIMEOUT, on_cancel=self._cancel_current_query,
+                       description=f"Creando vista {view_name}")
 
     def load_existing_view(self):
         view_name = self.view_name_entry.get().strip()
         if not view_name:
             messagebox.showerror("Nombre faltante", "Especifica el nombre de la vista a cargar")
             return
-        try:
-            self.cursor.execute(f"SELECT definition FROM sys.sql_modules WHERE object_id = OBJECT_ID('{view_name}')")
-            row = self.cursor.fetchone()
-            if row:
-                self.generated_sql = row[0]
-                self.sql_text.delete("1.0", tk.END)
-                self.sql_text.insert(tk.END, self.generated_sql)
-                messagebox.showinfo("Vista cargada", f"Vista '{view_name}' cargada correctamente (solo lectura de SQL).")
-            else:
-                messagebox.showwarning("No encontrado", "No se encontró la vista especificada.")
-        except Exception as e:
-            messagebox.showerror("Error al cargar vista", str(e))
+        if not self.require_connection():
+            return
+        self.db.submit(self._fetch_definition, view_name,
+                       on_success=lambda d: self._on_existing_view_loaded(view_name, d),
+                       on_error=lambda e: messagebox.showerror("Error al cargar vista", str(e)),
+                       timeout=self.TASK_TIMEOUT, on_cancel=self._cancel_current_query,
+                       description=f"Cargando vista {view_name}")
+
+    def _on_existing_view_loaded(self, view_name, definition):
+        self.build_tab(self.scripts_frame)
+        if definition:
+            self.generated_sql = definition
+            self.sql_highlighter.replace(self.generated_sql)
+            messagebox.showinfo("Vista cargada", f"Vista '{view_name}' cargada correctamente (solo lectura de SQL).")
+        else:
+            messagebox.showwarning("No encontrado", "No se encontró la vista especificada.")
 
     def copy_sql(self):
         self.root.clipboard_clear()
@@ -576,6 +4504,140 @@ class ModernSQLViewGenerator:
             except Exception as e:
                 messagebox.showerror("Error al guardar", str(e))
 
+    def toggle_plan_panel(self):
+        if self.plan_var.get():
+            self.scripts_pane.add(self.plan_frame, weight=2)
+            self.show_plan()
+        else:
+            self.scripts_pane.forget(self.plan_frame)
+
+    def current_select_sql(self):
+        # En modo vista indexada el editor muestra varios lotes: se pide el plan del SELECT
+        if self.indexed_batches:
+            return self.generated_sql
+        return self.sql_text.get("1.0", tk.END).strip()
+
+    def show_plan(self, refresh=False):
+        sql = self.current_select_sql()
+        if not sql:
+            replace_text(self.plan_text, "Genera primero una vista.")
+            return
+        key = sql_hash(sql)
+        self._plan_key = key
+        plan = None if refresh else self.plans.get(key)
+        if plan is not None:
+            replace_text(self.plan_text, plan.report())
+            return
+        if self.pool is None:
+            replace_text(self.plan_text, "Conéctate a la base de datos para obtener el plan.")
+            return
+        replace_text(self.plan_text, "⏳ Obteniendo el plan estimado...")
+        self.db.submit(lambda: parse_showplan_xml(*self.pool.run(lambda c: PlanCache.fetch_xml(c, sql))),
+                       on_success=lambda plan: self._on_plan_loaded(key, plan),
+                       on_error=lambda e: self._on_plan_error(key, e),
+                       timeout=self.TASK_TIMEOUT, on_cancel=self._cancel_current_query,
+                       description="Plan estimado")
+
+    def _on_plan_loaded(self, key, plan):
+        self.plans.put(key, plan)
+        if key == self._plan_key:
+            replace_text(self.plan_text, plan.report())
+
+    def _on_plan_error(self, key, error):
+        if key == self._plan_key:
+            replace_text(self.plan_text, f"✖ No se pudo obtener el plan:\n{error}")
+
+    def run_data_preview(self):
+        if not self.require_connection():
+            return
+        self.flush_sql_preview()
+        sql = self.current_select_sql()
+        if not sql:
+            messagebox.showwarning("Sin SQL", "Genera primero la vista")
+            return
+        try:
+            limit = max(1, min(int(self.preview_limit.get()), self.PREVIEW_MAX_ROWS))
+        except ValueError:
+            limit = self.PREVIEW_ROWS
+        self.cancel_data_preview()
+        if str(self.data_frame) not in self.preview_pane.panes():
+            self.preview_pane.add(self.data_frame, weight=2)
+        self.data_grid.clear()
+        self.preview_stats.config(text="⏳ Ejecutando...")
+        stop = self._data_stop = threading.Event()
+        self._data_task = self.db.submit(
+            self._stream_preview, sql, limit, stop,
+            on_progress=lambda batch: self._on_preview_rows(stop, batch),
+            on_success=lambda result: self._on_preview_done(stop, result),
+            on_error=lambda e: self._on_preview_error(stop, e),
+            timeout=self.TASK_TIMEOUT, on_cancel=self._cancel_current_query, description="Vista previa")
+
+    def _stream_preview(self, sql, limit, stop, report):
+        # Hilo de trabajo: envía las filas por lotes (fetchmany) en cuanto llegan
+        def run(cursor):
+            started = time.perf_counter()
+            cursor.execute(preview_query(sql, limit))
+            columns = [d[0] for d in cursor.description]
+            report((columns, None, None))
+            first = None
+            count = 0
+            while not stop.is_set():
+                rows = cursor.fetchmany(self.PREVIEW_BATCH)
+                if not rows:
+                    break
+                if first is None:
+                    first = time.perf_counter() - started
+                count += len(rows)
+                report((None, [tuple(preview_cell(v) for v in row) for row in rows], first))
+            cursor.close()
+            return count, first, time.perf_counter() - started
+        return self.pool.run(run)
+
+    def _on_preview_rows(self, stop, batch):
+        if stop is not self._data_stop:
+            return
+        columns, rows, first = batch
+        if columns is not None:
+            self.data_grid.set_columns(columns)
+            return
+        self.data_grid.append(rows)
+        self.preview_stats.config(text=f"⏳ {len(self.data_grid.rows):,} filas · primera fila en {first * 1000:.0f} ms")
+
+    def _on_preview_done(self, stop, result):
+        if stop is not self._data_stop:
+            return
+        self._data_task = None
+        count, first, elapsed = result
+        if first is None:
+            self.preview_stats.config(text=f"Sin filas · {elapsed:.2f} s")
+            return
+        stopped = " · detenida" if stop.is_set() else ""
+        self.preview_stats.config(text=f"{count:,} filas · {len(self.data_grid.columns)} columnas · "
+                                       f"primera fila en {first * 1000:.0f} ms · total {elapsed:.2f} s · "
+                                       f"{count / max(elapsed, 1e-6):,.0f} filas/s{stopped}")
+
+    def _on_preview_error(self, stop, error):
+        if stop is not self._data_stop:
+            return
+        self._data_task = None
+        self.preview_stats.config(text=f"✖ {error}")
+
+    def cancel_data_preview(self):
+        if self._data_task is None:
+            return
+        # Con filas ya recibidas basta con dejar de leer; si la consulta aún no
+        # devolvió nada hay que abortarla en el servidor
+        self._data_stop.set()
+        if not self.data_grid.rows:
+            self.db.cancel(self._data_task)
+            self._data_task = None
+            self.preview_stats.config(text="Detenida")
+
+    def close_data_preview(self):
+        self.cancel_data_preview()
+        self.data_grid.clear()
+        self.preview_pane.forget(self.data_frame)
+
      # ========== VIEW EDITOR FUNCTIONS ==========
     def load_view_for_editing(self):
         view_name = self.view_combo.get()
@@ -583,196 +4645,219 @@ class ModernSQLViewGenerator:
             messagebox.showwarning("Selección requerida", "Selecciona una vista para editar")
             return
         
-        try:
-            # Get view definition
-            self.cursor.execute(f"SELECT definition FROM sys.sql_modules WHERE object_id = OBJECT_ID('{view_name}')")
-            view_def = self.cursor.fetchone()[0]
-            
-            # Parse the SQL to extract components
-            self.parse_view_sql(view_name, view_def)
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo cargar la vista: {str(e)}")
+        if not self.require_connection():
+            return
+        self.db.submit(self._fetch_view_for_editing, view_name,
+                       on_success=lambda r: self._on_view_for_editing_loaded(view_name, r),
+                       on_error=lambda e: messagebox.showerror("Error", f"No se pudo cargar la vista: {str(e)}"),
+                       timeout=self.TASK_TIMEOUT, on_cancel=self._cancel_current_query,
+                       description=f"Cargando vista {view_name}")
+
+    def _fetch_view_for_editing(self, view_name):
+        # Hilo de trabajo: definición + columnas de tablas que aún no están en el catálogo
+        def fetch(cursor):
+            view_def = self._fetch_definition(view_name, cursor)
+            if view_def is None:
+                raise LookupError(f"No se encontró la vista '{view_name}'")
+            try:
+                tables = parse_view_definition(view_def).referenced_tables()
+            except SQLParseError:
+                tables = []  # el error se muestra al analizar en la interfaz
+            missing = self.catalog.missing(tables)
+            rows = self.catalog.fetch_rows(cursor, missing) if missing else []
+            return view_def, missing, rows
+        return self.pool.run(fetch)
+
+    def _on_view_for_editing_loaded(self, view_name, result):
+        view_def, missing, rows = result
+        self.catalog.apply_rows(missing, rows)
+        self.edit_view_name = view_name
+        self.edit_deployed = view_def
+        # Parse the SQL to extract components
+        self.parse_view_sql(view_name, view_def)
 
     def parse_view_sql(self, view_name, sql):
+        self.build_tab(self.builder_frame)
         # Clear previous data
-        self.edit_main_columns_tree.delete(*self.edit_main_columns_tree.get_children())
-        self.edit_related_columns_tree.delete(*self.edit_related_columns_tree.get_children())
-        self.edit_sql_text.delete("1.0", tk.END)
-        
-        # Extract the FROM clause to find the fact table
-        from_match = re.search(r"FROM\s+([^\s]+)\s+f", sql, re.IGNORECASE)
-        if not from_match:
-            messagebox.showerror("Error", "No se pudo identificar la tabla principal en la vista")
-            return
-        
-        fact_table = from_match.group(1)
-        self.current_fact_table = fact_table
+        self.edit_main_columns_grid.clear()
+        self.edit_related_columns_grid.clear()
+        self.edit_highlighter.replace("")
         
-        # Get all columns from fact table
-        fact_columns = self.get_columns(fact_table)
-        
-        # Parse SELECT clause to find included columns
-        select_match = re.search(r"SELECT\s+(.*?)\s+FROM", sql, re.IGNORECASE | re.DOTALL)
-        if not select_match:
-            messagebox.showerror("Error", "No se pudo analizar la cláusula SELECT")
+        try:
+            spec = parse_view_definition(sql)
+        except SQLParseError as e:
+            messagebox.showerror("Error", f"No se pudo analizar la vista: {e}")
             return
         
-        select_clause = select_match.group(1)
-        included_columns = [col.strip() for col in select_clause.split(",")]
+        self.edit_spec = spec
+        self.current_fact_table = spec.fact_table
         
-        # Process fact columns
-        for col in fact_columns:
-            col_ref = f"f.{col}"
-            included = any(col_ref in c or col == c.split()[0] for c in included_columns)
-            self.edit_main_columns_tree.insert("", "end", 
-                                             values=(col, "✓" if included else " "),
-                                             tags=("checked" if included else "unchecked",))
+        # Columnas de la tabla principal: incluidas según el SELECT (búsqueda por hash)
+        fact_columns = self.get_columns(spec.fact_table)
+        included = {c.lower() for c in spec.fact_columns}
+        fact_rows = [(col, col.lower() in included, None) for col in fact_columns]
+        # Columnas de la vista que el catálogo no conoce
+        known = {c.lower() for c in fact_columns}
+        fact_rows.extend((col, True, None) for col in spec.fact_columns if col.lower() not in known)
+        self.edit_main_columns_grid.set_rows(fact_rows)
+        self.new_main_fk_combo['values'] = fact_columns
         
-        # Parse JOINs to find dimension columns
-        join_matches = re.finditer(r"LEFT JOIN\s+([^\s]+)\s+([^\s]+)\s+ON\s+f\.([^\s]+)\s*=\s*\2\.([^\s]+)", sql)
+        # Dimensiones: una fila por columna proyectada, identificada por el alias del JOIN
         self.selected_joins = []
-        
-        for match in join_matches:
-            related_table = match.group(1)
-            dim_alias = match.group(2)
-            main_fk = match.group(3)
-            related_pk = match.group(4)
-            
-            # Find columns from this dimension that are included in SELECT
-            related_columns = self.get_columns(related_table)
-            for col in related_columns:
-                col_ref = f"{dim_alias}.{col}"
-                included = any(col_ref in c or f"{related_table}_{col}" in c for c in included_columns)
-                if included:
-                    # Extract the alias if it exists
-                    col_with_alias = next((c for c in included_columns if col_ref in c or f"{related_table}_{col}" in c), None)
-                    alias = None
-                    if col_with_alias and " AS " in col_with_alias:
-                        alias = col_with_alias.split(" AS ")[1].strip()
-                    
-                    self.edit_related_columns_tree.insert("", "end",
-                                                    values=(f"{related_table}.{col}", "✓", alias),
-                                                    tags=("checked",))
-            
-            # Save join information
+        related_rows = []
+        for j in spec.joins:
+            related_rows.extend((f"{j.table}.{col}", True, (j.alias, col, alias)) for col, alias in j.columns)
             self.selected_joins.append({
-                'related_table': related_table,
-                'main_fk': main_fk,
-                'related_pk': related_pk,
+                'related_table': j.table,
+                'main_fk': j.main_fk,
+                'related_pk': j.related_pk,
                 'related_col': '*',
-                'alias': dim_alias
+                'alias': j.alias,
+                'join_type': j.join_type,
+                'condition': j.condition,
+                'parent': j.parent
             })
         
-        self.edit_sql_text.insert(tk.END, sql)
+        self.edit_related_columns_grid.set_rows(related_rows)
+        self.edit_highlighter.replace(sql)
+        self.schedule_view_diff()
         self.editing_mode = True
         self.view_name_entry.delete(0, tk.END)
         self.view_name_entry.insert(0, view_name)
-
-    def on_edit_fact_column_click(self, event):
-        region = self.edit_main_columns_tree.identify("region", event.x, event.y)
-        if region == "cell":
-            column = self.edit_main_columns_tree.identify_column(event.x)
-            item = self.edit_main_columns_tree.identify_row(event.y)
-            
-            if column == "#2":  # Checkbox column
-                current_values = self.edit_main_columns_tree.item(item, "values")
-                new_value = " " if current_values[1] == "✓" else "✓"
-                self.edit_main_columns_tree.item(item, values=(current_values[0], new_value), 
-                                              tags=("checked" if new_value == "✓" else "unchecked",))
-
-    def on_edit_related_column_click(self, event):
-        region = self.edit_related_columns_tree.identify("region", event.x, event.y)
-        if region == "cell":
-            column = self.edit_related_columns_tree.identify_column(event.x)
-            item = self.edit_related_columns_tree.identify_row(event.y)
-            
-            if column == "#2":  # Checkbox column
-                current_values = self.edit_related_columns_tree.item(item, "values")
-                new_value = " " if current_values[1] == "✓" else "✓"
-                self.edit_related_columns_tree.item(item, values=(current_values[0], new_value), 
-                                             tags=("checked" if new_value == "✓" else "unchecked",))
+        
+        missing = self.check_edited_view()
+        if missing:
+            messagebox.showwarning("Columnas inexistentes",
+                                   f"La vista '{view_name}' usa columnas que ya no existen:\n" + "\n".join(missing[:20]))
+        unknown = self.catalog.missing([spec.fact_table] + [j.table for j in spec.joins])
+        if unknown:
+            messagebox.showwarning("Tablas desconocidas",
+                                   f"La vista '{view_name}' usa tablas que no están en el catálogo; "
+                                   "no se comprueban sus columnas:\n" + "\n".join(unknown[:20]))
 
     def add_new_dim_field(self):
         related_table = self.new_related_combo.get()
         main_fk = self.new_main_fk_combo.get()
         related_pk = self.new_related_pk_combo.get()
         related_col = self.new_related_col_combo.get()
-        col_alias = self.new_col_alias_entry.get() or f"{related_table}_{related_col}"
+        col_alias = self.new_col_alias_entry.get() or f"{short_table_name(related_table)}_{related_col}"
         
         if not all([related_table, main_fk, related_pk, related_col]):
             messagebox.showwarning("Campos incompletos", "Completa todos los campos para agregar una nueva dimensión")
             return
         
         # Check if this join already exists
-        existing_join = next((j for j in self.selected_joins if j['related_table'] == related_table and j['main_fk'] == main_fk and j['related_pk'] == related_pk), None)
+        existing_join = next((j for j in self.selected_joins if j['related_table'] == related_table and j['main_fk'] == main_fk and j['related_pk'] == related_pk and not j.get('parent')), None)
         
         if not existing_join:
-            # Add new join
-            join = {
+            # Add new join with an alias not used by the view yet
+            existing_join = {
                 'related_table': related_table,
                 'main_fk': main_fk,
                 'related_pk': related_pk,
                 'related_col': related_col,
                 'col_alias': col_alias,
-                'alias': related_table[:3] + str(len(self.selected_joins))
+                'alias': self.new_join_alias(related_table)
             }
-            self.selected_joins.append(join)
+            self.selected_joins.append(existing_join)
         
-        # Add the column to the treeview
-        self.edit_related_columns_tree.insert("", "end",
-                                        values=(f"{related_table}.{related_col}", "✓", col_alias),
-                                        tags=("checked",))
+        # Add the column to the grid
+        self.edit_related_columns_grid.add_row(f"{related_table}.{related_col}", True,
+                                               (existing_join['alias'], related_col, col_alias))
         
         # Clear the form
         self.new_related_col_combo.set('')
         self.new_col_alias_entry.delete(0, tk.END)
 
+    def build_edited_view_spec(self):
+        # Construye el ViewSpec a partir del estado del Editor
+        self.build_tab(self.builder_frame)
+        fact_columns = self.edit_main_columns_grid.selected_names()
+
+        # Columnas de dimensiones seleccionadas, agrupadas por alias de JOIN
+        related_columns = {}
+        for _, (join_alias, column, alias) in self.edit_related_columns_grid.selected_rows():
+            related_columns.setdefault(join_alias.lower(), []).append((column, alias or column))
+
+        # Lo que la vista original tenía fuera del modelo se conserva tal cual;
+        # compile_view_sql une los JOIN repetidos y quita los que no se usan (si su clave es única)
+        base = self.edit_spec or ViewSpec(self.current_fact_table)
+        joins = []
+        for j in self.selected_joins:
+            joins.append(JoinSpec(j['related_table'], j['main_fk'], j['related_pk'], j['alias'],
+                                  related_columns.get(j['alias'].lower(), []), j.get('join_type', "LEFT"),
+                                  j.get('condition'), j.get('parent')))
+        return ViewSpec(self.current_fact_table, fact_columns, joins, self.view_name_entry.get().strip() or None,
+                        base.fact_alias, base.expressions, base.tail, base.select_modifier)
+
     def generate_edited_sql(self):
         if not self.current_fact_table:
             messagebox.showwarning("Sin tabla principal", "No se ha cargado ninguna vista para editar")
             return
         
-        # Get selected fact columns
-        fact_columns = []
-        for item in self.edit_main_columns_tree.get_children():
-            values = self.edit_main_columns_tree.item(item, "values")
-            if values[1] == "✓":
-                fact_columns.append(f"f.{values[0]}")
-        
-        # Get selected dimension columns
-        related_columns = []
-        related_tables = {}
-        for item in self.edit_related_columns_tree.get_children():
-            values = self.edit_related_columns_tree.item(item, "values")
-            if values[1] == "✓":
-                table, column = values[0].split(".")
-                if table not in related_tables:
-                    related_tables[table] = []
-                alias = values[2] if len(values) > 2 and values[2] else f"{table}_{column}"
-                related_tables[table].append((column, alias))
-        
-        # Build SELECT clause
-        select_parts = fact_columns
-        
-        # Build JOINs and add dimension columns
-        joins = []
-        for i, j in enumerate(self.selected_joins):
-            if j['related_table'] in related_tables:
-                alias = j.get('alias', j['related_table'][:3] + str(i))
-                for col, col_alias in related_tables[j['related_table']]:
-                    select_parts.append(f"{alias}.{col} AS {col_alias}")
-                joins.append(f"LEFT JOIN {j['related_table']} {alias} ON f.{j['main_fk']} = {alias}.{j['related_pk']}")
-        
-        if not select_parts:
+        spec = self.build_edited_view_spec()
+        if not spec.fact_columns and not spec.joins:
             messagebox.showwarning("Sin columnas", "Selecciona al menos una columna")
             return
         
-        sql = f"SELECT\n    " + ",\n    ".join(select_parts) + f"\nFROM {self.current_fact_table} f\n" + "\n".join(joins)
-        self.edit_sql_text.delete("1.0", tk.END)
-        self.edit_sql_text.insert(tk.END, sql)
+        dropped = []
+        sql = compile_view_sql(spec, self.get_columns, self.indexes.is_unique, dropped)
+        self.edit_highlighter.replace(sql)
+        self.schedule_view_diff()
+        if dropped:
+            messagebox.showinfo("JOIN sin uso", dropped_joins_note(dropped))
+
+    def show_view_diff(self):
+        if self.edit_deployed is None:
+            messagebox.showwarning("Sin vista", "Carga primero una vista para compararla con la desplegada")
+            return
+        if self._diff_window is None or not self._diff_window.winfo_exists():
+            self._diff_window = SideBySideDiff(self.root, f"Diferencias: {self.edit_view_name}",
+                                               on_refresh=self.refresh_deployed_definition)
+        self._diff_window.lift()
+        self.update_view_diff()
+
+    def schedule_view_diff(self):
+        # Con el diff abierto, se recalcula tras una pausa al editar
+        if self._diff_window is None or not self._diff_window.winfo_exists():
+            return
+        if self._diff_job is not None:
+            self.root.after_cancel(self._diff_job)
+        self._diff_job = self.root.after(self.DIFF_DELAY_MS, self.update_view_diff)
+
+    def update_view_diff(self):
+        # El diff se calcula en un hilo de trabajo; solo se muestra el último pedido
+        self._diff_job = None
+        self._diff_seq += 1
+        seq = self._diff_seq
+        self.db.submit(self._compute_view_diff, self.edit_deployed, self.edit_sql_text.get("1.0", "end-1c"),
+                       on_success=lambda diff: self._on_view_diff(seq, diff),
+                       on_error=lambda e: messagebox.showerror("Error al comparar", str(e)),
+                       timeout=self.TASK_TIMEOUT, description="Comparando con la vista desplegada")
+
+    def _compute_view_diff(self, deployed, sql):
+        return side_by_side_diff(view_select(deployed), view_select(sql))
+
+    def _on_view_diff(self, seq, diff):
+        if seq != self._diff_seq or self._diff_window is None or not self._diff_window.winfo_exists():
+            return
+        self._diff_window.show(diff)
+
+    def refresh_deployed_definition(self):
+        if self.edit_view_name is None or not self.require_connection():
+            return
+        self.db.submit(self._fetch_definition, self.edit_view_name, on_success=self._on_deployed_definition,
+                       on_error=lambda e: messagebox.showerror("Error al cargar vista", str(e)),
+                       timeout=self.TASK_TIMEOUT, on_cancel=self._cancel_current_query,
+                       description=f"Cargando vista {self.edit_view_name}")
+
+    def _on_deployed_definition(self, definition):
+        # None: la vista ya no existe, todo el editor aparece como nuevo
+        self.edit_deployed = definition or ""
+        self.update_view_diff()
 
     def update_view(self):
+        self.build_tab(self.builder_frame)
         view_name = self.view_name_entry.get().strip()
         if not view_name:
             messagebox.showerror("Nombre faltante", "Debes ingresar un nombre para la vista")
@@ -784,22 +4869,233 @@ class ModernSQLViewGenerator:
             messagebox.showerror("SQL vacío", "No hay SQL para actualizar la vista")
             return
         
+        if not self.require_connection():
+            return
+        if not self.confirm_lint(sql, "Actualizar de todos modos"):
+            return
+        # Update the view
+        update_sql = create_view_statement(view_name, sql)
+        self.db.submit(self._execute_ddl, update_sql, view_name,
+                       on_success=lambda r: self._on_view_deployed(r, view_name, "Vista actualizada", f"La vista '{view_name}' fue actualizada exitosamente"),
+                       on_error=lambda e: messagebox.showerror("Error al actualizar vista", str(e)),
+                       timeout=self.TASK_TIMEOUT, on_cancel=self._cancel_current_query,
+                       description=f"Actualizando vista {view_name}")
+# ... (copiar aquí todos los demás métodos de SQLViewGenerator)
+
+# ========== MODO POR LOTES (CLI) ==========
+SPEC_EXTENSIONS = (".json", ".yaml", ".yml")
+
+def find_spec_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, _, filenames in os.walk(path):
+                files.extend(os.path.join(dirpath, f) for f in sorted(filenames) if f.lower().endswith(SPEC_EXTENSIONS))
+        else:
+            files.append(path)
+    return files
+
+def load_spec_file(path):
+    # Un archivo puede contener una vista, una lista de vistas o {"views": [...]}
+    with open(path, encoding="utf-8") as f:
+        if path.lower().endswith((".yaml", ".yml")):
+            data = require_yaml().safe_load(f)
+        else:
+            data = json.load(f)
+    if isinstance(data, dict) and 'views' in data:
+        data = data['views']
+    if isinstance(data, dict):
+        data = [dict(data, name=data.get('name') or os.path.splitext(os.path.basename(path))[0])]
+    if not isinstance(data, list):
+        raise ValueError("Formato de especificación no reconocido")
+    for number, view in enumerate(data, 1):
+        if not isinstance(view, dict):
+            raise ValueError(f"La vista {number} no es un objeto")
+        joins = view.get('joins') or []
+        if not isinstance(joins, list) or not all(isinstance(j, dict) and j.get('table') for j in joins):
+            raise ValueError(f"La vista {view.get('name') or number} tiene un JOIN sin 'table'")
+    return data
+
+def compile_spec_job(data, columns):
+    # Se ejecuta en un proceso del pool: solo datos serializables de entrada y salida
+    def columns_for(table):
+        # Un '*' que no se puede expandir es un error de la especificación, no un JOIN vacío
+        found = columns.get(table.lower())
+        if not found:
+            reason = "no está en el catálogo" if table.lower() in columns else "sin catálogo (usa --server y --database)"
+            raise ValueError(f"No se pueden expandir las columnas de {table}: {reason}")
+        return found
+
+    start = time.perf_counter()
+    result = {'name': data.get('name'), 'sql': None, 'error': None}
+    try:
+        spec = ViewSpec.from_dict(data)
+        if not spec.name:
+            raise ValueError("La especificación no tiene 'name'")
+        result['sql'] = create_view_statement(spec.name, compile_view_sql(spec, columns_for))
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['compile_ms'] = (time.perf_counter() - start) * 1000
+    return result
+
+def run_batch(args):
+    if args.server and not args.database:
+        print("--server requiere --database", file=sys.stderr)
+        return 2
+    timings = {}
+    failures = []
+    specs = []
+
+    start = time.perf_counter()
+    for path in find_spec_files(args.specs):
         try:
-            # Update the view
-            update_sql = f"CREATE OR ALTER VIEW {view_name} AS\n{sql}"
-            self.cursor.execute(update_sql)
-            self.connection.commit()
-            messagebox.showinfo("Vista actualizada", f"La vista '{view_name}' fue actualizada exitosamente")
-            
-            # Refresh views list
-            self.cursor.execute("SELECT name FROM sys.views")
-            self.existing_views = [r[0] for r in self.cursor.fetchall()]
-            self.view_combo['values'] = self.existing_views
-            
+            specs.extend((path, data) for data in load_spec_file(path))
         except Exception as e:
-            messagebox.showerror("Error al actualizar vista", str(e))# ... (copiar aquí todos los demás métodos de SQLViewGenerator)
+            failures.append((path, f"{type(e).__name__}: {e}"))
+    timings['lectura'] = time.perf_counter() - start
 
-if __name__ == '__main__':
+    pool = None
+    columns = {}
+    if args.server:
+        databases = split_databases(args.database) or [args.database]
+        pool = ConnectionManager(build_connection_string(args.server, databases[0], args.user, args.password),
+                                 size=args.connections)
+        start = time.perf_counter()
+        catalog = SchemaCatalog()
+        catalog.database = databases[0]
+        try:
+            # Las bases adicionales se leen en paralelo con la principal
+            with ThreadPoolExecutor(max_workers=len(databases)) as executor:
+                extra = {d: executor.submit(fetch_database_catalog,
+                                            build_connection_string(args.server, d, args.user, args.password), catalog)
+                         for d in databases[1:]}
+                pool.run(catalog.load)
+                for database, future in extra.items():
+                    catalog.load_database(database, future.result())
+            # Solo se envían a los procesos las tablas que necesitan expandir '*'
+            for _, data in specs:
+                for j in data.get('joins') or []:
+                    if any((c if isinstance(c, str) else c[0]) == "*" for c in j.get('columns', [])):
+                        columns[j['table'].lower()] = catalog.get_columns(j['table'])
+        except Exception as e:
+            # Sin catálogo no se despliega; las vistas se compilan igualmente
+            failures.append(("catálogo", f"{type(e).__name__}: {e}"))
+            pool.close()
+            pool = None
+        timings['catálogo'] = time.perf_counter() - start
+    elif args.deploy or args.dry_run:
+        print("--deploy y --dry-run requieren --server y --database", file=sys.stderr)
+        return 2
+
+    start = time.perf_counter()
+    if args.workers > 1 and len(specs) > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            results = list(executor.map(compile_spec_job, [d for _, d in specs], [columns] * len(specs),
+                                        chunksize=max(1, len(specs) // (args.workers * 4))))
+    else:
+        results = [compile_spec_job(d, columns) for _, d in specs]
+    timings['compilación'] = time.perf_counter() - start
+
+    compiled = []
+    for (path, _), result in zip(specs, results):
+        if result['error']:
+            failures.append((f"{path} [{result['name']}]", result['error']))
+        else:
+            compiled.append(result)
+
+    if args.out:
+        start = time.perf_counter()
+        os.makedirs(args.out, exist_ok=True)
+        for result in compiled:
+            with open(os.path.join(args.out, f"{result['name']}.sql"), "w", encoding="utf-8") as f:
+                f.write(result['sql'] + "\n")
+        timings['escritura'] = time.perf_counter() - start
+
+    deployed = 0
+    unchanged = 0
+    if (args.deploy or args.dry_run) and compiled and pool is not None:
+        # Solo las vistas que cambian, todas en una transacción: si una falla no se despliega ninguna
+        start = time.perf_counter()
+        try:
+            plan = pool.run(lambda cursor: DeployPlan.fetch(cursor, [(r['name'], r['sql']) for r in compiled]))
+            timings['comparación'] = time.perf_counter() - start
+            unchanged = plan.count('unchanged')
+            if args.dry_run:
+                print(plan.report())
+            else:
+                start = time.perf_counter()
+                deployed = pool.run(plan.execute, commit=True)
+                timings['despliegue'] = time.perf_counter() - start
+        except DeployError as e:
+            failures.append((f"despliegue [{e.view}]", f"{type(e.error).__name__}: {e.error}"))
+        except Exception as e:
+            failures.append(("despliegue", f"{type(e).__name__}: {e}"))
+
+    if pool is not None:
+        pool.close()
+
+    print(f"Especificaciones: {len(specs)}  Compiladas: {len(compiled)}  "
+          f"Desplegadas: {deployed}  Sin cambios: {unchanged}  Fallidas: {len(failures)}")
+    for phase, seconds in timings.items():
+        print(f"  {phase:<12} {seconds * 1000:10.1f} ms")
+    if compiled:
+        slowest = max(compiled, key=lambda r: r['compile_ms'])
+        print(f"  vista más lenta: {slowest['name']} ({slowest['compile_ms']:.1f} ms)")
+    for source, error in failures:
+        print(f"  ✗ {source}: {error}", file=sys.stderr)
+    return 1 if failures else 0
+
+def run_gui(profile=False, eager=False, report=False):
+    phases = [("importaciones", time.perf_counter() - STARTUP_STARTED)]
+    started = time.perf_counter()
+    from ttkthemes import ThemedTk
     root = ThemedTk(theme="arc")  # Ventana con tema oscuro
-    app = ModernSQLViewGenerator(root)
-    root.mainloop()
\ No newline at end of file
+    phases.append(("ventana y tema", time.perf_counter() - started))
+    started = time.perf_counter()
+    app = ModernSQLViewGenerator(root, profile=profile, lazy=not eager)
+    phases.append(("interfaz", time.perf_counter() - started))
+    if report:
+        started = time.perf_counter()
+
+        def first_paint():
+            phases.append(("primera pintura", time.perf_counter() - started))
+            phases.append(("total", time.perf_counter() - STARTUP_STARTED))
+            print_startup_report(f"Arranque ({'todas las pestañas' if eager else 'pestañas diferidas'})", phases)
+        root.after_idle(first_paint)
+    root.mainloop()
+    if report and app.startup:
+        print_startup_report("Construcción de pestañas", app.startup)
+
+def print_startup_report(title, phases):
+    print(f"{title}:", file=sys.stderr)
+    for phase, seconds in phases:
+        print(f"  {phase:<22}{seconds * 1000:9.1f} ms", file=sys.stderr)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generador de Vistas SQL. Sin argumentos abre la interfaz gráfica.")
+    parser.add_argument("specs", nargs="*", help="archivos .json/.yaml o directorios con especificaciones de vistas")
+    parser.add_argument("--out", help="directorio donde escribir un .sql por vista")
+    parser.add_argument("--deploy", action="store_true",
+                        help="desplegar con CREATE OR ALTER VIEW las vistas cuya definición cambió")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="mostrar qué vistas se crearían o modificarían, con su diff, sin desplegar")
+    parser.add_argument("--server", help="servidor SQL Server")
+    parser.add_argument("--database", help="base de datos; varias separadas por comas (la primera es la principal)")
+    parser.add_argument("--user", default="", help="usuario")
+    parser.add_argument("--password", default=os.environ.get("GENERADOR_SQL_PASSWORD", ""),
+                        help="contraseña (por defecto $GENERADOR_SQL_PASSWORD)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="procesos de compilación")
+    parser.add_argument("--connections", type=int, default=4, help="conexiones con el servidor")
+    parser.add_argument("--profile", action="store_true",
+                        help="medir consultas y manejadores desde el arranque (panel ⏱ de la interfaz)")
+    parser.add_argument("--eager", action="store_true", help="construir todas las pestañas al arrancar")
+    parser.add_argument("--startup-report", action="store_true", help="mostrar los tiempos de arranque")
+    args = parser.parse_args(argv)
+
+    if not args.specs:
+        run_gui(profile=args.profile, eager=args.eager, report=args.startup_report)
+        return 0
+    return run_batch(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
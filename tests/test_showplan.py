@@ -0,0 +1,101 @@
+import os
+
+import generador_vistas_general as g
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_parse_showplan_xml_summary():
+    plan = g.parse_showplan_xml(load_fixture("showplan_vista_ventas.xml"))
+    assert plan.cost == 14.2731
+    assert plan.rows == 125000
+    assert len(plan.operators) == 5
+    assert plan.count(g.SEEK_OPS) == 1
+    assert plan.count(g.SCAN_OPS) == 2
+    assert plan.count(g.LOOKUP_OPS) == 0
+    scans = [op.target for op in plan.operators if op.physical in g.SCAN_OPS]
+    assert scans == ["[dbo].[DimCliente].[IX_DimCliente_Segmento]", "[dbo].[FactVentas].[PK_FactVentas]"]
+
+
+def test_parse_showplan_xml_missing_indexes_and_warnings():
+    plan = g.parse_showplan_xml(load_fixture("showplan_vista_ventas.xml"))
+    assert plan.missing_indexes == [(81.3425, "[dbo].[FactVentas]", ["[Codigo]"], ["[ClienteId]", "[Importe]"])]
+    assert g.ShowPlan.missing_index_ddl(*plan.missing_indexes[0][1:]) == (
+        "CREATE NONCLUSTERED INDEX IX_FactVentas_Codigo ON [dbo].[FactVentas] ([Codigo]) "
+        "INCLUDE ([ClienteId], [Importe]);")
+    assert plan.warnings[0].startswith("PlanAffectingConvert: CONVERT_IMPLICIT(")
+    assert plan.warnings[1] == "ColumnsWithNoStatistics: Segmento"
+
+
+def test_add_xml_accumulates_statements():
+    xml = load_fixture("showplan_vista_ventas.xml")
+    plan = g.ShowPlan().add_xml(xml).add_xml(xml)
+    assert plan.cost == 2 * 14.2731
+    assert plan.rows == 250000
+    assert plan.count(g.SCAN_OPS) == 4
+    assert len(plan.warnings) == 2  # sin repetidos
+
+
+class FakeConnection:
+    def __init__(self, fail_off):
+        self.fail_off = fail_off
+        self.closed = False
+        self.showplan = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class FakeCursor:
+    description = None
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, sql):
+        if sql == "SET SHOWPLAN_XML ON":
+            self.connection.showplan = True
+        elif sql == "SET SHOWPLAN_XML OFF":
+            if self.connection.fail_off:
+                raise RuntimeError("no se pudo desactivar SHOWPLAN_XML")
+            self.connection.showplan = False
+        else:
+            raise RuntimeError("Invalid object name 'NoExiste'")
+
+
+def run_failing_plan(fail_off):
+    connection = FakeConnection(fail_off)
+    pool = g.ConnectionManager("fake", size=1)
+    pool._connect = lambda: connection
+    try:
+        pool.run(lambda cursor: g.PlanCache.fetch_xml(cursor, "SELECT * FROM NoExiste"))
+    except Exception as e:
+        return pool, connection, e
+    raise AssertionError("fetch_xml no propagó el error")
+
+
+def test_fetch_xml_returns_connection_when_showplan_is_restored():
+    pool, connection, error = run_failing_plan(fail_off=False)
+    assert isinstance(error, RuntimeError) and not connection.showplan
+    assert pool._idle.qsize() == 1 and not connection.closed
+
+
+def test_fetch_xml_discards_connection_left_in_showplan_mode():
+    pool, connection, error = run_failing_plan(fail_off=True)
+    assert isinstance(error, g.BrokenConnectionError)
+    assert "NoExiste" in str(error)
+    assert pool._idle.qsize() == 0 and pool._created == 0 and connection.closed